@@ -1,8 +1,87 @@
+import argparse
 import asyncio
+
+from jobs import Checkpoint, Progress, parse_targets
 from smolapi import SmolPokeApiScraper
 
-async def main():
-     async with await SmolPokeApiScraper.new() as pokeapi:
-          await pokeapi.get_pokemon(range(1, 26))
-     
-asyncio.run(main())
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="smolpokeapi",
+        description="Scrape Pokémon from PokéAPI as a resumable batch job.",
+    )
+    parser.add_argument(
+        "pokemon",
+        nargs="*",
+        default=["1-25"],
+        help="Pokédex numbers, ranges such as 1-151, or names (default: 1-25)",
+    )
+    parser.add_argument("--cache", default="pokeapi_cache.log", help="cache path")
+    parser.add_argument(
+        "--checkpoint",
+        default="pokeapi_job.json",
+        help="checkpoint path; an existing checkpoint is resumed",
+    )
+    parser.add_argument(
+        "--checkpoint-every",
+        type=int,
+        default=25,
+        help="save the checkpoint after this many Pokémon",
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=8, help="maximum requests in flight"
+    )
+    parser.add_argument("--rate", type=float, default=2.0, help="requests per second")
+    parser.add_argument("--burst", type=int, default=4, help="requests per burst")
+    parser.add_argument("--timeout", type=float, default=30, help="request timeout")
+    parser.add_argument(
+        "--ttl", type=float, default=None, help="seconds before revalidating"
+    )
+    parser.add_argument(
+        "--refresh", action="store_true", help="revalidate every cached Pokémon"
+    )
+    return parser.parse_args(argv)
+
+
+async def main(args):
+    checkpoint = Checkpoint(args.checkpoint, parse_targets(args.pokemon))
+    progress = Progress(len(checkpoint.pending))
+    pending, completed = len(checkpoint.pending), len(checkpoint.completed)
+    print(f"{pending} Pokémon to go; {completed} done.")
+
+    scraper = SmolPokeApiScraper.new(
+        cache_path=args.cache,
+        rate=args.rate,
+        burst=args.burst,
+        max_in_flight=args.concurrency,
+        timeout=args.timeout,
+        ttl=args.ttl,
+    )
+    async with await scraper as pokeapi:
+        try:
+            pokemon = pokeapi.stream_pokemon(list(checkpoint.pending), args.refresh)
+            async for pokenum, data in pokemon:
+                name = data.get("name") if isinstance(data, dict) else data.name
+                checkpoint.complete(pokenum, name)
+                progress.done += 1
+                if progress.done % args.checkpoint_every == 0:
+                    await pokeapi.sync()
+                    checkpoint.save()
+                progress.report(pokeapi.transfer_stats)
+
+            for pokenum, reason in pokeapi.failed.items():
+                checkpoint.fail(pokenum, reason)
+        finally:
+            # Runs on Ctrl-C too, so the next run resumes from here.
+            checkpoint.save()
+
+        progress.report(pokeapi.transfer_stats, force=True)
+
+    if checkpoint.failed:
+        print(f"{len(checkpoint.failed)} failed; rerun to retry them:")
+        for pokenum, reason in checkpoint.failed.items():
+            print(f"\t{pokenum}: {reason}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,106 @@
+"""Warm-start benchmark for the scraper's on-disk cache.
+
+Serves synthetic Pokémon from a local stub server, scrapes them once into a
+fresh cache, then reopens the cache and requests the same Pokémon by number,
+numeric string, and name. A warm start should serve every request from disk
+without reaching the server.
+
+    python smolpokeapi/bench.py [COUNT] [CACHE-PATH]
+"""
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from aiohttp import web
+
+from smolapi import SmolPokeApiScraper
+
+
+def stub_pokemon(pokenum):
+    """Build a fake payload roughly the shape of a PokéAPI Pokémon."""
+    return {
+        "id": pokenum,
+        "name": f"pokemon-{pokenum}",
+        "height": pokenum % 20,
+        "weight": pokenum * 3,
+        "moves": [{"move": {"name": f"move-{i}"}} for i in range(50)],
+    }
+
+
+async def start_stub(handler):
+    """Serve handler for `/pokemon/{key}` on a free local port.
+
+    Parameters
+    ----------
+    handler: Callable[[web.Request], Awaitable[web.Response]]
+        Request handler, which finds the requested key in
+        `request.match_info["key"]`.
+
+    Returns
+    -------
+    Tuple[web.AppRunner, str]
+        Runner to clean up when done and the endpoint's base URL.
+    """
+    app = web.Application()
+    app.router.add_get("/pokemon/{key}", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/pokemon"
+
+
+async def scrape(pokemon, cache_path, base_url):
+    """Scrape pokemon and return the elapsed time and number found."""
+    SmolPokeApiScraper._POKEAPI = base_url + "/{}"
+    start = time.perf_counter()
+    scraper = SmolPokeApiScraper.new(cache_path=cache_path, rate=1000, burst=64)
+    async with await scraper as api:
+        pokedata = await api.get_pokemon(pokemon)
+    return time.perf_counter() - start, len(pokedata)
+
+
+async def main(count, cache_path):
+    served = 0
+    by_name = {f"pokemon-{i}": i for i in range(1, count + 1)}
+
+    async def handler(request):
+        nonlocal served
+        served += 1
+        key = request.match_info["key"]
+        return web.json_response(stub_pokemon(by_name.get(key) or int(key)))
+
+    runner, base_url = await start_stub(handler)
+    ids = list(range(1, count + 1))
+    runs = [
+        ("cold (int)", ids),
+        ("warm (int)", ids),
+        ("warm (str)", [str(i) for i in ids]),
+        ("warm (name)", list(by_name)),
+    ]
+
+    try:
+        print(f"{'run':<12} {'seconds':>8} {'requests':>9} {'hit rate':>9}")
+        for label, keys in runs:
+            before = served
+            elapsed, found = await scrape(keys, cache_path, base_url)
+            requests = served - before
+            hit_rate = 1 - requests / len(keys)
+            print(f"{label:<12} {elapsed:>8.3f} {requests:>9} {hit_rate:>9.1%}")
+            assert found == len(keys), f"Only found {found} of {len(keys)} Pokémon."
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    # Cache hits are logged as warnings, which would drown out the table.
+    logging.basicConfig(level=logging.ERROR)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    with tempfile.TemporaryDirectory() as tmp:
+        default_path = os.path.join(tmp, "bench.log")
+        cache_path = sys.argv[2] if len(sys.argv) > 2 else default_path
+        asyncio.run(main(count, cache_path))
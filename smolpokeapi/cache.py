@@ -0,0 +1,635 @@
+import json
+import logging
+import operator
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+
+def normalize_key(key):
+    """Normalize a Pokédex number or Pokémon name into a cache key.
+
+    Parameters
+    ----------
+    key: int | str
+        Pokédex number as an integer or numeric string, or a Pokémon name.
+
+    Returns
+    -------
+    int | str
+        Pokédex number as an integer or the name in lower case.
+    """
+    if isinstance(key, bool):
+        raise TypeError(f"{key} isn't a Pokédex number or Pokémon name.")
+    if isinstance(key, str):
+        key = key.strip().lower()
+        return int(key) if key.isdecimal() else key
+    try:
+        # Accepts NumPy and other integer-like types too.
+        return operator.index(key)
+    except TypeError:
+        raise TypeError(f"{key} isn't a Pokédex number or Pokémon name.") from None
+
+
+def canonical_url(url):
+    """Normalize a resource URL so equivalent spellings share a cache entry.
+
+    PokéAPI resource URLs end with a slash, which is frequently dropped when
+    they're typed by hand.
+    """
+    return url.strip().rstrip("/") + "/"
+
+
+class CacheBackend(ABC):
+    """Storage for scraped Pokémon API data keyed by Pokédex number.
+
+    Backends behave like a small mapping. Keys are normalized with
+    `normalize_key` so integers, numeric strings, and Pokémon names all find
+    the same entry. Names are resolved through an index built from each
+    entry's `name` field. Writes may be buffered until `flush` is called, and
+    `compact` reclaims space from replaced entries.
+
+    Every entry also carries metadata used to decide when it should be
+    revalidated: `fetched` (Unix time), `etag`, `last_modified`, and `ttl`
+    (seconds, or None to never expire).
+
+    Caches opened with `by_url=True` hold arbitrary API resources keyed by
+    their canonical URL instead, and don't track names.
+    """
+
+    def __init__(self, by_url=False):
+        self._by_url = by_url
+        # Pokémon name -> Pokédex number
+        self._names = {}
+        # Pokédex number -> entry metadata
+        self._meta = {}
+
+    @abstractmethod
+    def _has(self, pokeid):
+        ...
+
+    @abstractmethod
+    def _read(self, pokeid):
+        ...
+
+    @abstractmethod
+    def _write(self, pokeid, name, data, meta):
+        ...
+
+    @abstractmethod
+    def __len__(self):
+        ...
+
+    @abstractmethod
+    def keys(self):
+        """Cached Pokédex numbers."""
+
+    def _stored_key(self, key):
+        """Normalize a key read back from storage."""
+        return canonical_url(key) if self._by_url else normalize_key(key)
+
+    def _add_name(self, name, pokeid):
+        if name and not self._by_url:
+            self._names[normalize_key(name)] = pokeid
+
+    def resolve(self, key):
+        """Resolve key to a Pokédex number.
+
+        Parameters
+        ----------
+        key: int | str
+            Pokédex number, numeric string, or Pokémon name.
+
+        Returns
+        -------
+        int
+            Pokédex number.
+
+        Raises
+        ------
+        KeyError
+            If key is a name that isn't cached.
+        """
+        if self._by_url:
+            return canonical_url(key)
+        key = normalize_key(key)
+        if isinstance(key, int):
+            return key
+        return self._names[key]
+
+    def __contains__(self, key):
+        try:
+            return self._has(self.resolve(key))
+        except KeyError:
+            return False
+
+    def __getitem__(self, key):
+        return self._read(self.resolve(key))
+
+    def __setitem__(self, key, data):
+        self.put(key, data)
+
+    def put(self, key, data, meta=None):
+        """Add or replace data for key along with its metadata.
+
+        Parameters
+        ----------
+        key: int | str
+            Pokédex number, numeric string, or Pokémon name.
+        data: Dict[str, Any]
+            Pokémon API data.
+        meta: Optional[Dict[str, Any]]
+            Entry metadata. Defaults to the current time with no validators
+            or TTL.
+        """
+        name = data.get("name") if isinstance(data, dict) else None
+        key = self._stored_key(key)
+        if isinstance(key, str) and not self._by_url:
+            # Names are only known as keys once the payload's id is.
+            if not isinstance(data, dict) or "id" not in data:
+                raise ValueError(f"Can't determine the Pokédex number for {key}.")
+            name, key = name or key, data["id"]
+
+        meta = make_meta(**(meta or {}))
+        self._write(key, name, data, meta)
+        self._add_name(name, key)
+        self._meta[key] = meta
+
+    def meta(self, key):
+        """Retrieve metadata for key or None if it has none.
+
+        Entries written before metadata was tracked have none.
+        """
+        try:
+            return self._meta.get(self.resolve(key))
+        except KeyError:
+            return None
+
+    def touch(self, key, **changes):
+        """Update metadata for a cached entry without rewriting its data.
+
+        Parameters
+        ----------
+        key: int | str
+            Pokédex number, numeric string, or Pokémon name.
+        changes: Any
+            Metadata fields to replace. `fetched` defaults to now.
+        """
+        pokeid = self.resolve(key)
+        if not self._has(pokeid):
+            raise KeyError(key)
+        changes.setdefault("fetched", time.time())
+        self._meta[pokeid] = make_meta(**{**self._meta.get(pokeid, {}), **changes})
+
+    def is_fresh(self, key, default_ttl=None, now=None):
+        """Check if a cached entry can be used without revalidation.
+
+        Parameters
+        ----------
+        key: int | str
+            Pokédex number, numeric string, or Pokémon name.
+        default_ttl: Optional[float]
+            TTL in seconds for entries without their own. None never expires
+            such entries.
+        now: Optional[float]
+            Current Unix time. Defaults to `time.time()`.
+
+        Returns
+        -------
+        bool
+            False if the entry is missing or has outlived its TTL.
+        """
+        if key not in self:
+            return False
+        meta = self.meta(key) or {}
+        ttl = meta.get("ttl") if meta.get("ttl") is not None else default_ttl
+        if ttl is None:
+            return True
+        if (fetched := meta.get("fetched")) is None:
+            return False
+        return (now if now is not None else time.time()) < fetched + ttl
+
+    @property
+    def names(self):
+        """Dict[str, int]: Index of cached Pokémon names to Pokédex numbers."""
+        return self._names
+
+    def get(self, key, default=None):
+        """Retrieve data for key or `default` if it isn't cached."""
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def update(self, new_data):
+        """Add or replace every entry of a mapping.
+
+        Parameters
+        ----------
+        new_data: Dict[int, Dict]
+            Data keyed by Pokédex number.
+        """
+        for key, data in new_data.items():
+            self[key] = data
+
+    # Optional hooks; backends that don't buffer or go stale keep the no-ops.
+    def flush(self):  # noqa: B027
+        """Persist buffered writes."""
+
+    def compact(self):  # noqa: B027
+        """Rewrite the store without stale entries."""
+
+    def close(self):
+        """Flush and release any open files."""
+        self.flush()
+
+    @property
+    def stats(self):
+        """Dict[str, int]: Counters describing cache behavior, if any."""
+        return {}
+
+
+def make_meta(fetched=None, etag=None, last_modified=None, ttl=None):
+    """Build entry metadata for a cache backend.
+
+    Parameters
+    ----------
+    fetched: Optional[float]
+        Unix time the entry was fetched or last revalidated. Defaults to now.
+    etag: Optional[str]
+        ETag response header.
+    last_modified: Optional[str]
+        Last-Modified response header.
+    ttl: Optional[float]
+        Seconds the entry stays fresh. None never expires.
+
+    Returns
+    -------
+    Dict[str, Any]
+        Entry metadata.
+    """
+    return {
+        "fetched": fetched if fetched is not None else time.time(),
+        "etag": etag,
+        "last_modified": last_modified,
+        "ttl": ttl,
+    }
+
+
+class LruTier():
+    """In-memory least recently used tier for deserialized entries.
+
+    The tier is bounded by entry count, by total size in bytes, or both.
+    Sizes are supplied by the caller, usually as the entry's serialized
+    length, because measuring nested Python objects is expensive.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=None):
+        """
+        Parameters
+        ----------
+        max_entries: Optional[int]
+            Maximum number of entries held. None for no limit.
+        max_bytes: Optional[int]
+            Maximum total size of held entries. None for no limit.
+        """
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        # key -> (data, size)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return data for key and mark it as recently used or None."""
+        try:
+            data, _ = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return data
+
+    def put(self, key, data, size):
+        """Hold data for key and evict the least recently used overflow."""
+        self.discard(key)
+        self._entries[key] = (data, size)
+        self._bytes += size
+
+        while self._entries and self._over_limit():
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def discard(self, key):
+        """Drop key from the tier if it's held."""
+        if (entry := self._entries.pop(key, None)) is not None:
+            self._bytes -= entry[1]
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def _over_limit(self):
+        entries, max_entries = len(self._entries), self._max_entries
+        too_many = max_entries is not None and entries > max_entries
+        too_big = self._max_bytes is not None and self._bytes > self._max_bytes
+        return too_many or too_big
+
+    @property
+    def stats(self):
+        """Dict[str, int]: Hit, miss, and eviction counters and current size."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+        }
+
+
+class JsonCache(CacheBackend):
+    """Legacy cache that holds every entry in memory as one JSON document.
+
+    Every `flush` rewrites the whole file, so prefer `LogCache` for anything
+    larger than a handful of Pokémon. Entry metadata is kept in a sidecar
+    file so the cache file itself keeps its original layout.
+    """
+
+    _META_SUFFIX = ".meta"
+
+    def __init__(self, path, by_url=False):
+        """
+        Parameters
+        ----------
+        path: str
+            File path. Loads cached Pokémon API data as JSON if exists or else
+            creates a new file on flush.
+        by_url: bool
+            Key entries by resource URL instead of Pokédex number.
+        """
+        super().__init__(by_url)
+        self._path = path
+        try:
+            with open(path, "r") as cache:
+                saved = json.load(cache)
+            # JSON object keys are always strings, so restore the numbers.
+            self._data = {self._stored_key(key): data for key, data in saved.items()}
+            logging.info(f"Loaded cache from {path}.")
+        except FileNotFoundError:
+            logging.info(f"No cache found at {path}. Creating new cache.")
+            self._data = {}
+
+        for pokeid, data in self._data.items():
+            if isinstance(data, dict):
+                self._add_name(data.get("name"), pokeid)
+
+        try:
+            with open(path + JsonCache._META_SUFFIX, "r") as meta_file:
+                saved_meta = json.load(meta_file)
+            self._meta = {
+                self._stored_key(key): meta for key, meta in saved_meta.items()
+            }
+        except FileNotFoundError:
+            pass
+
+    def _has(self, pokeid):
+        return pokeid in self._data
+
+    def _read(self, pokeid):
+        return self._data[pokeid]
+
+    def _write(self, pokeid, name, data, meta):
+        self._data[pokeid] = data
+
+    def __len__(self):
+        return len(self._data)
+
+    def keys(self):
+        return self._data.keys()
+
+    def flush(self):
+        logging.info(f"Syncing to {self._path}.")
+        with open(self._path, "w") as cache:
+            json.dump(self._data, cache)
+        with open(self._path + JsonCache._META_SUFFIX, "w") as meta_file:
+            json.dump(self._meta, meta_file)
+
+
+class LogCache(CacheBackend):
+    """Append-only record log with an offset index.
+
+    Each record is one line holding a JSON header, a tab, and the JSON
+    payload. Replacing an entry appends a new record and repoints the index,
+    so writes never touch existing bytes. The index is saved next to the log
+    on `flush`; startup loads it and only scans records appended after it was
+    written, so payloads are never parsed until they're requested.
+
+    Deserialized payloads are held in an `LruTier` so a hot working set stays
+    in memory without keeping the whole log resident.
+    """
+
+    _INDEX_SUFFIX = ".idx"
+
+    def __init__(self, path, max_entries=256, max_bytes=None, by_url=False):
+        """
+        Parameters
+        ----------
+        path: str
+            Path to the record log. The log and its index are created if they
+            don't exist.
+        max_entries: Optional[int]
+            Maximum number of payloads held in memory. None for no limit.
+        max_bytes: Optional[int]
+            Maximum serialized size of payloads held in memory. None for no
+            limit.
+        by_url: bool
+            Key entries by resource URL instead of Pokédex number.
+        """
+        super().__init__(by_url)
+        self._path = path
+        self._memory = LruTier(max_entries, max_bytes)
+        self._index_path = path + LogCache._INDEX_SUFFIX
+        # Pokédex number -> (offset, length)
+        self._index = {}
+        self._stale = 0
+
+        scan_from = self._load_index()
+        self._scan(scan_from)
+        # Both handles stay open until `close`.
+        self._writer = open(path, "ab")  # noqa: SIM115
+        self._reader = open(path, "rb")  # noqa: SIM115
+        logging.info(f"Indexed {len(self._index)} cached Pokémon in {path}.")
+
+    def _load_index(self):
+        """Load the saved index and return the log offset it covers."""
+        try:
+            with open(self._index_path, "r") as index_file:
+                saved = json.load(index_file)
+        except FileNotFoundError:
+            return 0
+
+        # A log smaller than the indexed size was replaced or truncated.
+        if saved["size"] > self._log_size():
+            logging.warning(f"Stale index for {self._path}. Rebuilding.")
+            return 0
+
+        for pokeid, offset, length, *extra in saved["entries"]:
+            # Older indexes lack the name and metadata fields.
+            name = extra[0] if extra else None
+            meta = extra[1] if len(extra) > 1 else None
+            self._add(pokeid, name, meta, offset, length)
+        self._stale = saved["stale"]
+        return saved["size"]
+
+    def _log_size(self):
+        try:
+            return os.path.getsize(self._path)
+        except FileNotFoundError:
+            return 0
+
+    def _scan(self, offset):
+        """Index records from offset to the end of the log by header only."""
+        try:
+            # Opened outside the `with` below so only a missing log is caught.
+            log = open(self._path, "rb")  # noqa: SIM115
+        except FileNotFoundError:
+            return
+
+        with log:
+            log.seek(offset)
+            for line in log:
+                if not line.endswith(b"\n"):
+                    # Torn write from a crash; the next append overwrites it.
+                    logging.warning(f"Truncating partial record at {offset}.")
+                    log.close()
+                    os.truncate(self._path, offset)
+                    break
+                header = json.loads(line.split(b"\t", 1)[0])
+                name, meta = header.get("name"), header.get("meta")
+                self._add(header["key"], name, meta, offset, len(line))
+                offset += len(line)
+
+    def _add(self, pokeid, name, meta, offset, length):
+        pokeid = self._stored_key(pokeid)
+        if pokeid in self._index:
+            self._stale += 1
+        self._index[pokeid] = (offset, length)
+        self._add_name(name, pokeid)
+        if meta is not None:
+            self._meta[pokeid] = meta
+
+    def _has(self, pokeid):
+        return pokeid in self._index
+
+    def _read(self, pokeid):
+        if (data := self._memory.get(pokeid)) is not None:
+            return data
+
+        offset, length = self._index[pokeid]
+        self._reader.seek(offset)
+        _, payload = self._reader.read(length).split(b"\t", 1)
+        data = json.loads(payload)
+        self._memory.put(pokeid, data, len(payload))
+        return data
+
+    def _write(self, pokeid, name, data, meta):
+        # Metadata in the header lets a rebuilt index recover it. Later
+        # revalidations via `touch` are only saved in the index.
+        header = json.dumps({"key": pokeid, "name": name, "meta": meta}).encode()
+        payload = json.dumps(data).encode()
+        record = header + b"\t" + payload + b"\n"
+        offset = self._writer.tell()
+        self._writer.write(record)
+        # Readers use a separate handle, so push the record to the OS now.
+        self._writer.flush()
+        self._add(pokeid, name, meta, offset, len(record))
+        self._memory.put(pokeid, data, len(payload))
+
+    def __len__(self):
+        return len(self._index)
+
+    def keys(self):
+        return self._index.keys()
+
+    def flush(self):
+        logging.info(f"Syncing index to {self._index_path}.")
+        self._writer.flush()
+        ids_to_names = {pokeid: name for name, pokeid in self._names.items()}
+        saved = {
+            "size": self._writer.tell(),
+            "stale": self._stale,
+            "entries": [
+                [
+                    pokeid,
+                    offset,
+                    length,
+                    ids_to_names.get(pokeid),
+                    self._meta.get(pokeid),
+                ]
+                for pokeid, (offset, length) in self._index.items()
+            ],
+        }
+        tmp_path = self._index_path + ".tmp"
+        with open(tmp_path, "w") as index_file:
+            json.dump(saved, index_file)
+        os.replace(tmp_path, self._index_path)
+
+    def compact(self):
+        """Rewrite the log with only the newest record for each key."""
+        logging.info(f"Compacting {self._path} ({self._stale} stale records).")
+        tmp_path = self._path + ".tmp"
+        new_index = {}
+        with open(tmp_path, "wb") as compacted:
+            for key, (offset, length) in self._index.items():
+                self._reader.seek(offset)
+                new_index[key] = (compacted.tell(), length)
+                compacted.write(self._reader.read(length))
+
+        self._writer.close()
+        self._reader.close()
+        os.replace(tmp_path, self._path)
+        self._index = new_index
+        self._stale = 0
+        self._writer = open(self._path, "ab")  # noqa: SIM115
+        self._reader = open(self._path, "rb")  # noqa: SIM115
+        self.flush()
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+        self._reader.close()
+        self._memory.clear()
+
+    @property
+    def stats(self):
+        return self._memory.stats
+
+
+def open_cache(path, max_entries=256, max_bytes=None, by_url=False):
+    """Open the cache backend suited to path.
+
+    Parameters
+    ----------
+    path: str
+        Cache file path. Paths ending in `.json` use the legacy whole-file
+        `JsonCache`; everything else uses `LogCache`.
+    max_entries: Optional[int]
+        Entry limit for the in-memory tier of `LogCache`.
+    max_bytes: Optional[int]
+        Byte limit for the in-memory tier of `LogCache`.
+    by_url: bool
+        Key entries by resource URL instead of Pokédex number.
+
+    Returns
+    -------
+    CacheBackend
+        Opened cache.
+    """
+    if path.endswith(".json"):
+        return JsonCache(path, by_url)
+    return LogCache(path, max_entries, max_bytes, by_url)
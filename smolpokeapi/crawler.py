@@ -0,0 +1,58 @@
+# Resources linked from Pokémon that are worth following by default. Version
+# and game metadata links are everywhere and rarely useful.
+DEFAULT_FOLLOW = frozenset({"ability", "move", "pokemon-species", "type"})
+
+
+def resource_type(url, root):
+    """Get the endpoint name of a PokéAPI URL, such as "type" or "ability".
+
+    Parameters
+    ----------
+    url: str
+        Resource URL.
+    root: str
+        API root URL ending in a slash.
+
+    Returns
+    -------
+    Optional[str]
+        Endpoint name or None if url isn't under root.
+    """
+    if not url.startswith(root):
+        return None
+    return url[len(root):].split("/", 1)[0]
+
+
+def find_links(data, root, follow=DEFAULT_FOLLOW):
+    """Find linked resources in a PokéAPI payload.
+
+    PokéAPI links resources with `{"name": ..., "url": ...}` objects nested
+    anywhere in a payload.
+
+    Parameters
+    ----------
+    data: Any
+        Decoded PokéAPI JSON.
+    root: str
+        API root URL ending in a slash.
+    follow: Optional[Iterable[str]]
+        Endpoint names to follow. None follows every link.
+
+    Returns
+    -------
+    List[str]
+        Linked URLs in the order they appear without duplicates.
+    """
+    links = {}
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            url = node.get("url")
+            kind = resource_type(url, root) if isinstance(url, str) else None
+            if kind and (follow is None or kind in follow):
+                links[url] = None
+            stack.extend(reversed(node.values()))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+    return list(links)
@@ -0,0 +1,156 @@
+import json
+import logging
+import os
+import time
+
+from cache import normalize_key
+
+
+def parse_targets(targets):
+    """Parse command line Pokémon targets.
+
+    Parameters
+    ----------
+    targets: Iterable[str]
+        Pokédex numbers ("25"), inclusive ranges ("1-151"), or names
+        ("pikachu"). Each argument may hold several targets separated by
+        commas.
+
+    Returns
+    -------
+    List[int | str]
+        Normalized keys in order without duplicates.
+    """
+    keys = {}
+    for target in targets:
+        for part in filter(None, (p.strip() for p in target.split(","))):
+            start, sep, stop = part.partition("-")
+            if sep and start.isdecimal() and stop.isdecimal():
+                if int(stop) < int(start):
+                    raise ValueError(f"Range {part} is backwards.")
+                keys.update(dict.fromkeys(range(int(start), int(stop) + 1)))
+            else:
+                # Hyphenated names such as mr-mime land here too.
+                keys[normalize_key(part)] = None
+    return list(keys)
+
+
+class Checkpoint():
+    """Persistent progress of a scrape job.
+
+    Tracks completed, failed, and pending Pokémon in a JSON file that's
+    replaced atomically on every save, so a killed job can resume exactly
+    where it stopped.
+    """
+
+    def __init__(self, path, targets):
+        """
+        Parameters
+        ----------
+        path: str
+            Checkpoint file path. An existing checkpoint is resumed and
+            `targets` are added to its pending work.
+        targets: Iterable[int | str]
+            Normalized Pokémon keys for the job.
+        """
+        self._path = path
+        self.completed = set()
+        self.failed = {}
+        pending = dict.fromkeys(targets)
+
+        try:
+            with open(path, "r") as checkpoint:
+                saved = json.load(checkpoint)
+            self.completed = {normalize_key(key) for key in saved["completed"]}
+            # Previously failed Pokémon are retried on resume.
+            resumed = saved["pending"] + list(saved["failed"])
+            pending = dict.fromkeys(map(normalize_key, resumed)) | pending
+            logging.info(
+                f"Resuming {path}: {len(self.completed)} done, "
+                f"{len(saved['failed'])} failed."
+            )
+        except FileNotFoundError:
+            pass
+
+        self.pending = {key: None for key in pending if key not in self.completed}
+
+    def complete(self, pokeid, name=None):
+        """Mark a Pokémon as done.
+
+        Parameters
+        ----------
+        pokeid: int
+            Pokédex number.
+        name: Optional[str]
+            Pokémon name, in case the job asked for it by name.
+        """
+        keys = [pokeid]
+        if name is not None and (name := normalize_key(name)) in self.pending:
+            keys.append(name)
+        for key in keys:
+            self.pending.pop(key, None)
+            self.failed.pop(key, None)
+            self.completed.add(key)
+
+    def fail(self, key, reason):
+        """Mark a Pokémon as failed so a later run retries it."""
+        key = normalize_key(key)
+        self.pending.pop(key, None)
+        self.failed[key] = reason
+
+    def save(self):
+        saved = {
+            "completed": sorted(self.completed, key=str),
+            "failed": {str(key): reason for key, reason in self.failed.items()},
+            "pending": list(self.pending),
+        }
+        tmp_path = self._path + ".tmp"
+        with open(tmp_path, "w") as checkpoint:
+            json.dump(saved, checkpoint)
+        os.replace(tmp_path, self._path)
+
+
+class Progress():
+    """Throughput and ETA reporting for a scrape job."""
+
+    def __init__(self, total, interval=2.0):
+        """
+        Parameters
+        ----------
+        total: int
+            Number of Pokémon in the job.
+        interval: float
+            Minimum seconds between reports.
+        """
+        self._total = total
+        self._interval = interval
+        self._start = time.monotonic()
+        self._last_report = self._start
+        self.done = 0
+
+    def report(self, transfer_stats, force=False):
+        """Print progress if `interval` has passed since the last report.
+
+        Parameters
+        ----------
+        transfer_stats: Dict[str, int]
+            Requests sent and bytes received so far.
+        force: bool
+            Print regardless of the interval.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_report < self._interval:
+            return
+        self._last_report = now
+
+        elapsed = max(now - self._start, 1e-9)
+        per_second = self.done / elapsed
+        remaining = self._total - self.done
+        eta = f"{remaining / per_second:.0f}s" if per_second else "?"
+        print(
+            f"{self.done}/{self._total} Pokémon | "
+            f"{transfer_stats['requests'] / elapsed:.2f} req/s | "
+            f"{transfer_stats['bytes'] / elapsed / 1024:.1f} KiB/s | "
+            f"ETA {eta}",
+            flush=True,
+        )
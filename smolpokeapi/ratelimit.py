@@ -0,0 +1,57 @@
+import asyncio
+
+
+class TokenBucket():
+    """Token bucket rate limiter shared by concurrent requests.
+
+    Tokens refill continuously at `rate` per second up to `capacity`. Each
+    request spends one token, so short bursts of up to `capacity` requests are
+    allowed while the long run average never exceeds `rate`.
+    """
+
+    def __init__(self, rate, capacity=1):
+        """
+        Parameters
+        ----------
+        rate: float
+            Tokens (requests) added per second.
+        capacity: int
+            Maximum number of tokens that may accumulate.
+        """
+        if rate <= 0:
+            raise ValueError(f"Rate must be positive; got {rate}.")
+        if capacity < 1:
+            raise ValueError(f"Capacity must be at least 1; got {capacity}.")
+
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = None
+        # Waiters queue on the lock so tokens are handed out in FIFO order.
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now):
+        if self._updated is not None:
+            elapsed = now - self._updated
+            self._tokens = min(self._capacity, self._tokens + elapsed * self._rate)
+        self._updated = now
+
+    async def acquire(self):
+        """Wait until a token is available and spend it."""
+        async with self._lock:
+            aloop = asyncio.get_running_loop()
+            while True:
+                self._refill(aloop.time())
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+    def penalize(self, seconds):
+        """Stop handing out tokens for `seconds`, e.g. after a 429 response.
+
+        The bucket goes into debt so every waiter is delayed, not just the
+        request that was rejected.
+        """
+        self._refill(asyncio.get_running_loop().time())
+        self._tokens = min(self._tokens, 0) - seconds * self._rate
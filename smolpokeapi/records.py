@@ -0,0 +1,193 @@
+from dataclasses import asdict, dataclass, fields
+from typing import Optional
+
+# PokéAPI stat names to data/pokedex.csv columns
+_STATS = {
+    "hp": "hp",
+    "attack": "attack",
+    "defense": "defense",
+    "special-attack": "sp_attack",
+    "special-defense": "sp_defense",
+    "speed": "speed",
+}
+
+
+@dataclass(slots=True)
+class PokemonRecord():
+    """Compact Pokémon record using the column names of `data/pokedex.csv`.
+
+    Only the columns that the PokéAPI `pokemon` endpoint provides are
+    included. Names of Pokémon, types, and abilities are kept as the API
+    spells them (lower case and hyphenated) so they still work as cache keys.
+    """
+    pokedex_number: int
+    name: str
+    type_number: Optional[int] = None
+    type_1: Optional[str] = None
+    type_2: Optional[str] = None
+    height_m: Optional[float] = None
+    weight_kg: Optional[float] = None
+    abilities_number: Optional[int] = None
+    ability_1: Optional[str] = None
+    ability_2: Optional[str] = None
+    ability_hidden: Optional[str] = None
+    total_points: Optional[int] = None
+    hp: Optional[int] = None
+    attack: Optional[int] = None
+    defense: Optional[int] = None
+    sp_attack: Optional[int] = None
+    sp_defense: Optional[int] = None
+    speed: Optional[int] = None
+    base_experience: Optional[int] = None
+
+    def to_dict(self):
+        return asdict(self)
+
+
+POKEDEX_FIELDS = tuple(field.name for field in fields(PokemonRecord))
+# Fields every projection keeps so records can be cached and looked up.
+_KEY_FIELDS = ("pokedex_number", "name")
+
+# Arrow types matching the dtypes pandas infers for data/pokedex.csv. A few
+# stats are written like "90.0" in the CSV, so every stat is a float.
+_ARROW_TYPES = {
+    "pokedex_number": "int64",
+    "name": "string",
+    "type_number": "int64",
+    "type_1": "string",
+    "type_2": "string",
+    "height_m": "float64",
+    "weight_kg": "float64",
+    "abilities_number": "int64",
+    "ability_1": "string",
+    "ability_2": "string",
+    "ability_hidden": "string",
+    "total_points": "float64",
+    "hp": "float64",
+    "attack": "float64",
+    "defense": "float64",
+    "sp_attack": "float64",
+    "sp_defense": "float64",
+    "speed": "float64",
+    "base_experience": "float64",
+}
+
+
+def check_fields(keep):
+    """Validate a projection and add the fields every record needs.
+
+    Parameters
+    ----------
+    keep: Iterable[str]
+        Fields of `PokemonRecord` to keep.
+
+    Returns
+    -------
+    Tuple[str, ...]
+        Fields in `PokemonRecord` order.
+    """
+    keep = set(keep)
+    if unknown := keep.difference(POKEDEX_FIELDS):
+        raise ValueError(f"Unknown Pokémon fields: {', '.join(sorted(unknown))}.")
+    keep.update(_KEY_FIELDS)
+    return tuple(field for field in POKEDEX_FIELDS if field in keep)
+
+
+def project(payload, keep=POKEDEX_FIELDS):
+    """Project a raw PokéAPI `pokemon` payload onto a subset of fields.
+
+    Parameters
+    ----------
+    payload: Dict[str, Any]
+        Raw PokéAPI data for one Pokémon.
+    keep: Iterable[str]
+        Fields of `PokemonRecord` to keep. Validate with `check_fields`.
+
+    Returns
+    -------
+    Dict[str, Any]
+        Projected fields.
+    """
+    types = sorted(payload["types"], key=lambda t: t["slot"])
+    types = [t["type"]["name"] for t in types]
+    abilities = sorted(payload["abilities"], key=lambda a: a["slot"])
+    visible = [a["ability"]["name"] for a in abilities if not a["is_hidden"]]
+    hidden = [a["ability"]["name"] for a in abilities if a["is_hidden"]]
+    stats = {_STATS[s["stat"]["name"]]: s["base_stat"] for s in payload["stats"]}
+
+    full = {
+        "pokedex_number": payload["id"],
+        "name": payload["name"],
+        "type_number": len(types),
+        "type_1": types[0] if types else None,
+        "type_2": types[1] if len(types) > 1 else None,
+        # PokéAPI uses decimeters and hectograms.
+        "height_m": payload["height"] / 10,
+        "weight_kg": payload["weight"] / 10,
+        "abilities_number": len(abilities),
+        "ability_1": visible[0] if visible else None,
+        "ability_2": visible[1] if len(visible) > 1 else None,
+        "ability_hidden": hidden[0] if hidden else None,
+        "total_points": sum(stats.values()),
+        **stats,
+        "base_experience": payload.get("base_experience"),
+    }
+    return {field: full.get(field) for field in keep}
+
+
+def is_projected(data):
+    """Check if cached data is a projection rather than a raw payload."""
+    return "pokedex_number" in data
+
+
+def to_record(data, keep=POKEDEX_FIELDS):
+    """Convert cached data, raw or projected, into a `PokemonRecord`."""
+    if not is_projected(data):
+        data = project(data, keep)
+    return PokemonRecord(**data)
+
+
+def records_to_table(records, keep=POKEDEX_FIELDS):
+    """Convert records into a columnar Arrow table.
+
+    Parameters
+    ----------
+    records: Iterable[PokemonRecord]
+        Records to convert.
+    keep: Iterable[str]
+        Columns to include.
+
+    Returns
+    -------
+    pyarrow.Table
+        Table with the column names and types of `data/pokedex.csv`.
+    """
+    import pyarrow as pa
+
+    keep = check_fields(keep)
+    columns = {field: [] for field in keep}
+    for record in records:
+        for field in keep:
+            columns[field].append(getattr(record, field))
+
+    schema = pa.schema([(field, _ARROW_TYPES[field]) for field in keep])
+    return pa.Table.from_pydict(columns, schema=schema)
+
+
+def export_parquet(records, path, keep=POKEDEX_FIELDS, compression="zstd"):
+    """Write records to a Parquet file.
+
+    Parameters
+    ----------
+    records: Iterable[PokemonRecord]
+        Records to write.
+    path: str
+        Output path.
+    keep: Iterable[str]
+        Columns to include.
+    compression: str
+        Parquet compression codec.
+    """
+    import pyarrow.parquet as pq
+
+    pq.write_table(records_to_table(records, keep), path, compression=compression)
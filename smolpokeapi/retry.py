@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+
+import aiohttp
+
+
+def parse_retry_after(value):
+    """Parse a Retry-After header into seconds.
+
+    Parameters
+    ----------
+    value: Optional[str]
+        Header value as either delay seconds or an HTTP date.
+
+    Returns
+    -------
+    Optional[float]
+        Seconds to wait or None if the header is missing or malformed.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def describe_error(error):
+    """Summarize a request error in one short line."""
+    if isinstance(error, aiohttp.ClientResponseError):
+        return f"HTTP {error.status} {error.message}"
+    return f"{type(error).__name__}: {error}" if str(error) else type(error).__name__
+
+
+@dataclass(frozen=True)
+class RetryPolicy():
+    """How failed requests are retried.
+
+    Delays grow exponentially from `base_delay` up to `max_delay` and use
+    full jitter (a uniform draw between zero and the exponential delay) so
+    concurrent workers don't retry in lockstep. A Retry-After header from
+    the API takes precedence over the computed delay but is also capped at
+    `max_delay`, so a misbehaving server can't stall the scrape indefinitely.
+    """
+    attempts: int = 5
+    base_delay: float = 0.5
+    max_delay: float = 60.0
+    retry_statuses: frozenset = frozenset({408, 429, 500, 502, 503, 504})
+
+    def is_retryable(self, error):
+        """Check if a request error is worth retrying.
+
+        Timeouts and connection errors are always retried. HTTP errors are
+        retried only for `retry_statuses`.
+        """
+        if isinstance(error, aiohttp.ClientResponseError):
+            return error.status in self.retry_statuses
+        return isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError))
+
+    def should_retry(self, error, attempt):
+        """Check if another attempt follows failed attempt number `attempt`.
+
+        Parameters
+        ----------
+        error: Exception
+            Error raised by the failed attempt.
+        attempt: int
+            Zero based attempt number.
+        """
+        return attempt + 1 < self.attempts and self.is_retryable(error)
+
+    def delay(self, attempt, retry_after=None):
+        """Seconds to wait before the attempt following `attempt`.
+
+        Parameters
+        ----------
+        attempt: int
+            Zero based number of the attempt that failed.
+        retry_after: Optional[float]
+            Delay requested by the API, used up to `max_delay`.
+        """
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+
+class CircuitBreaker():
+    """Pause every worker after too many consecutive failures.
+
+    After `threshold` failures in a row the breaker opens and `wait` blocks
+    until `cooldown` seconds have passed. The breaker is then half open:
+    the first task through `wait` sends a trial request while the others
+    keep waiting. A successful trial closes the breaker and releases them;
+    a failed one opens it for another cooldown. A trial task that finishes
+    without reporting either hands the trial to the next waiter.
+
+    Only the trial's outcome counts while the breaker is open or half open;
+    requests that were already in flight when it opened are ignored.
+    """
+
+    def __init__(self, threshold=5, cooldown=30.0):
+        """
+        Parameters
+        ----------
+        threshold: int
+            Consecutive failures that open the breaker.
+        cooldown: float
+            Seconds to pause once the breaker opens.
+        """
+        self._threshold = threshold
+        self._cooldown = cooldown
+        self._failures = 0
+        self._open_until = 0.0
+        self._half_open = False
+        self._trial = None
+        self._trial_done = None
+
+    @property
+    def is_open(self):
+        return asyncio.get_running_loop().time() < self._open_until
+
+    async def wait(self):
+        """Wait until the breaker is closed or this task is its trial."""
+        aloop = asyncio.get_running_loop()
+        while True:
+            if (remaining := self._open_until - aloop.time()) > 0:
+                await asyncio.sleep(remaining)
+            elif not self._half_open or self._trial is asyncio.current_task():
+                return
+            elif self._trial is None:
+                self._start_trial(asyncio.current_task())
+                return
+            else:
+                await self._trial_done.wait()
+
+    def _start_trial(self, task):
+        self._trial = task
+        self._trial_done = asyncio.Event()
+        task.add_done_callback(self._end_trial)
+
+    def _end_trial(self, task):
+        """Release the waiters once `task` is no longer the trial."""
+        if task is not self._trial:
+            return
+        self._trial.remove_done_callback(self._end_trial)
+        self._trial = None
+        self._trial_done.set()
+
+    def _open(self):
+        self._open_until = asyncio.get_running_loop().time() + self._cooldown
+        self._half_open = True
+
+    def record_success(self):
+        self._failures = 0
+        if self._trial is asyncio.current_task():
+            self._half_open = False
+            self._end_trial(self._trial)
+
+    def record_failure(self):
+        if self._trial is asyncio.current_task():
+            logging.critical(f"Trial request failed. Pausing for {self._cooldown}s.")
+            self._open()
+            self._end_trial(self._trial)
+        elif not self._half_open:
+            self._failures += 1
+            if self._failures >= self._threshold:
+                logging.critical(
+                    f"{self._failures} failures in a row. "
+                    f"Pausing for {self._cooldown}s."
+                )
+                self._open()
@@ -1,76 +1,145 @@
-import aiofiles
 import asyncio
 import json
 import logging
+import time
+
+import aiohttp
+
+from cache import canonical_url, normalize_key, open_cache
+from crawler import DEFAULT_FOLLOW, find_links
+from ratelimit import TokenBucket
+from records import POKEDEX_FIELDS, check_fields, export_parquet, project, to_record
+from retry import CircuitBreaker, RetryPolicy, describe_error, parse_retry_after
 
-# Replace with aiohttp later.
-from requests import Session, HTTPError
 
 class SmolPokeApiScraper():
-    _POKEAPI = "https://pokeapi.co/api/v2/pokemon/{}"
+    _API_ROOT = "https://pokeapi.co/api/v2/"
+    _POKEAPI = _API_ROOT + "pokemon/{}"
 
     @classmethod
     async def new(cls,
-                  cache_path="pokeapi_cache.json",
-                  throttle=5,
-                  timeout=30):
+                  cache_path="pokeapi_cache.log",
+                  cache=None,
+                  cache_entries=256,
+                  cache_bytes=None,
+                  rate=2.0,
+                  burst=4,
+                  max_in_flight=8,
+                  timeout=30,
+                  ttl=None,
+                  projection=None,
+                  retry=None,
+                  breaker_threshold=5,
+                  breaker_cooldown=30.0,
+                  resource_cache_path="pokeapi_resources.log"):
+        """Create a scraper and load its cache.
+
+        Parameters
+        ----------
+        cache_path: str
+            Path to the Pokémon API data cache. See `cache.open_cache` for how
+            the backend is chosen.
+        cache: Optional[CacheBackend]
+            Already opened cache backend to use instead of `cache_path`.
+        cache_entries: Optional[int]
+            Maximum number of Pokémon held in memory by the cache.
+        cache_bytes: Optional[int]
+            Maximum serialized size of Pokémon held in memory by the cache.
+        rate: float
+            Maximum average requests per second.
+        burst: int
+            Number of requests that may be sent back to back before `rate`
+            applies.
+        max_in_flight: int
+            Maximum number of concurrent requests. Also caps the size of the
+            connection pool.
+        timeout: float
+            Total timeout in seconds for each request.
+        ttl: Optional[float]
+            Seconds before a cached Pokémon is revalidated with the API. None
+            keeps cached Pokémon forever unless a refresh is requested.
+        projection: Optional[Iterable[str]]
+            Fields of `records.PokemonRecord` to keep. Scraped payloads are
+            cached as just these fields and results are yielded as
+            `PokemonRecord`s. None caches and yields raw payloads.
+        retry: Optional[RetryPolicy]
+            How failed requests are retried. Defaults to `RetryPolicy()`.
+        breaker_threshold: int
+            Consecutive failed requests that pause all requests.
+        breaker_cooldown: float
+            Seconds to pause once `breaker_threshold` is reached.
+        resource_cache_path: str
+            Path to the cache of other API resources fetched by
+            `fetch_resource` and `crawl`. Opened on first use.
+        """
         logging.basicConfig(level=logging.INFO)
 
         self = SmolPokeApiScraper()
         try:
-            load_task = asyncio.create_task(self._load_cache(cache_path))
-            self._last_time = asyncio.get_running_loop().time()
-            await load_task
+            if cache is None:
+                # Opening reads the cache's index from disk.
+                cache = await asyncio.to_thread(
+                    open_cache, cache_path, cache_entries, cache_bytes
+                )
         except RuntimeError:
             logging.critical("No running executor for SmolPokeApiScraper.")
             raise
-        self._session = Session()
-        self._throttle = throttle
-        self._timeout = timeout
+        self._cache = cache
+        self._ttl = ttl
+        self._keep = check_fields(projection) if projection is not None else None
+        self._bucket = TokenBucket(rate, burst)
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._retry = retry or RetryPolicy()
+        self._breaker = CircuitBreaker(breaker_threshold, breaker_cooldown)
+        # Pokédex number or name -> last error, for resuming later
+        self._failed = {}
+        self._requests = 0
+        self._bytes = 0
+        self._resource_cache_path = resource_cache_path
+        self._resources = None
+        self._resources_lock = asyncio.Lock()
+        # URL -> Task for resource requests in flight, shared by every caller
+        self._pending_resources = {}
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=max_in_flight),
+            timeout=aiohttp.ClientTimeout(total=timeout),
+            raise_for_status=True,
+        )
         return self
 
-    async def _load_cache(self, cache_path):
-        """Create or load Pokémon API data cache.
-
-        Parameters
-        ----------
-        path: str
-            File path. Loads cached Pokémon API data as JSON if exists or else
-            creates a new file.
-        """
-        try:
-            async with aiofiles.open(cache_path, 'r') as cache:
-                buffer = await cache.read()
-                self._cache = json.loads(buffer)
-                logging.info(f"Loaded cache from {cache_path}.")
-        except FileNotFoundError:
-            # Create an empty cache if the file doesn't exist.
-            # Also...just bubble up the rest of the errors.
-            logging.info(f"No cache found at {cache_path}. Creating new cache.")
-            self._cache = {}
-        self._cache_path = cache_path
-
     async def sync(self):
         """Write cached data to file.
         """
-        logging.info(f"Syncing to {self._cache_path}.")
-        json_se = json.dumps(self._cache)
-        async with aiofiles.open(self._cache_path, 'w') as cache:
-            await cache.write(json_se)
+        await asyncio.to_thread(self._cache.flush)
+        if self._resources is not None:
+            await asyncio.to_thread(self._resources.flush)
+
+    async def compact(self):
+        """Rewrite the cache file without replaced entries.
+        """
+        await asyncio.to_thread(self._cache.compact)
+
+    @property
+    def cache_stats(self):
+        """Dict[str, int]: Hit, miss, and eviction counters for the cache."""
+        return self._cache.stats
 
     async def __aenter__(self):
         return self
 
     async def __aexit__(self, exc_type, exc, tb):
-        await self.sync()
+        await asyncio.to_thread(self._cache.close)
+        if self._resources is not None:
+            await asyncio.to_thread(self._resources.close)
+        await self._session.close()
 
     def __getitem__(self, pokenum):
         """Retrieve Pokémon data from cache if exists.
 
         Parameters
         ----------
-        pokenum: int
-            Pokémon number as integer.
+        pokenum: int | str
+            Pokémon number as an integer or numeric string, or Pokémon name.
         """
         return self._cache[pokenum]
 
@@ -79,8 +148,8 @@ class SmolPokeApiScraper():
 
         Parameters
         ----------
-        pokenum: int
-            Pokémon number as integer.
+        pokenum: int | str
+            Pokémon number as an integer or numeric string, or Pokémon name.
         data: dict[Any]
             Pokémon API data.
         """
@@ -96,24 +165,13 @@ class SmolPokeApiScraper():
         """
         self._cache.update(new_pokemon)
 
-    async def check_time(self):
-        """Throttle requests."""
-        aloop = asyncio.get_running_loop()
-        # Check if `throttle` seconds have elapsed.
-        sleep_time = self._throttle - (aloop.time() - self._last_time)
-        if sleep_time > 0:
-            logging.info(f"Pausing for {sleep_time} seconds.")
-            await asyncio.sleep(sleep_time)
-        # Update last_name to the current time.
-        self._last_time = aloop.time()
-
     def create_url(pokenum):
         """Create a PokéAPI URL from a Pokémon number.
 
         Parameters
         ----------
-        pokenum: int
-            Pokémon number, such as 25 for Pikachu.
+        pokenum: int | str
+            Pokémon number, such as 25 for Pikachu, or name, such as pikachu.
 
         Returns
         -------
@@ -123,43 +181,345 @@ class SmolPokeApiScraper():
         return SmolPokeApiScraper._POKEAPI.format(pokenum)
 
 
-    async def get_pokemon(self, pokemon_nums):
-        """Retrieve data for an Iterable of Pokédex numbers.
+    @staticmethod
+    def _validators(cache, key):
+        """Conditional request headers for a cached entry."""
+        headers = {}
+        if meta := cache.meta(key):
+            if meta["etag"]:
+                headers["If-None-Match"] = meta["etag"]
+            if meta["last_modified"]:
+                headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
 
-        pokemon_nums: Iterable[int]
-            Pokédex numbers.
+    async def _request(self, url, label, headers):
+        """Send one rate limited GET request.
 
         Returns
         -------
-        Dict[int, Dict[str, Any]]
-            Pokémon data.
+        Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]
+            Decoded JSON and cache metadata, or (None, None) if the API
+            responded 304 Not Modified.
         """
-        pokedata = {}
+        # The semaphore bounds the requests in flight while the bucket bounds
+        # the rate at which new ones start.
+        async with self._in_flight:
+            await self._bucket.acquire()
+            logging.info(f"Scraping data for {label}.")
+            self._requests += 1
+            async with self._session.get(url, headers=headers) as resp:
+                if resp.status == 304:
+                    logging.info(f"{label} hasn't changed.")
+                    return None, None
+                body = await resp.read()
+                self._bytes += len(body)
+                meta = {
+                    "fetched": time.time(),
+                    "etag": resp.headers.get("ETag"),
+                    "last_modified": resp.headers.get("Last-Modified"),
+                    "ttl": self._ttl,
+                }
+        return json.loads(body), meta
+
+    async def _request_retrying(self, url, label, headers):
+        """Send a GET request, retrying failures according to the retry policy.
+
+        Parameters
+        ----------
+        url: str
+            Resource URL.
+        label: int | str
+            Pokémon or resource being requested. Failures are recorded in
+            `failed` under this label.
+        headers: Dict[str, str]
+            Request headers.
 
-        for pokenum in pokemon_nums:
-            logging.info(f"Scraping data for {pokenum}.")
+        Returns
+        -------
+        Optional[Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]]
+            Result of `_request` or None if every attempt failed.
+        """
+        attempt = 0
+        while True:
+            await self._breaker.wait()
+            retry_after = None
+            try:
+                result = await self._request(url, label, headers)
+            except aiohttp.ClientResponseError as e:
+                error = e
+                retry_after = parse_retry_after((e.headers or {}).get("Retry-After"))
+                if e.status == 429:
+                    # Slow every worker down, not just this one.
+                    self._bucket.penalize(self._retry.delay(attempt, retry_after))
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = e
+            else:
+                self._breaker.record_success()
+                self._failed.pop(label, None)
+                return result
+
+            if self._retry.is_retryable(error):
+                self._breaker.record_failure()
+            else:
+                # Missing Pokémon and other client errors show the API is up.
+                self._breaker.record_success()
+            if not self._retry.should_retry(error, attempt):
+                reason = describe_error(error)
+                logging.critical(f"Giving up on {label}: {reason}")
+                self._failed[label] = reason
+                return None
+
+            delay = self._retry.delay(attempt, retry_after)
+            logging.warning(
+                f"Retrying {label} in {delay:.2f}s after {describe_error(error)}"
+            )
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _fetch(self, pokenum, revalidate=False):
+        """Request data for one Pokédex number and cache it.
+
+        Parameters
+        ----------
+        pokenum: int | str
+            Normalized Pokédex number or Pokémon name.
+        revalidate: bool
+            Send a conditional request using the cached entry's validators
+            and keep the cached data if the API responds 304 Not Modified.
+
+        Returns
+        -------
+        Tuple[int, Optional[Dict[str, Any] | PokemonRecord]]
+            Pokédex number and its data or None if every attempt failed.
+        """
+        url = SmolPokeApiScraper.create_url(pokenum)
+        headers = self._validators(self._cache, pokenum) if revalidate else {}
+        if (result := await self._request_retrying(url, pokenum, headers)) is None:
+            return pokenum, None
+
+        data, meta = result
+        if data is None:
+            self._cache.touch(pokenum, ttl=self._ttl)
+            pokeid = self._cache.resolve(pokenum)
+            return pokeid, self._output(self._cache[pokeid])
+
+        pokeid = data["id"]
+        if self._keep:
+            data = project(data, self._keep)
+        # Always update the cache if the request succeeded
+        self._cache.put(pokeid, data, meta)
+        return pokeid, self._output(data)
+
+    @property
+    def transfer_stats(self):
+        """Dict[str, int]: Requests sent and response bytes received."""
+        return {"requests": self._requests, "bytes": self._bytes}
+
+    @property
+    def failed(self):
+        """Dict[int | str, str]: Pokémon and resources that failed and why.
+
+        Pass the Pokémon keys to `get_pokemon` or the resource URLs to
+        `fetch_resource` to retry them later.
+        """
+        return self._failed
+
+    def _output(self, data):
+        """Convert cached data into what the scraper yields."""
+        return to_record(data, self._keep) if self._keep else data
+
+    async def stream_pokemon(self, pokemon_nums, refresh=False):
+        """Retrieve data for an Iterable of Pokédex numbers as it arrives.
+
+        Fresh cached Pokémon are yielded first followed by scraped Pokémon in
+        the order their requests complete. Cached Pokémon past their TTL are
+        revalidated with conditional requests. Failed requests are logged and
+        skipped.
+
+        pokemon_nums: Iterable[int | str]
+            Pokédex numbers, numeric strings, or Pokémon names.
+        refresh: bool
+            Revalidate every cached Pokémon regardless of its TTL. Unchanged
+            Pokémon cost a request but no download.
+
+        Yields
+        ------
+        Tuple[int, Dict[str, Any] | PokemonRecord]
+            Pokédex number and its data, projected if the scraper has a
+            projection.
+        """
+        tasks = []
+        for pokenum in map(normalize_key, pokemon_nums):
+            cached = pokenum in self._cache
             # Check if the Pokémon data exists in the cache
             # instead of scraping again.
-            if data := self._cache.get(pokenum):
-                pokedata[pokenum] = data
+            if cached and not refresh and self._cache.is_fresh(pokenum, self._ttl):
                 logging.warning(f"{pokenum} already exists in the cache.")
+                yield self._cache.resolve(pokenum), self._output(self._cache[pokenum])
                 continue
+            tasks.append(asyncio.create_task(self._fetch(pokenum, revalidate=cached)))
 
-            # Throttle to avoid spamming the API and sync the cache
-            time_task = self.check_time()
-            sync_task = self.sync()
-            await asyncio.gather(time_task, sync_task)
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                pokenum, data = await next_done
+                if data is not None:
+                    yield pokenum, data
+        finally:
+            # Don't leave requests running if the consumer stops early.
+            for task in tasks:
+                task.cancel()
 
-            try:
-                url = SmolPokeApiScraper.create_url(pokenum)
-                resp = self._session.get(url, timeout=self._timeout)
-                # Raise an error for a non-200 HTTP status.
-                resp.raise_for_status()
-                resp = resp.json()
-                pokedata[pokenum] = resp
-                # Always update the cache if the request succeeded
-                self.update({pokenum: resp})
-            except HTTPError as e:
-                logging.critical(f"HTTP status error {e} for Pokémon number {pokenum}.")
+    async def get_pokemon(self, pokemon_nums, refresh=False):
+        """Retrieve data for an Iterable of Pokédex numbers.
+
+        pokemon_nums: Iterable[int | str]
+            Pokédex numbers, numeric strings, or Pokémon names.
+        refresh: bool
+            Revalidate every cached Pokémon. See `stream_pokemon`.
 
+        Returns
+        -------
+        Dict[int, Dict[str, Any] | PokemonRecord]
+            Pokémon data.
+        """
+        pokedata = {}
+        async for pokenum, data in self.stream_pokemon(pokemon_nums, refresh):
+            pokedata[pokenum] = data
+
+        await self.sync()
         return pokedata
+
+    async def export_parquet(self, path, pokemon_nums=None):
+        """Write cached Pokémon to Parquet using the `data/pokedex.csv` columns.
+
+        Parameters
+        ----------
+        path: str
+            Output path.
+        pokemon_nums: Optional[Iterable[int | str]]
+            Pokémon to export. Defaults to every cached Pokémon.
+        """
+        keep = self._keep or POKEDEX_FIELDS
+        if pokemon_nums is None:
+            pokemon_nums = sorted(self._cache.keys())
+
+        def records():
+            for pokenum in pokemon_nums:
+                if (data := self._cache.get(pokenum)) is not None:
+                    yield to_record(data, keep)
+
+        logging.info(f"Exporting Pokémon to {path}.")
+        await asyncio.to_thread(export_parquet, records(), path, keep)
+
+    def resource_url(self, endpoint):
+        """Create a canonical PokéAPI URL.
+
+        Parameters
+        ----------
+        endpoint: str
+            Full URL or path under the API root, such as "type/13".
+
+        Returns
+        -------
+        str
+            Canonical URL.
+        """
+        if not endpoint.startswith(("http://", "https://")):
+            endpoint = self._API_ROOT + endpoint.lstrip("/")
+        return canonical_url(endpoint)
+
+    async def _resource_cache(self):
+        async with self._resources_lock:
+            if self._resources is None:
+                self._resources = await asyncio.to_thread(
+                    open_cache, self._resource_cache_path, by_url=True
+                )
+        return self._resources
+
+    async def _fetch_resource(self, url, revalidate):
+        resources = await self._resource_cache()
+        headers = self._validators(resources, url) if revalidate else {}
+        if (result := await self._request_retrying(url, url, headers)) is None:
+            return None
+
+        data, meta = result
+        if data is None:
+            resources.touch(url, ttl=self._ttl)
+            return resources[url]
+        resources.put(url, data, meta)
+        return data
+
+    async def fetch_resource(self, endpoint, refresh=False):
+        """Retrieve any PokéAPI resource, such as a type or an ability.
+
+        Each resource is cached once by URL. Concurrent calls for the same
+        URL share a single request.
+
+        Parameters
+        ----------
+        endpoint: str
+            Full URL or path under the API root, such as "type/13".
+        refresh: bool
+            Revalidate the cached resource regardless of its TTL.
+
+        Returns
+        -------
+        Optional[Dict[str, Any]]
+            Resource data or None if the request failed.
+        """
+        url = self.resource_url(endpoint)
+        resources = await self._resource_cache()
+        cached = url in resources
+        if cached and not refresh and resources.is_fresh(url, self._ttl):
+            return resources[url]
+
+        if (task := self._pending_resources.get(url)) is None:
+            task = asyncio.create_task(self._fetch_resource(url, revalidate=cached))
+            self._pending_resources[url] = task
+            task.add_done_callback(lambda _: self._pending_resources.pop(url, None))
+        # Shield the shared request so one cancelled caller doesn't cancel it
+        # for everyone else.
+        return await asyncio.shield(task)
+
+    async def crawl(self, endpoints, depth=1, follow=DEFAULT_FOLLOW):
+        """Fetch resources and the resources they link to, breadth first.
+
+        Parameters
+        ----------
+        endpoints: Iterable[str]
+            Full URLs or paths under the API root to start from, such as
+            "pokemon/25".
+        depth: int
+            How many links away from `endpoints` to follow. Zero fetches only
+            `endpoints`.
+        follow: Optional[Iterable[str]]
+            Endpoint names to follow, such as "type". None follows every
+            link, which reaches a large part of the API.
+
+        Returns
+        -------
+        Dict[str, Dict[str, Any]]
+            Resource data keyed by URL. Failed resources are left out and
+            recorded in `failed`.
+        """
+        root = canonical_url(self._API_ROOT)
+        frontier = list(dict.fromkeys(map(self.resource_url, endpoints)))
+        seen = set(frontier)
+        crawled = {}
+
+        for level in range(depth + 1):
+            logging.info(f"Crawling {len(frontier)} resources at depth {level}.")
+            fetched = await asyncio.gather(*map(self.fetch_resource, frontier))
+            next_frontier = []
+            for url, data in zip(frontier, fetched, strict=True):
+                if data is None:
+                    continue
+                crawled[url] = data
+                if level < depth:
+                    for link in map(canonical_url, find_links(data, root, follow)):
+                        if link not in seen:
+                            seen.add(link)
+                            next_frontier.append(link)
+            frontier = next_frontier
+
+        return crawled
@@ -0,0 +1,48 @@
+"""Shared fixtures."""
+import numpy as np
+import pandas as pd
+import pytest
+
+# PSUs in each stratum of the synthetic survey; the last stratum has one.
+PSUS_PER_STRATUM: list[int] = [2, 3, 2, 4, 1]
+
+
+@pytest.fixture(scope="session")
+def survey() -> pd.DataFrame:
+    """Small stratified cluster sample shaped like a loader output.
+
+    PSUs are numbered within their stratum like the GSS's `vpsu`. `y` and
+    `x` are numeric with missing values, and `sex`, `party`, and `year` are
+    categorical.
+    """
+    rng: np.random.Generator = np.random.default_rng(765)
+    frames: list[pd.DataFrame] = []
+    for stratum, psus in enumerate(PSUS_PER_STRATUM, start=1):
+        for psu in range(1, psus + 1):
+            rows: int = int(rng.integers(6, 16))
+            frames.append(
+                pd.DataFrame(
+                    {
+                        "vstrat": stratum,
+                        "vpsu": psu,
+                        "wtssall": rng.uniform(0.5, 3.0, rows),
+                        # PSUs differ, so the design effect is visible.
+                        "x": rng.normal(psu, 1.0, rows),
+                    }
+                )
+            )
+    data: pd.DataFrame = pd.concat(frames, ignore_index=True)
+
+    n: int = len(data)
+    data["y"] = 2.0 + 0.5 * data["x"] + rng.normal(0.0, 1.0, n)
+    data.loc[rng.random(n) < 0.1, "y"] = np.nan
+    data.loc[rng.random(n) < 0.05, "x"] = np.nan
+    data["year"] = rng.choice([2012, 2016], n)
+    data["sex"] = pd.Categorical(rng.choice(["Female", "Male"], n))
+    data["party"] = pd.Categorical(
+        rng.choice(
+            ["Democrat", "Independent", "Republican", None], n, p=[0.4, 0.25, 0.3, 0.05]
+        ),
+        categories=["Democrat", "Independent", "Republican"],
+    )
+    return data
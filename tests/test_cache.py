@@ -0,0 +1,86 @@
+"""Cache keys and lookups by Pokédex number or name."""
+import numpy as np
+import pytest
+
+from cache import canonical_url, normalize_key, open_cache
+
+
+def pokemon(pokeid, name):
+    return {"id": pokeid, "name": name}
+
+
+@pytest.mark.parametrize(
+    ("key", "expected"),
+    [
+        (25, 25),
+        (np.int64(25), 25),
+        ("25", 25),
+        (" 025\n", 25),
+        ("Pikachu", "pikachu"),
+        ("  MR-MIME ", "mr-mime"),
+        ("\tporygon2", "porygon2"),
+    ],
+)
+def test_normalize_key(key, expected):
+    normalized = normalize_key(key)
+    assert normalized == expected
+    assert type(normalized) is type(expected)
+
+
+@pytest.mark.parametrize("key", [True, 25.0, None])
+def test_normalize_key_invalid(key):
+    with pytest.raises(TypeError):
+        normalize_key(key)
+
+
+def test_canonical_url():
+    url = "https://pokeapi.co/api/v2/type/3/"
+    assert canonical_url(url) == url
+    assert canonical_url(" https://pokeapi.co/api/v2/type/3") == url
+
+
+@pytest.fixture(params=["pokeapi.log", "pokeapi.json"])
+def path(request, tmp_path):
+    return str(tmp_path / request.param)
+
+
+def test_name_index(path):
+    cache = open_cache(path)
+    cache[25] = pokemon(25, "pikachu")
+    # A name is only a key once the payload gives its Pokédex number.
+    cache[" Mr-Mime"] = pokemon(122, "mr-mime")
+    with pytest.raises(ValueError, match="Pokédex number for eevee"):
+        cache["Eevee"] = {"name": "eevee"}
+
+    assert cache.names == {"pikachu": 25, "mr-mime": 122}
+    for key in [25, "25", "Pikachu", " PIKACHU\n"]:
+        assert key in cache
+        assert cache.resolve(key) == 25
+        assert cache[key] == pokemon(25, "pikachu")
+    assert cache["MR-MIME"] == pokemon(122, "mr-mime")
+
+    assert "eevee" not in cache
+    assert cache.get("eevee") is None
+    with pytest.raises(KeyError):
+        cache.resolve("eevee")
+    cache.close()
+
+    # The index is rebuilt when the cache is reopened.
+    cache = open_cache(path)
+    assert cache.names == {"pikachu": 25, "mr-mime": 122}
+    assert cache[" Pikachu"] == pokemon(25, "pikachu")
+    assert cache.meta("mr-mime")["ttl"] is None
+    cache.close()
+
+
+def test_by_url(path):
+    cache = open_cache(path, by_url=True)
+    url = "https://pokeapi.co/api/v2/type/3/"
+    cache[url.rstrip("/")] = {"name": "flying"}
+
+    assert url in cache
+    assert cache[url] == {"name": "flying"}
+    # Resources aren't indexed by name.
+    assert cache.names == {}
+    assert "flying" not in cache
+    cache.close()
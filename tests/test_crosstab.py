@@ -0,0 +1,93 @@
+"""Cross tabulations against one proportion per cell and Pearson's test."""
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+from survey.crosstab import crosstab, rao_scott
+from survey.design import SurveyDesign
+
+
+@pytest.fixture(scope="module")
+def design(survey: pd.DataFrame) -> SurveyDesign:
+    return SurveyDesign.from_frame(survey, weight="wtssall", single_psu="center")
+
+
+def cells(data: pd.DataFrame) -> pd.DataFrame:
+    """Data with the sex × party cell of each row as one column."""
+    cell: pd.Series = data["sex"].astype(str) + "|" + data["party"].astype(str)
+    return data.assign(cell=cell.where(data["sex"].notna() & data["party"].notna()))
+
+
+@pytest.mark.parametrize("by", [None, "year"])
+def test_matches_proportions(
+    survey: pd.DataFrame, design: SurveyDesign, by: str | None
+) -> None:
+    tables, _ = crosstab(design, survey, [("sex", "party")], by=by)
+    expected: pd.DataFrame = design.proportion(cells(survey), ["cell"], by=by)
+
+    keys: list[str] = ([by] if by else []) + ["cell"]
+    tables = tables.assign(cell=tables["row"] + "|" + tables["col"]).set_index(keys)
+    expected = expected.rename(columns={"level": "cell"}).set_index(keys)
+    tables = tables.loc[expected.index]
+
+    np.testing.assert_allclose(tables["proportion"], expected["estimate"])
+    np.testing.assert_allclose(tables["se"], expected["se"], rtol=1e-8)
+    rows: pd.Series = cells(survey).groupby(keys).size()
+    np.testing.assert_array_equal(tables["n"], rows.loc[expected.index])
+
+
+def test_pearson(survey: pd.DataFrame, design: SurveyDesign) -> None:
+    tables, tests = crosstab(design, survey, [("sex", "party")])
+    test = tests.iloc[0]
+    n: int = tables["n"].sum()
+    proportions: np.ndarray = tables["proportion"].to_numpy().reshape(2, 3)
+
+    chi2, p, df, _ = stats.chi2_contingency(n * proportions, correction=False)
+    assert test["chi2"] == pytest.approx(chi2)
+    assert test["p_chi2"] == pytest.approx(p)
+    assert test["df"] == df
+    assert test["df2"] == pytest.approx(test["df1"] * design.degrees_of_freedom)
+
+
+def test_two_by_two(survey: pd.DataFrame, design: SurveyDesign) -> None:
+    data: pd.DataFrame = survey.assign(
+        old=pd.Categorical(np.where(survey["year"] > 2012, "2016", "2012"))
+    )
+    test = crosstab(design, data, [("sex", "old")])[1].iloc[0]
+    # One contrast, so its design effect is the whole correction.
+    assert test["df1"] == pytest.approx(1.0)
+
+
+def test_empty_levels(survey: pd.DataFrame, design: SurveyDesign) -> None:
+    tables, tests = crosstab(design, survey, [("sex", "party")])
+    unused: pd.DataFrame = survey.assign(
+        party=survey["party"].cat.add_categories("Other")
+    )
+    padded_tables, padded_tests = crosstab(design, unused, [("sex", "party")])
+
+    other: pd.DataFrame = padded_tables[padded_tables["col"] == "Other"]
+    assert (other["count"] == 0).all() and (other["proportion"] == 0).all()
+    pd.testing.assert_frame_equal(padded_tests, tests)
+
+
+def test_rao_scott_drops_empty() -> None:
+    rng: np.random.Generator = np.random.default_rng(0)
+    proportions: np.ndarray = rng.dirichlet(np.ones(6)).reshape(2, 3)
+    scores: np.ndarray = rng.normal(size=(40, 6))
+    covariance: np.ndarray = scores.T @ scores / 1e4
+
+    # An empty column, then an empty row
+    padded: np.ndarray = np.insert(proportions, 1, 0.0, axis=1)
+    padded = np.insert(padded, 2, 0.0, axis=0)
+    kept: np.ndarray = (padded > 0).ravel()
+    padded_covariance: np.ndarray = np.zeros((12, 12))
+    padded_covariance[np.ix_(kept, kept)] = covariance
+
+    expected: tuple = rao_scott(proportions, covariance, 500, 20)
+    np.testing.assert_allclose(rao_scott(padded, padded_covariance, 500, 20), expected)
+
+    # Nothing to test with fewer than two rows or columns that have weight
+    single: np.ndarray = np.zeros((2, 3))
+    single[0] = proportions.sum(axis=0)
+    assert np.isnan(rao_scott(single, padded_covariance[:6, :6], 500, 20)).all()
@@ -0,0 +1,92 @@
+"""Weighted descriptive statistics against statsmodels' DescrStatsW."""
+import numpy as np
+import pandas as pd
+import pytest
+from statsmodels.stats.weightstats import DescrStatsW
+
+from survey.descriptive import weighted_cov, weighted_stats
+
+QUANTILES: list[float] = [0.1, 0.25, 0.5, 0.75, 0.9]
+
+
+@pytest.fixture(scope="module")
+def data(survey: pd.DataFrame) -> pd.DataFrame:
+    """The survey with tied values in `z` and some zero weights."""
+    rng: np.random.Generator = np.random.default_rng(0)
+    n: int = len(survey)
+    weights: pd.Series = survey["wtssall"].where(rng.random(n) > 0.1, 0.0)
+    return survey.assign(
+        z=pd.array(rng.integers(0, 8, n), dtype="Int64"),
+        weight=weights,
+    )
+
+
+def described(data: pd.DataFrame, columns: list[str], ddof: int = 0) -> DescrStatsW:
+    """DescrStatsW of complete rows that have weight."""
+    rows: pd.DataFrame = data[[*columns, "weight"]].dropna()
+    rows = rows[rows["weight"] > 0]
+    values: np.ndarray = rows[columns].to_numpy(dtype=np.float64)
+    return DescrStatsW(values, rows["weight"].to_numpy(), ddof=ddof)
+
+
+@pytest.mark.parametrize("ddof", [0, 1])
+def test_stats(data: pd.DataFrame, ddof: int) -> None:
+    table: pd.DataFrame = weighted_stats(
+        data, ["y", "x", "z"], "weight", by="year", quantiles=QUANTILES, ddof=ddof
+    )
+    assert list(table["variable"]) == ["y", "y", "x", "x", "z", "z"]
+    assert list(table["year"]) == [2012, 2016] * 3
+
+    for _, row in table.iterrows():
+        inside: pd.DataFrame = data[data["year"] == row["year"]]
+        column: str = row["variable"]
+        expected: DescrStatsW = described(inside, [column], ddof)
+
+        assert row["n"] == inside[column].notna().sum()
+        assert row["weight"] == pytest.approx(expected.sum_weights)
+        assert row["mean"] == pytest.approx(expected.mean[0])
+        assert row["std"] == pytest.approx(expected.std[0])
+        np.testing.assert_allclose(
+            row[[f"q{q:g}" for q in QUANTILES]].astype(float),
+            expected.quantile(QUANTILES, return_pandas=False).ravel(),
+        )
+
+
+def test_cov(data: pd.DataFrame) -> None:
+    table: pd.DataFrame = weighted_cov(data, ["y", "x", "z"], "weight")
+    assert len(table) == 9
+
+    for _, row in table.iterrows():
+        pair: list[str] = list(dict.fromkeys([row["variable"], row["other"]]))
+        expected: DescrStatsW = described(data, pair)
+        i: int = len(pair) - 1
+        assert row["n"] == data[pair].notna().all(axis=1).sum()
+        assert row["cov"] == pytest.approx(expected.cov[0, i])
+        assert row["corr"] == pytest.approx(expected.corrcoef[0, i])
+
+
+def test_missing_values_per_column(data: pd.DataFrame) -> None:
+    # y's missing rows don't change x's statistics.
+    together: pd.DataFrame = weighted_stats(data, ["y", "x"], "weight")
+    alone: pd.DataFrame = weighted_stats(data, ["x"], "weight")
+    pd.testing.assert_frame_equal(together.iloc[[1]].reset_index(drop=True), alone)
+
+
+def test_exact_hits() -> None:
+    # The median's cumulative weight is exactly 2, at the end of 2's weight,
+    # so it's the midpoint with the next value, like DescrStatsW.
+    data: pd.DataFrame = pd.DataFrame({"x": [1, 2, 3, 4], "weight": [1.0] * 4})
+    row = weighted_stats(data, ["x"], "weight", quantiles=[0.25, 0.5, 1.0]).iloc[0]
+    assert (row["q0.25"], row["q0.5"], row["q1"]) == (1.5, 2.5, 4.0)
+
+    # Zero weights are rows outside the sample: the midpoint skips 3, which
+    # DescrStatsW would use, and every quantile matches dropping it.
+    zeroed: pd.DataFrame = data.assign(weight=[1.0, 1.0, 0.0, 2.0])
+    row = weighted_stats(zeroed, ["x"], "weight", quantiles=[0.5]).iloc[0]
+    assert row["q0.5"] == 3.0
+    probs: np.ndarray = np.linspace(0, 1, 21)
+    kept: pd.DataFrame = weighted_stats(zeroed, ["x"], "weight", quantiles=probs)
+    dropped: pd.DataFrame = weighted_stats(
+        zeroed.drop(index=2), ["x"], "weight", quantiles=probs
+    )
+    pd.testing.assert_frame_equal(kept.drop(columns="n"), dropped.drop(columns="n"))
@@ -0,0 +1,176 @@
+"""Linearized standard errors against the textbook stratified formula."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from survey.design import SurveyDesign
+
+
+def stratified_variance(
+    data: pd.DataFrame, scores: np.ndarray, single_psu: str = "skip"
+) -> float:
+    """Variance of a total of scores over PSUs sampled with replacement.
+
+    Strata with one PSU contribute nothing, or for "center" the squared
+    deviation of their PSU's total from the mean of every PSU's total.
+    """
+    strata_psus: list[pd.Series] = [data["vstrat"], data["vpsu"]]
+    totals: pd.Series = pd.Series(scores, index=data.index).groupby(strata_psus).sum()
+    variance: float = 0.0
+    for _, stratum in totals.groupby(level="vstrat"):
+        n_h: int = len(stratum)
+        if n_h > 1:
+            variance += n_h / (n_h - 1) * ((stratum - stratum.mean()) ** 2).sum()
+        elif single_psu == "center":
+            variance += (stratum.iloc[0] - totals.mean()) ** 2
+    return variance
+
+
+def mean_scores(data: pd.DataFrame, column: str, inside: np.ndarray) -> np.ndarray:
+    """Scores of a weighted mean of a column over the rows `inside`."""
+    valid: np.ndarray = inside & data[column].notna().to_numpy()
+    weights: np.ndarray = np.where(valid, data["wtssall"], 0.0)
+    values: np.ndarray = data[column].fillna(0.0).to_numpy()
+    mean: float = (weights * values).sum() / weights.sum()
+    return weights * (values - mean) / weights.sum()
+
+
+@pytest.fixture(scope="module")
+def design(survey: pd.DataFrame) -> SurveyDesign:
+    return SurveyDesign.from_frame(survey, weight="wtssall", single_psu="skip")
+
+
+def test_layout(survey: pd.DataFrame, design: SurveyDesign) -> None:
+    assert design.n_psu == survey.groupby(["vstrat", "vpsu"]).ngroups
+    assert design.n_strata == survey["vstrat"].nunique()
+    assert design.degrees_of_freedom == design.n_psu - design.n_strata
+    # PSUs are numbered within strata, so the same vpsu in two strata differs.
+    assert len(np.unique(design.psu[survey["vpsu"].to_numpy() == 1])) > 1
+
+
+def test_total(survey: pd.DataFrame, design: SurveyDesign) -> None:
+    scores: np.ndarray = (survey["wtssall"] * survey["y"]).fillna(0.0).to_numpy()
+    row = design.total(survey, ["y"]).iloc[0]
+
+    assert row["estimate"] == pytest.approx(scores.sum())
+    assert row["se"] ** 2 == pytest.approx(stratified_variance(survey, scores))
+    assert row["n"] == survey["y"].notna().sum()
+
+
+def test_mean(survey: pd.DataFrame, design: SurveyDesign) -> None:
+    table: pd.DataFrame = design.mean(survey, ["y", "x"])
+    for _, row in table.iterrows():
+        column: str = row["variable"]
+        valid: pd.Series = survey[column].notna()
+        expected: float = np.average(
+            survey.loc[valid, column], weights=survey.loc[valid, "wtssall"]
+        )
+        scores: np.ndarray = mean_scores(survey, column, np.ones(len(survey), bool))
+
+        assert row["estimate"] == pytest.approx(expected)
+        assert row["se"] ** 2 == pytest.approx(stratified_variance(survey, scores))
+
+
+def test_domain_mean(survey: pd.DataFrame, design: SurveyDesign) -> None:
+    table: pd.DataFrame = design.mean(survey, ["y"], by="year")
+    assert list(table["year"]) == [2012, 2016]
+    for _, row in table.iterrows():
+        inside: np.ndarray = (survey["year"] == row["year"]).to_numpy()
+        scores: np.ndarray = mean_scores(survey, "y", inside)
+        # Every PSU stays in the design, including ones outside the domain.
+        assert row["se"] ** 2 == pytest.approx(stratified_variance(survey, scores))
+
+
+def test_proportion(survey: pd.DataFrame, design: SurveyDesign) -> None:
+    table: pd.DataFrame = design.proportion(survey, ["party"])
+    present: pd.Series = survey["party"].notna()
+    assert list(table["level"]) == ["Democrat", "Independent", "Republican"]
+    assert table["estimate"].sum() == pytest.approx(1.0)
+
+    for _, row in table.iterrows():
+        indicator: pd.DataFrame = survey.assign(
+            level=(survey["party"] == row["level"]).astype(float).where(present)
+        )
+        scores: np.ndarray = mean_scores(indicator, "level", present.to_numpy())
+        assert row["se"] ** 2 == pytest.approx(stratified_variance(survey, scores))
+
+
+def test_ratio(survey: pd.DataFrame, design: SurveyDesign) -> None:
+    row = design.ratio(survey, ["y"], ["x"]).iloc[0]
+
+    valid: np.ndarray = (survey["y"].notna() & survey["x"].notna()).to_numpy()
+    weights: np.ndarray = np.where(valid, survey["wtssall"], 0.0)
+    y: np.ndarray = survey["y"].fillna(0.0).to_numpy()
+    x: np.ndarray = survey["x"].fillna(0.0).to_numpy()
+    ratio: float = (weights * y).sum() / (weights * x).sum()
+    scores: np.ndarray = weights * (y - ratio * x) / (weights * x).sum()
+
+    assert row["estimate"] == pytest.approx(ratio)
+    assert row["se"] ** 2 == pytest.approx(stratified_variance(survey, scores))
+    assert row["n"] == valid.sum()
+
+
+def test_single_psu_error(survey: pd.DataFrame) -> None:
+    with pytest.raises(ValueError, match="single PSU"):
+        SurveyDesign.from_frame(survey, weight="wtssall")
+
+    # Without the lonely stratum, the default design is fine.
+    paired: pd.DataFrame = survey[survey["vstrat"] < survey["vstrat"].max()]
+    paired = paired.reset_index(drop=True)
+    row = SurveyDesign.from_frame(paired, weight="wtssall").mean(paired, ["y"])
+    scores: np.ndarray = mean_scores(paired, "y", np.ones(len(paired), bool))
+    assert row["se"].iloc[0] ** 2 == pytest.approx(stratified_variance(paired, scores))
+
+
+@pytest.mark.parametrize("single_psu", ["skip", "center"])
+def test_single_psu(survey: pd.DataFrame, single_psu: str) -> None:
+    design: SurveyDesign = SurveyDesign.from_frame(
+        survey, weight="wtssall", single_psu=single_psu
+    )
+    row = design.mean(survey, ["y"]).iloc[0]
+    scores: np.ndarray = mean_scores(survey, "y", np.ones(len(survey), bool))
+    expected: float = stratified_variance(survey, scores, single_psu)
+    assert row["se"] ** 2 == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("single_psu", ["error", "skip", "center"])
+def test_covariance_of_some_psus(survey: pd.DataFrame, single_psu: str) -> None:
+    if single_psu == "error":
+        survey = survey[survey["vstrat"] < survey["vstrat"].max()]
+    design: SurveyDesign = SurveyDesign.from_frame(
+        survey, weight="wtssall", single_psu=single_psu
+    )
+
+    # Totals of three estimators that only involve part of one stratum and
+    # the last PSU, which is the lonely one when there is one
+    rng: np.random.Generator = np.random.default_rng(0)
+    psus: np.ndarray = np.flatnonzero(design.psu_strata == 1)[:2]
+    psus = np.union1d(psus, [design.n_psu - 1])
+    totals: np.ndarray = rng.normal(size=(len(psus), 3))
+    dense: np.ndarray = np.zeros((design.n_psu, 3))
+    dense[psus] = totals
+
+    np.testing.assert_allclose(
+        design.covariance(totals, psus), design.covariance(dense)
+    )
+    np.testing.assert_allclose(design.variance(totals, psus), design.variance(dense))
+
+
+def test_psu_totals_of_some_rows(survey: pd.DataFrame, design: SurveyDesign) -> None:
+    rng: np.random.Generator = np.random.default_rng(0)
+    rows: np.ndarray = rng.random(design.n) < 0.3
+    scores: np.ndarray = rng.normal(size=(rows.sum(), 2))
+    domains: np.ndarray = rng.integers(-1, 2, rows.sum())
+    dense_scores: np.ndarray = np.zeros((design.n, 2))
+    dense_scores[rows] = scores
+    dense_domains: np.ndarray = np.full(design.n, -1)
+    dense_domains[rows] = domains
+
+    np.testing.assert_allclose(
+        design.psu_totals(scores, domains, 2, rows=rows),
+        design.psu_totals(dense_scores, dense_domains, 2),
+    )
+    np.testing.assert_allclose(
+        design.psu_totals(scores, rows=np.flatnonzero(rows)),
+        design.psu_totals(dense_scores),
+    )
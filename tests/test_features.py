@@ -0,0 +1,126 @@
+"""Derived columns built from the graph of declared features."""
+import threading
+import time
+from graphlib import CycleError
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from loaders.features import Feature, build_features, input_columns, required
+from loaders.students import gss_dtypes, student_features
+
+
+class Recorder:
+    """Features that log when they start and finish."""
+
+    def __init__(self):
+        self.events: list[tuple[str, str]] = []
+        self._lock: threading.Lock = threading.Lock()
+
+    def feature(self, name: str, sources=(), needs=(), delay: float = 0.0) -> Feature:
+        def function(*columns: pd.Series) -> pd.Series:
+            with self._lock:
+                self.events.append(("start", name))
+            time.sleep(delay)
+            with self._lock:
+                self.events.append(("end", name))
+            return sum(columns, pd.Series(0, index=columns[0].index)) + 1
+
+        return Feature(function, sources, needs)
+
+
+@pytest.fixture
+def gss() -> pd.DataFrame:
+    return pd.DataFrame({"a": [1, 2, 3], "b": [10, 20, 30]})
+
+
+def diamond(recorder: Recorder) -> dict[str, Feature]:
+    """`top` needs `left` and `right`, which both need `base`."""
+    return {
+        "unused": recorder.feature("unused", ("b",)),
+        "top": recorder.feature("top", ("a",), ("left", "right")),
+        "left": recorder.feature("left", needs=("base",), delay=0.05),
+        "right": recorder.feature("right", ("b",), ("base",)),
+        "base": recorder.feature("base", ("a",)),
+    }
+
+
+def test_required() -> None:
+    features: dict[str, Feature] = diamond(Recorder())
+    # Declared order, with columns that aren't features left out
+    assert required(["top", "year"], features) == ["top", "left", "right", "base"]
+    assert required(["right"], features) == ["right", "base"]
+    assert input_columns(["top", "year"], features) == {"a", "b", "year"}
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_dependency_order(gss: pd.DataFrame, max_workers: int) -> None:
+    recorder: Recorder = Recorder()
+    built: dict[str, pd.Series] = build_features(
+        gss, ["top"], diamond(recorder), max_workers=max_workers
+    )
+
+    assert list(built) == ["top", "left", "right", "base"]
+    # base = a + 1, left = base + 1, right = b + base + 1, top = a + left + right + 1
+    np.testing.assert_array_equal(built["top"], [18, 31, 44])
+
+    # Each feature starts after the features it needs have finished.
+    position: dict[tuple[str, str], int] = {
+        event: i for i, event in enumerate(recorder.events)
+    }
+    assert ("start", "unused") not in position
+    for name in ["left", "right", "top"]:
+        for need in diamond(recorder)[name].needs:
+            assert position[("end", need)] < position[("start", name)]
+
+
+def test_independent_features_overlap(gss: pd.DataFrame) -> None:
+    recorder: Recorder = Recorder()
+    build_features(gss, ["top"], diamond(recorder), max_workers=4)
+    # `right` runs while the slow `left` is still running.
+    position: dict[tuple[str, str], int] = {
+        event: i for i, event in enumerate(recorder.events)
+    }
+    assert position[("start", "right")] < position[("end", "left")]
+
+
+def test_cycle(gss: pd.DataFrame) -> None:
+    recorder: Recorder = Recorder()
+    features: dict[str, Feature] = {
+        "x": recorder.feature("x", ("a",), ("z",)),
+        "y": recorder.feature("y", needs=("x",)),
+        "z": recorder.feature("z", needs=("y",)),
+    }
+    with pytest.raises(CycleError):
+        build_features(gss, ["y"], features)
+    assert recorder.events == []
+
+
+def test_undeclared_need(gss: pd.DataFrame) -> None:
+    features: dict[str, Feature] = {"x": Feature(lambda a: a, ("a",), ("missing",))}
+    with pytest.raises(KeyError, match="missing"):
+        build_features(gss, ["x"], features)
+
+
+def test_threads_match_serial() -> None:
+    rng: np.random.Generator = np.random.default_rng(0)
+    n: int = 2000
+    gss: pd.DataFrame = pd.DataFrame(
+        {column: rng.integers(0, 9, n) for column in gss_dtypes}
+    ).astype(gss_dtypes)
+    gss["year"] = rng.choice(np.arange(1990, 2022, 2), n).astype("int16")
+    gss["age"] = pd.array(rng.integers(18, 90, n), dtype="Int8")
+    gss["coninc"] = rng.uniform(300.0, 170000.0, n)
+    edges: np.ndarray = gss["coninc"].quantile(np.linspace(0, 1, 5)).to_numpy()
+
+    names: list[str] = list(student_features)
+    serial: dict[str, pd.Series] = build_features(
+        gss, names, student_features, {"edges": edges}, max_workers=1
+    )
+    threaded: dict[str, pd.Series] = build_features(
+        gss, names, student_features, {"edges": edges}, max_workers=8
+    )
+    assert list(threaded) == list(serial) == names
+    for name in names:
+        pd.testing.assert_series_equal(threaded[name], serial[name], check_names=False)
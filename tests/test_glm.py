@@ -0,0 +1,125 @@
+"""GLM sweeps against one statsmodels fit per specification."""
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+import statsmodels.api as sm
+from statsmodels.genmod.generalized_linear_model import GLMResults
+from statsmodels.tools.sm_exceptions import SpecificationWarning
+
+from survey.design import SurveyDesign
+from survey.glm import Specification, glm_sweep, nested_specifications
+
+FEATURES: list[str] = ["sex", "x", "party"]
+
+
+@pytest.fixture(scope="module")
+def data(survey: pd.DataFrame) -> pd.DataFrame:
+    """The survey with a binary target that's missing where `y` is."""
+    decrease: np.ndarray = np.where(survey["y"] > 3.5, "Decrease", "Same")
+    return survey.assign(
+        decrease=pd.Categorical(
+            np.where(survey["y"].isna(), None, decrease),
+            categories=["Same", "Decrease"],
+        )
+    )
+
+
+@pytest.fixture(scope="module")
+def design(data: pd.DataFrame) -> SurveyDesign:
+    return SurveyDesign.from_frame(data, weight="wtssall", single_psu="skip")
+
+
+def statsmodels_fit(data: pd.DataFrame, features: list[str], **fit) -> GLMResults:
+    """Fit like the analysis notebook: complete rows and `pd.get_dummies`."""
+    rows: pd.DataFrame = data[[*features, "decrease", "wtssall"]].dropna()
+    x: pd.DataFrame = sm.add_constant(
+        pd.get_dummies(rows[features], drop_first=True, dtype=float)
+    )
+    y: pd.Series = (rows["decrease"] == "Decrease").astype(float)
+    model: sm.GLM = sm.GLM(
+        y, x, family=sm.families.Binomial(), var_weights=rows["wtssall"]
+    )
+    return model.fit(**fit)
+
+
+@pytest.fixture(scope="module")
+def sweep(data: pd.DataFrame, design: SurveyDesign) -> pd.DataFrame:
+    return glm_sweep(
+        design, data, "decrease", nested_specifications(FEATURES), max_workers=1
+    )
+
+
+def test_coefficients(data: pd.DataFrame, sweep: pd.DataFrame) -> None:
+    for i in range(1, len(FEATURES) + 1):
+        model: pd.DataFrame = sweep[sweep["model"] == f"model_{i}"]
+        result: GLMResults = statsmodels_fit(data, FEATURES[:i])
+        coef: pd.Series = model.set_index("term")["coef"]
+
+        np.testing.assert_allclose(
+            coef.loc[result.params.index], result.params, atol=1e-6
+        )
+        assert (model["n"] == result.nobs).all()
+
+
+def test_warm_starts_match_cold_fits(
+    data: pd.DataFrame, design: SurveyDesign, sweep: pd.DataFrame
+) -> None:
+    specifications: list[Specification] = nested_specifications(FEATURES)
+    cold: pd.DataFrame = pd.concat(
+        [
+            glm_sweep(design, data, "decrease", [spec], max_workers=1)
+            for spec in specifications
+        ],
+        ignore_index=True,
+    )
+    np.testing.assert_allclose(sweep["coef"], cold["coef"], atol=1e-6)
+    np.testing.assert_allclose(sweep["se"], cold["se"], rtol=1e-5)
+
+
+def test_parallel_matches_serial(
+    data: pd.DataFrame, design: SurveyDesign, sweep: pd.DataFrame
+) -> None:
+    # Specifications that aren't nested: the largest one is the superset of
+    # three others, and `model_1` waits for `model_2`.
+    specifications: list[Specification] = [
+        *nested_specifications(FEATURES),
+        Specification("sex_party", ("sex", "party")),
+        Specification("x_party", ("x", "party")),
+    ]
+    serial: pd.DataFrame = glm_sweep(
+        design, data, "decrease", specifications, max_workers=1
+    )
+    parallel: pd.DataFrame = glm_sweep(
+        design, data, "decrease", specifications, max_workers=2
+    )
+    pd.testing.assert_frame_equal(serial[: len(sweep)], sweep)
+    pd.testing.assert_frame_equal(
+        parallel.drop(columns="iterations"), serial.drop(columns="iterations")
+    )
+
+
+def test_cluster_robust(data: pd.DataFrame) -> None:
+    # With one stratum, the linearized covariance is statsmodels' cluster
+    # robust one with the PSUs as clusters, times G / (G - 1).
+    clusters: pd.Series = data["vstrat"] * 100 + data["vpsu"]
+    design: SurveyDesign = SurveyDesign(data["wtssall"], psu=clusters)
+    table: pd.DataFrame = glm_sweep(
+        design, data, "decrease", [Specification("m", tuple(FEATURES))], max_workers=1
+    )
+
+    rows: pd.Index = data[[*FEATURES, "decrease"]].dropna().index
+    with warnings.catch_warnings():
+        # statsmodels warns that cluster robust errors with var_weights are
+        # only partly supported.
+        warnings.simplefilter("ignore", SpecificationWarning)
+        result: GLMResults = statsmodels_fit(
+            data,
+            FEATURES,
+            cov_type="cluster",
+            cov_kwds={"groups": clusters[rows].to_numpy(), "use_correction": False},
+        )
+    correction: float = np.sqrt(design.n_psu / (design.n_psu - 1))
+    se: pd.Series = table.set_index("term")["se"].loc[result.bse.index]
+    np.testing.assert_allclose(se, result.bse * correction, rtol=1e-6)
@@ -0,0 +1,89 @@
+"""Resuming checkpointed scrape jobs from the command line entry point."""
+import asyncio
+import json
+import runpy
+from pathlib import Path
+
+import pytest
+from aiohttp import web
+
+from bench import start_stub, stub_pokemon
+from jobs import Checkpoint, parse_targets
+from smolapi import SmolPokeApiScraper
+
+MAIN = Path(__file__).parents[1] / "smolpokeapi" / "__main__.py"
+
+
+class FlakyApi():
+    """Stub API that's missing some Pokémon and counts requests."""
+
+    def __init__(self, missing=()):
+        self.missing = set(missing)
+        self.requests = []
+
+    async def handler(self, request):
+        pokenum = int(request.match_info["key"])
+        self.requests.append(pokenum)
+        if pokenum in self.missing:
+            return web.Response(status=404)
+        return web.json_response(stub_pokemon(pokenum))
+
+
+@pytest.fixture
+def cli(monkeypatch):
+    # `run_job` points the scraper at the stub, so restore the API afterwards.
+    monkeypatch.setattr(SmolPokeApiScraper, "_POKEAPI", SmolPokeApiScraper._POKEAPI)
+    return runpy.run_path(str(MAIN), run_name="smolpokeapi_cli")
+
+
+def run_job(cli, api, argv):
+    async def run():
+        runner, base_url = await start_stub(api.handler)
+        try:
+            SmolPokeApiScraper._POKEAPI = base_url + "/{}"
+            await cli["main"](cli["parse_args"](argv))
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(run())
+
+
+def test_resume(cli, tmp_path):
+    checkpoint = str(tmp_path / "job.json")
+    options = ["--checkpoint", checkpoint, "--rate", "1000", "--burst", "100"]
+
+    api = FlakyApi(missing={3})
+    run_job(cli, api, ["1-5", *options, "--cache", str(tmp_path / "first.log")])
+    assert sorted(api.requests) == [1, 2, 3, 4, 5]
+    with open(checkpoint) as saved:
+        progress = json.load(saved)
+    assert progress["completed"] == [1, 2, 4, 5]
+    assert list(progress["failed"]) == ["3"]
+
+    # A new cache, so only the checkpoint keeps finished Pokémon from being
+    # requested again. The failed one is retried along with the new target.
+    api.missing.clear()
+    run_job(cli, api, ["1-6", *options, "--cache", str(tmp_path / "second.log")])
+    assert sorted(api.requests[5:]) == [3, 6]
+    with open(checkpoint) as saved:
+        progress = json.load(saved)
+    assert progress == {
+        "completed": [1, 2, 3, 4, 5, 6],
+        "failed": {},
+        "pending": [],
+    }
+
+
+def test_checkpoint_names(tmp_path):
+    path = str(tmp_path / "job.json")
+    checkpoint = Checkpoint(path, parse_targets(["1-2,Pikachu"]))
+    assert list(checkpoint.pending) == [1, 2, "pikachu"]
+
+    # Names are done once their Pokédex number is.
+    checkpoint.complete(25, "pikachu")
+    checkpoint.fail(2, "HTTP 404 Not Found")
+    checkpoint.save()
+
+    resumed = Checkpoint(path, parse_targets(["pikachu", "3"]))
+    assert resumed.completed == {25, "pikachu"}
+    assert list(resumed.pending) == [1, 2, 3]
@@ -0,0 +1,91 @@
+"""Recovery of the append-only cache log after crashes and compaction."""
+import json
+import os
+import shutil
+
+import pytest
+
+from cache import LogCache
+
+
+def pokemon(pokeid, name, version=1):
+    return {"id": pokeid, "name": name, "version": version}
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "pokeapi.log")
+
+
+def log_lines(path):
+    with open(path, "rb") as log:
+        return log.read().splitlines()
+
+
+def test_torn_record(path):
+    cache = LogCache(path)
+    cache[1] = pokemon(1, "bulbasaur")
+    cache[4] = pokemon(4, "charmander")
+    cache.close()
+    size = os.path.getsize(path)
+
+    # A crash in the middle of an append leaves a record without a newline.
+    with open(path, "ab") as log:
+        log.write(b'{"key": 7, "name": "squirtle"}\t{"id": 7, "na')
+
+    cache = LogCache(path)
+    assert sorted(cache.keys()) == [1, 4]
+    assert os.path.getsize(path) == size
+    assert cache["charmander"] == pokemon(4, "charmander")
+
+    # The next append replaces the torn record.
+    cache[7] = pokemon(7, "squirtle")
+    cache.close()
+    cache = LogCache(path)
+    assert cache[7] == pokemon(7, "squirtle")
+    assert len(log_lines(path)) == 3
+    cache.close()
+
+
+def test_compact(path):
+    cache = LogCache(path)
+    cache.put(1, pokemon(1, "bulbasaur"), {"etag": '"v1"'})
+    cache[4] = pokemon(4, "charmander")
+    cache.put(1, pokemon(1, "bulbasaur", 2), {"etag": '"v2"'})
+    cache.flush()
+    old_index = path + ".old"
+    shutil.copy(path + LogCache._INDEX_SUFFIX, old_index)
+
+    cache.compact()
+    headers = [json.loads(line.split(b"\t")[0]) for line in log_lines(path)]
+    assert [header["key"] for header in headers] == [1, 4]
+    assert headers[0]["meta"]["etag"] == '"v2"'
+    assert cache[1] == pokemon(1, "bulbasaur", 2)
+    cache.close()
+
+    cache = LogCache(path)
+    assert cache["bulbasaur"] == pokemon(1, "bulbasaur", 2)
+    assert cache[4] == pokemon(4, "charmander")
+    cache.close()
+
+    # An index saved before compaction covers more bytes than the log has
+    # now, so it's rebuilt from the records, metadata and names included.
+    shutil.copy(old_index, path + LogCache._INDEX_SUFFIX)
+    cache = LogCache(path)
+    assert sorted(cache.keys()) == [1, 4]
+    assert cache["bulbasaur"] == pokemon(1, "bulbasaur", 2)
+    assert cache.meta(1)["etag"] == '"v2"'
+    cache.close()
+
+
+def test_missing_index(path):
+    cache = LogCache(path)
+    cache[1] = pokemon(1, "bulbasaur")
+    cache[1] = pokemon(1, "bulbasaur", 2)
+    cache.close()
+    os.remove(path + LogCache._INDEX_SUFFIX)
+
+    cache = LogCache(path)
+    assert len(cache) == 1
+    assert cache[1] == pokemon(1, "bulbasaur", 2)
+    cache.close()
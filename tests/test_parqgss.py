@@ -0,0 +1,86 @@
+"""GSS releases converted to Parquet chunk by chunk."""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from loaders.parqgss import convert
+from loaders.store import read_partitioned
+
+
+@pytest.fixture
+def release() -> pd.DataFrame:
+    """A GSS release whose later chunks have missing integers."""
+    rng: np.random.Generator = np.random.default_rng(0)
+    n: int = 50
+    age: pd.Series = pd.Series(rng.integers(18, 90, n), dtype="Int16")
+    age[30:40] = pd.NA
+    return pd.DataFrame(
+        {
+            "year": np.repeat([2016, 2018], n // 2).astype("int16"),
+            "age": age,
+            "sex": pd.Categorical(rng.choice(["Female", "Male"], n)),
+            "wtssall": rng.uniform(0.5, 3.0, n),
+        }
+    )
+
+
+def nullable(gss: pd.DataFrame) -> pd.DataFrame:
+    """Integers as nullable types, which pyarrow reads as floats if missing."""
+    return gss.astype({"year": "Int64", "age": "Int64"})
+
+
+def test_stata(release: pd.DataFrame, tmp_path: Path) -> None:
+    release.to_stata(tmp_path / "GSS.dta", write_index=False)
+    assert convert(tmp_path / "GSS.dta", tmp_path / "gss.parquet", None, 16) == 50
+
+    # One row group per chunk
+    assert pq.ParquetFile(tmp_path / "gss.parquet").num_row_groups == 4
+    gss: pd.DataFrame = nullable(pq.read_table(tmp_path / "gss.parquet").to_pandas())
+    pd.testing.assert_frame_equal(gss, nullable(release), check_categorical=False)
+
+
+def test_stata_partitioned(release: pd.DataFrame, tmp_path: Path) -> None:
+    release.to_stata(tmp_path / "GSS.dta", write_index=False)
+    columns: list[str] = ["year", "age", "sex"]
+    convert(tmp_path / "GSS.dta", tmp_path / "gss", columns, 16, partition_by="year")
+
+    assert sorted(p.name for p in (tmp_path / "gss").iterdir()) == [
+        "year=2016",
+        "year=2018",
+    ]
+    gss: pd.DataFrame = nullable(read_partitioned(tmp_path / "gss"))
+    pd.testing.assert_frame_equal(
+        gss, nullable(release[columns]), check_categorical=False
+    )
+
+
+def test_spss(release: pd.DataFrame, tmp_path: Path) -> None:
+    pyreadstat = pytest.importorskip("pyreadstat")
+    # SPSS stores numbers and value labels, like the GSS release.
+    codes: dict[str, int] = {"Female": 2, "Male": 1}
+    sav: pd.DataFrame = release.assign(
+        sex=release["sex"].map(codes).astype(float),
+        age=release["age"].astype(float),
+    )
+    pyreadstat.write_sav(
+        sav,
+        str(tmp_path / "GSS.sav"),
+        variable_value_labels={"sex": {v: k for k, v in codes.items()}},
+    )
+    columns: list[str] = ["year", "sex", "wtssall"]
+    assert convert(tmp_path / "GSS.sav", tmp_path / "gss.parquet", columns, 16) == 50
+
+    gss: pd.DataFrame = pq.read_table(tmp_path / "gss.parquet").to_pandas()
+    assert list(gss.columns) == columns
+    assert list(gss["sex"].astype(str)) == list(release["sex"].astype(str))
+    np.testing.assert_allclose(gss["year"], release["year"])
+    np.testing.assert_allclose(gss["wtssall"], release["wtssall"])
+
+
+def test_unsupported(tmp_path: Path) -> None:
+    (tmp_path / "GSS.sas7bdat").touch()
+    with pytest.raises(ValueError, match=".sas7bdat isn't supported"):
+        convert(tmp_path / "GSS.sas7bdat", tmp_path / "gss.parquet")
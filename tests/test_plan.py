@@ -0,0 +1,51 @@
+"""Whole-data statistics that the loaders compute in batches."""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from loaders.plan import coninc_quartile_edges, open_gss
+from loaders.store import write_partitioned
+
+
+@pytest.mark.parametrize("rows", [5, 998, 5000])
+def test_coninc_quartile_edges(tmp_path: Path, rows: int) -> None:
+    rng: np.random.Generator = np.random.default_rng(rows)
+    # Few distinct incomes, like the bracket midpoints of `coninc`
+    brackets: np.ndarray = rng.uniform(300.0, 170000.0, 25)
+    coninc: pd.Series = pd.Series(rng.choice(brackets, rows))
+    coninc[rng.random(rows) < 0.2] = np.nan
+    gss: pd.DataFrame = pd.DataFrame(
+        {"year": rng.choice(np.arange(2000, 2020, 2), rows), "coninc": coninc}
+    )
+
+    # One batch per year from the data set and several from the CSV
+    write_partitioned(gss, tmp_path / "gss")
+    gss.to_csv(tmp_path / "gss.csv", index=False)
+    _, expected = pd.qcut(coninc, 4, retbins=True)
+    np.testing.assert_array_equal(
+        coninc_quartile_edges(open_gss(tmp_path / "gss")), expected
+    )
+    np.testing.assert_array_equal(
+        coninc_quartile_edges(open_gss(tmp_path / "gss.csv", 1 << 10)), expected
+    )
+
+
+def test_coninc_quartile_edges_missing(tmp_path: Path) -> None:
+    rng: np.random.Generator = np.random.default_rng(0)
+    coninc: pd.Series = pd.Series(rng.choice([1000.0, 25000.0, 80000.0], 40))
+    # 2010 is a batch without any valid income.
+    gss: pd.DataFrame = pd.DataFrame(
+        {"year": np.repeat([2008, 2010, 2012], [15, 10, 15]), "coninc": coninc}
+    )
+    gss.loc[gss["year"] == 2010, "coninc"] = np.nan
+    write_partitioned(gss, tmp_path / "gss")
+    expected: pd.Series = gss["coninc"].quantile(np.linspace(0, 1, 5))
+    edges: np.ndarray = coninc_quartile_edges(open_gss(tmp_path / "gss"))
+    np.testing.assert_array_equal(edges, expected)
+
+    # No incomes at all
+    write_partitioned(gss.assign(coninc=np.nan), tmp_path / "empty")
+    edges = coninc_quartile_edges(open_gss(tmp_path / "empty"))
+    assert np.isnan(edges).all() and len(edges) == 5
@@ -0,0 +1,99 @@
+"""Token bucket refill and bursts on a fake clock."""
+import asyncio
+
+import pytest
+
+from ratelimit import TokenBucket
+
+
+class FakeClock():
+    """Event loop time that only moves when the bucket sleeps."""
+
+    def __init__(self):
+        self.now = 0.0
+        self._sleep = asyncio.sleep
+
+    def time(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.now += seconds
+        await self._sleep(0)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(asyncio, "sleep", clock.sleep)
+    return clock
+
+
+def run(clock, coroutine):
+    async def on_clock():
+        asyncio.get_running_loop().time = clock.time
+        return await coroutine
+
+    return asyncio.run(on_clock())
+
+
+async def acquire(bucket, clock, requests):
+    """Spend `requests` tokens and return the time each was handed out."""
+    times = []
+    for _ in range(requests):
+        await bucket.acquire()
+        times.append(clock.now)
+    return times
+
+
+def test_burst_then_rate(clock):
+    bucket = TokenBucket(rate=2.0, capacity=4)
+    times = run(clock, acquire(bucket, clock, 8))
+    # A full bucket's burst goes out at once, then one token every 1/rate.
+    assert times == pytest.approx([0, 0, 0, 0, 0.5, 1.0, 1.5, 2.0])
+
+
+def test_capacity_caps_refill(clock):
+    bucket = TokenBucket(rate=2.0, capacity=4)
+
+    async def idle_then_burst():
+        await acquire(bucket, clock, 4)
+        # Idling for a minute refills the bucket, but only up to capacity.
+        clock.now += 60.0
+        return await acquire(bucket, clock, 6)
+
+    times = run(clock, idle_then_burst())
+    assert times == pytest.approx([60, 60, 60, 60, 60.5, 61])
+
+
+def test_concurrent_waiters(clock):
+    bucket = TokenBucket(rate=4.0, capacity=1)
+
+    async def together():
+        async def request(name):
+            await bucket.acquire()
+            return name, clock.now
+
+        return await asyncio.gather(*map(request, range(5)))
+
+    # Waiters get tokens in order, still at most `rate` per second.
+    assert run(clock, together()) == [
+        (name, pytest.approx(name / 4)) for name in range(5)
+    ]
+
+
+def test_penalize(clock):
+    bucket = TokenBucket(rate=2.0, capacity=4)
+
+    async def penalized():
+        await acquire(bucket, clock, 2)
+        bucket.penalize(3.0)
+        # The bucket's remaining tokens are forfeited along with 3s of refill.
+        return await acquire(bucket, clock, 2)
+
+    assert run(clock, penalized()) == pytest.approx([3.5, 4.0])
+
+
+@pytest.mark.parametrize(("rate", "capacity"), [(0, 1), (-1.0, 1), (1.0, 0)])
+def test_invalid(rate, capacity):
+    with pytest.raises(ValueError):
+        TokenBucket(rate, capacity)
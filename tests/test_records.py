@@ -0,0 +1,115 @@
+"""Compact Pokédex records projected from PokéAPI payloads."""
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from records import (
+    POKEDEX_FIELDS,
+    PokemonRecord,
+    check_fields,
+    export_parquet,
+    project,
+    to_record,
+)
+
+POKEDEX = Path(__file__).parents[1] / "data" / "pokedex.csv"
+
+
+def payload(pokeid=1, name="bulbasaur"):
+    """Bulbasaur's PokéAPI payload with the lists out of slot order."""
+    stats = [
+        ("speed", 45),
+        ("hp", 45),
+        ("attack", 49),
+        ("defense", 49),
+        ("special-attack", 65),
+        ("special-defense", 65),
+    ]
+    return {
+        "id": pokeid,
+        "name": name,
+        "height": 7,
+        "weight": 69,
+        "base_experience": 64,
+        "types": [
+            {"slot": 2, "type": {"name": "poison"}},
+            {"slot": 1, "type": {"name": "grass"}},
+        ],
+        "abilities": [
+            {"slot": 3, "is_hidden": True, "ability": {"name": "chlorophyll"}},
+            {"slot": 1, "is_hidden": False, "ability": {"name": "overgrow"}},
+        ],
+        "stats": [{"stat": {"name": stat}, "base_stat": base} for stat, base in stats],
+        "moves": [{"move": {"name": "tackle"}}],
+    }
+
+
+def test_project_matches_pokedex():
+    bulbasaur = pd.read_csv(POKEDEX).iloc[0][list(POKEDEX_FIELDS)].to_dict()
+    projected = project(payload())
+
+    assert list(projected) == list(POKEDEX_FIELDS)
+    for field, expected in bulbasaur.items():
+        actual = projected[field]
+        if isinstance(expected, str):
+            assert actual == expected.lower(), field
+        elif pd.isna(expected):
+            assert actual is None, field
+        else:
+            assert actual == pytest.approx(expected), field
+
+
+def test_projection_keeps_key_fields():
+    keep = check_fields(["speed", "type_1"])
+    assert keep == ("pokedex_number", "name", "type_1", "speed")
+    assert project(payload(), keep) == {
+        "pokedex_number": 1,
+        "name": "bulbasaur",
+        "type_1": "grass",
+        "speed": 45,
+    }
+
+    with pytest.raises(ValueError, match="Unknown Pokémon fields: moves"):
+        check_fields(["moves", "speed"])
+
+
+def test_to_record():
+    # Raw and projected cache entries become the same record.
+    record = to_record(payload())
+    assert record == to_record(project(payload()))
+    assert record.to_dict() == project(payload())
+
+    keep = check_fields(["hp"])
+    partial = to_record(project(payload(), keep))
+    assert partial == PokemonRecord(1, "bulbasaur", hp=45)
+
+
+def test_parquet_round_trip(tmp_path):
+    records = [
+        to_record(payload()),
+        # No types, abilities, or base experience
+        to_record(
+            {
+                **payload(2, "missingno"),
+                "types": [],
+                "abilities": [],
+                "base_experience": None,
+            }
+        ),
+    ]
+    export_parquet(records, tmp_path / "pokedex.parquet")
+    exported = pd.read_parquet(tmp_path / "pokedex.parquet")
+
+    # The same dtypes as reading data/pokedex.csv
+    pokedex = pd.read_csv(POKEDEX, usecols=POKEDEX_FIELDS)[list(POKEDEX_FIELDS)]
+    expected = pd.DataFrame([record.to_dict() for record in records])
+    pd.testing.assert_frame_equal(exported, expected.astype(pokedex.dtypes))
+
+
+def test_parquet_projection(tmp_path):
+    keep = ["speed", "weight_kg"]
+    export_parquet([to_record(payload())], tmp_path / "pokedex.parquet", keep)
+    exported = pd.read_parquet(tmp_path / "pokedex.parquet")
+    assert list(exported.columns) == ["pokedex_number", "name", "weight_kg", "speed"]
+    assert exported.iloc[0].tolist() == [1, "bulbasaur", 6.9, 45]
@@ -0,0 +1,93 @@
+"""Replicate standard errors against the linearized ones."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from survey.descriptive import weighted_stats
+from survey.design import SurveyDesign
+from survey.replicates import ReplicateWeights
+
+
+def median(data: pd.DataFrame, weights: np.ndarray) -> np.ndarray:
+    """Weighted median of `y`, an estimator for `ReplicateWeights.apply`."""
+    stats: pd.DataFrame = weighted_stats(data.assign(weight=weights), ["y"], "weight")
+    return stats["q0.5"].to_numpy()
+
+
+@pytest.fixture(scope="module")
+def design(survey: pd.DataFrame) -> SurveyDesign:
+    return SurveyDesign.from_frame(survey, weight="wtssall", single_psu="skip")
+
+
+@pytest.fixture(scope="module")
+def paired(survey: pd.DataFrame) -> pd.DataFrame:
+    """Strata of the survey with exactly two PSUs, for BRR."""
+    psus: pd.Series = survey.groupby("vstrat")["vpsu"].transform("nunique")
+    return survey[psus == 2].reset_index(drop=True)
+
+
+def test_jackknife_total(survey: pd.DataFrame, design: SurveyDesign) -> None:
+    replicates: ReplicateWeights = ReplicateWeights.jackknife(design)
+    # Lonely strata get no replicate, like the "skip" design.
+    assert replicates.n_replicates == design.n_psu - 1
+
+    jackknife: pd.DataFrame = replicates.total(survey, ["y", "x"])
+    taylor: pd.DataFrame = design.total(survey, ["y", "x"])
+    np.testing.assert_allclose(jackknife["estimate"], taylor["estimate"])
+    # Totals are linear, so the two agree exactly.
+    np.testing.assert_allclose(jackknife["se"], taylor["se"], rtol=1e-6)
+
+
+def test_jackknife_mean(survey: pd.DataFrame, design: SurveyDesign) -> None:
+    jackknife: pd.DataFrame = ReplicateWeights.jackknife(design).mean(survey, ["y"])
+    taylor: pd.DataFrame = design.mean(survey, ["y"])
+    np.testing.assert_allclose(jackknife["estimate"], taylor["estimate"])
+    np.testing.assert_allclose(jackknife["se"], taylor["se"], rtol=0.02)
+
+
+@pytest.mark.parametrize("fay", [0.0, 0.5])
+def test_brr_total(paired: pd.DataFrame, fay: float) -> None:
+    design: SurveyDesign = SurveyDesign.from_frame(paired, weight="wtssall")
+    brr: pd.DataFrame = ReplicateWeights.brr(design, fay).total(paired, ["y"])
+    taylor: pd.DataFrame = design.total(paired, ["y"])
+    np.testing.assert_allclose(brr["se"], taylor["se"], rtol=1e-6)
+
+
+def test_brr_needs_pairs(design: SurveyDesign) -> None:
+    with pytest.raises(ValueError, match="two PSUs"):
+        ReplicateWeights.brr(design)
+
+
+def test_bootstrap_total(survey: pd.DataFrame, design: SurveyDesign) -> None:
+    bootstrap: ReplicateWeights = ReplicateWeights.bootstrap(
+        design, replicates=2000, seed=765
+    )
+    replicated: pd.DataFrame = bootstrap.total(survey, ["y"])
+    taylor: pd.DataFrame = design.total(survey, ["y"])
+    # Rao-Wu is unbiased for totals up to the Monte Carlo error.
+    np.testing.assert_allclose(replicated["se"], taylor["se"], rtol=0.05)
+
+
+def test_weights(design: SurveyDesign) -> None:
+    replicates: ReplicateWeights = ReplicateWeights.jackknife(design)
+    factors: np.ndarray = replicates.factors[[0, 3]].T[design.psu]
+    np.testing.assert_allclose(
+        replicates.weights([0, 3]), design.weights[:, None] * factors, rtol=1e-6
+    )
+    np.testing.assert_array_equal(
+        replicates.weights()[:, [0, 3]], replicates.weights([0, 3])
+    )
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_apply_matches_quantile(
+    survey: pd.DataFrame, design: SurveyDesign, max_workers: int
+) -> None:
+    replicates: ReplicateWeights = ReplicateWeights.bootstrap(
+        design, replicates=40, seed=1
+    )
+    estimate, se = replicates.apply(median, survey, max_workers)
+    quantile: pd.DataFrame = replicates.quantile(survey, ["y"], [0.5])
+
+    np.testing.assert_allclose(estimate, quantile["estimate"])
+    np.testing.assert_allclose(se, quantile["se"], rtol=1e-5)
@@ -0,0 +1,152 @@
+"""Retry delays and the circuit breaker."""
+import asyncio
+import time
+from email.utils import formatdate
+
+import aiohttp
+import pytest
+
+from retry import CircuitBreaker, RetryPolicy, parse_retry_after
+
+
+def response_error(status):
+    return aiohttp.ClientResponseError(None, (), status=status)
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("120") == 120.0
+    assert parse_retry_after("-3") == 0.0
+    in_a_minute = parse_retry_after(formatdate(time.time() + 60, usegmt=True))
+    assert 55 < in_a_minute <= 60
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_retry_after():
+    policy = RetryPolicy(base_delay=0.5, max_delay=10.0)
+    # The API's delay replaces the backoff, whatever the attempt
+    assert policy.delay(0, retry_after=2.0) == 2.0
+    assert policy.delay(4, retry_after=0.0) == 0.0
+    assert policy.delay(0, retry_after=3600.0) == 10.0
+
+
+def test_backoff():
+    policy = RetryPolicy(base_delay=0.5, max_delay=3.0)
+    for attempt, ceiling in enumerate([0.5, 1.0, 2.0, 3.0, 3.0]):
+        delays = [policy.delay(attempt) for _ in range(200)]
+        assert all(0 <= delay <= ceiling for delay in delays)
+        # Full jitter spreads the delays over the whole range.
+        assert max(delays) > ceiling / 2
+
+
+def test_should_retry():
+    policy = RetryPolicy(attempts=3)
+    assert policy.should_retry(response_error(429), 0)
+    assert policy.should_retry(asyncio.TimeoutError(), 1)
+    assert not policy.should_retry(asyncio.TimeoutError(), 2)
+    assert not policy.should_retry(response_error(404), 0)
+    assert not policy.should_retry(ValueError(), 0)
+
+
+def test_circuit_breaker():
+    cooldown = 0.05
+
+    async def run():
+        aloop = asyncio.get_running_loop()
+        breaker = CircuitBreaker(threshold=3, cooldown=cooldown)
+        breaker.record_failure()
+        breaker.record_failure()
+        assert not breaker.is_open
+        breaker.record_failure()
+        assert breaker.is_open
+
+        start = aloop.time()
+        await breaker.wait()
+        assert aloop.time() - start >= cooldown * 0.9
+        assert not breaker.is_open
+
+        # Half open: one failed trial request opens it again.
+        breaker.record_failure()
+        assert breaker.is_open
+        await breaker.wait()
+
+        # A successful trial closes it, so it takes `threshold` failures again.
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+        assert not breaker.is_open
+        start = aloop.time()
+        await breaker.wait()
+        assert aloop.time() - start < cooldown
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("threshold", [1, 2])
+def test_circuit_breaker_threshold(threshold):
+    async def run():
+        breaker = CircuitBreaker(threshold=threshold, cooldown=60.0)
+        for _ in range(threshold - 1):
+            breaker.record_failure()
+        assert not breaker.is_open
+        breaker.record_failure()
+        assert breaker.is_open
+
+    asyncio.run(run())
+
+
+def test_circuit_breaker_half_open():
+    cooldown = 0.05
+
+    async def run():
+        breaker = CircuitBreaker(threshold=1, cooldown=cooldown)
+        breaker.record_failure()
+        through = []
+        outcomes = iter([breaker.record_failure, breaker.record_success])
+
+        async def worker(name):
+            await breaker.wait()
+            through.append(name)
+            if len(through) <= 2:
+                # Trials: the first fails and the second succeeds.
+                await asyncio.sleep(0.01)
+                next(outcomes)()
+
+        workers = [asyncio.create_task(worker(name)) for name in range(4)]
+        await asyncio.sleep(cooldown * 1.5)
+        # One trial went through and failed; the rest wait out a new cooldown.
+        assert len(through) == 1
+        assert breaker.is_open
+        await asyncio.gather(*workers)
+        assert sorted(through) == list(range(4))
+        assert not breaker.is_open
+
+    asyncio.run(run())
+
+
+def test_circuit_breaker_abandoned_trial():
+    cooldown = 0.01
+
+    async def run():
+        breaker = CircuitBreaker(threshold=1, cooldown=cooldown)
+        breaker.record_failure()
+        crash = asyncio.Event()
+
+        async def abandon():
+            await breaker.wait()
+            await crash.wait()
+            raise ValueError("not a request error")
+
+        trial = asyncio.create_task(abandon())
+        await asyncio.sleep(cooldown * 2)
+        waiter = asyncio.create_task(breaker.wait())
+        await asyncio.sleep(cooldown)
+        assert not waiter.done()
+
+        # The trial's task ended without reporting, so the waiter takes over.
+        crash.set()
+        await asyncio.wait_for(waiter, 1.0)
+        with pytest.raises(ValueError):
+            await trial
+
+    asyncio.run(run())
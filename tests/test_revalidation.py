@@ -0,0 +1,136 @@
+"""Conditional revalidation of expired cache entries against a stub API."""
+import asyncio
+import time
+
+import pytest
+from aiohttp import web
+
+from bench import start_stub, stub_pokemon
+from cache import open_cache
+from smolapi import SmolPokeApiScraper
+
+LAST_MODIFIED = "Wed, 21 Oct 2015 07:28:00 GMT"
+
+
+class VersionedApi():
+    """Stub API that serves versioned Pokémon and honors validators."""
+
+    def __init__(self, etag=True, last_modified=False):
+        self.version = 1
+        self.etag = etag
+        self.last_modified = last_modified
+        # Request headers of every request, in order
+        self.requests = []
+
+    async def handler(self, request):
+        self.requests.append(dict(request.headers))
+        headers = {}
+        if self.etag:
+            headers["ETag"] = f'"v{self.version}"'
+        if self.last_modified:
+            headers["Last-Modified"] = LAST_MODIFIED
+
+        unchanged = (
+            self.etag and request.headers.get("If-None-Match") == headers["ETag"]
+        ) or (
+            self.last_modified
+            and request.headers.get("If-Modified-Since") == LAST_MODIFIED
+        )
+        if unchanged:
+            return web.Response(status=304, headers=headers)
+
+        data = stub_pokemon(int(request.match_info["key"]))
+        data["version"] = self.version
+        return web.json_response(data, headers=headers)
+
+
+async def scrape(api, cache_path, ttl):
+    """Scrape Pokémon 1 from api and return it."""
+    runner, base_url = await start_stub(api.handler)
+    try:
+        SmolPokeApiScraper._POKEAPI = base_url + "/{}"
+        scraper = SmolPokeApiScraper.new(cache_path=cache_path, rate=1000, ttl=ttl)
+        async with await scraper as pokeapi:
+            return (await pokeapi.get_pokemon([1]))[1]
+    finally:
+        await runner.cleanup()
+
+
+@pytest.fixture
+def cache_path(tmp_path, monkeypatch):
+    # `scrape` points the scraper at the stub, so restore the API afterwards.
+    monkeypatch.setattr(SmolPokeApiScraper, "_POKEAPI", SmolPokeApiScraper._POKEAPI)
+    return str(tmp_path / "cache.log")
+
+
+def expire(cache_path):
+    """Age the cached Pokémon past any TTL."""
+    cache = open_cache(cache_path)
+    cache.touch(1, fetched=0.0)
+    cache.close()
+
+
+def cached_meta(cache_path):
+    cache = open_cache(cache_path)
+    try:
+        return cache[1], cache.meta(1)
+    finally:
+        cache.close()
+
+
+@pytest.mark.parametrize(
+    ("etag", "last_modified"),
+    [(True, False), (False, True)],
+    ids=["etag", "last-modified"],
+)
+def test_not_modified_keeps_body(cache_path, etag, last_modified):
+    api = VersionedApi(etag, last_modified)
+    first = asyncio.run(scrape(api, cache_path, ttl=60))
+    expire(cache_path)
+
+    second = asyncio.run(scrape(api, cache_path, ttl=3600))
+    data, meta = cached_meta(cache_path)
+
+    assert len(api.requests) == 2
+    if etag:
+        assert api.requests[1]["If-None-Match"] == '"v1"'
+    else:
+        assert api.requests[1]["If-Modified-Since"] == LAST_MODIFIED
+    assert second == first == data
+    # The 304 refreshes the entry's age and TTL but keeps its validators.
+    assert meta["fetched"] > time.time() - 60
+    assert meta["ttl"] == 3600
+    assert meta["etag"] == ('"v1"' if etag else None)
+    assert meta["last_modified"] == (LAST_MODIFIED if last_modified else None)
+
+    # Fresh again, so a third scrape doesn't reach the API.
+    asyncio.run(scrape(api, cache_path, ttl=3600))
+    assert len(api.requests) == 2
+
+
+def test_changed_resource_replaces_entry(cache_path):
+    api = VersionedApi()
+    asyncio.run(scrape(api, cache_path, ttl=60))
+    expire(cache_path)
+
+    api.version = 2
+    data = asyncio.run(scrape(api, cache_path, ttl=60))
+    cached, meta = cached_meta(cache_path)
+
+    assert api.requests[1]["If-None-Match"] == '"v1"'
+    assert data["version"] == cached["version"] == 2
+    assert meta["etag"] == '"v2"'
+
+
+def test_no_validators_refetches(cache_path):
+    api = VersionedApi(etag=False)
+    asyncio.run(scrape(api, cache_path, ttl=60))
+    expire(cache_path)
+
+    api.version = 2
+    data = asyncio.run(scrape(api, cache_path, ttl=60))
+
+    assert len(api.requests) == 2
+    assert "If-None-Match" not in api.requests[1]
+    assert "If-Modified-Since" not in api.requests[1]
+    assert data["version"] == 2
@@ -0,0 +1,80 @@
+"""Raw GSS files are checked against the wanted columns before they're read."""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from loaders.schema import resolve
+from loaders.streaming import stream_raw
+from loaders.students import raw_vars
+
+THESIS: Path = Path(__file__).parents[1] / "thesis_2023"
+
+
+def raw_gss(weights: list[str], rows: int = 30) -> pd.DataFrame:
+    """Raw GSS with every wanted column, the weights replaced by `weights`."""
+    rng: np.random.Generator = np.random.default_rng(0)
+    columns: list[str] = [column for column in raw_vars if column != "wtsscomp"]
+    gss: pd.DataFrame = pd.DataFrame(
+        {column: rng.integers(1, 4, rows) for column in columns}
+    )
+    gss["year"] = rng.choice([2016, 2018, 2021], rows)
+    gss["coninc"] = rng.uniform(300.0, 170000.0, rows)
+    for weight in weights:
+        gss[weight] = rng.uniform(0.5, 3.0, rows)
+    return gss
+
+
+@pytest.mark.parametrize("weight", ["wtssall", "wtssps"])
+def test_harmonize_weight(tmp_path: Path, weight: str) -> None:
+    raw: pd.DataFrame = raw_gss([weight])
+    raw.to_csv(tmp_path / "GSS.csv", index=False)
+
+    assert stream_raw(tmp_path / "GSS.csv", tmp_path / "filtered.csv") == len(raw)
+    filtered: pd.DataFrame = pd.read_csv(tmp_path / "filtered.csv")
+    assert weight not in filtered.columns
+    np.testing.assert_allclose(filtered["wtsscomp"], raw[weight])
+
+
+def test_harmonize_prefers_wtssall(tmp_path: Path) -> None:
+    raw: pd.DataFrame = raw_gss(["wtssall", "wtssps"])
+    raw.loc[raw["year"] == 2021, "wtssall"] = np.nan
+    raw.loc[raw["year"] < 2021, "wtssps"] = np.nan
+    raw.loc[0, "wtssps"] = 100.0
+    raw.to_csv(tmp_path / "GSS.csv", index=False)
+
+    stream_raw(tmp_path / "GSS.csv", tmp_path / "filtered.csv")
+    filtered: pd.DataFrame = pd.read_csv(tmp_path / "filtered.csv")
+    expected: pd.Series = raw["wtssall"].fillna(raw["wtssps"])
+    np.testing.assert_allclose(filtered["wtsscomp"], expected)
+
+
+def test_missing_column(tmp_path: Path) -> None:
+    raw_gss(["wtssall"]).drop(columns="letin1a").to_csv(
+        tmp_path / "GSS.csv", index=False
+    )
+    assert resolve(raw_gss(["wtssall"]).columns, raw_vars).missing == []
+
+    with pytest.raises(ValueError, match="missing `letin1a`"):
+        stream_raw(tmp_path / "GSS.csv", tmp_path / "filtered.csv")
+    assert not (tmp_path / "filtered.csv").exists()
+
+
+def test_missing_column_cli(tmp_path: Path) -> None:
+    raw_gss([]).to_csv(tmp_path / "GSS.csv", index=False)
+    environment: dict[str, str] = {**os.environ, "PYTHONPATH": str(THESIS)}
+    result: subprocess.CompletedProcess = subprocess.run(
+        [sys.executable, "-m", "loaders", "GSS.csv", "raw"],
+        cwd=tmp_path,
+        env=environment,
+        capture_output=True,
+        text=True,
+    )
+
+    assert result.returncode != 0
+    assert "ValueError: GSS.csv is missing `wtsscomp`" in result.stderr
+    assert not (tmp_path / "gss_filtered").exists()
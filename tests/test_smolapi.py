@@ -0,0 +1,57 @@
+"""Concurrent requests of the scraper against a stub API."""
+import asyncio
+
+import pytest
+from aiohttp import web
+
+from bench import start_stub, stub_pokemon
+from smolapi import SmolPokeApiScraper
+
+
+class SlowApi():
+    """Stub API that counts the requests it's serving at once."""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.in_flight = 0
+        self.peak = 0
+
+    async def handler(self, request):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            return web.json_response(stub_pokemon(int(request.match_info["key"])))
+        finally:
+            self.in_flight -= 1
+
+
+@pytest.fixture(autouse=True)
+def restore_api(monkeypatch):
+    monkeypatch.setattr(SmolPokeApiScraper, "_POKEAPI", SmolPokeApiScraper._POKEAPI)
+
+
+@pytest.mark.parametrize("max_in_flight", [1, 3])
+def test_max_in_flight(tmp_path, max_in_flight):
+    api = SlowApi()
+
+    async def run():
+        runner, base_url = await start_stub(api.handler)
+        try:
+            SmolPokeApiScraper._POKEAPI = base_url + "/{}"
+            scraper = SmolPokeApiScraper.new(
+                cache_path=str(tmp_path / "cache.log"),
+                rate=1000,
+                burst=20,
+                max_in_flight=max_in_flight,
+            )
+            async with await scraper as pokeapi:
+                assert pokeapi._session.connector.limit == max_in_flight
+                return await pokeapi.get_pokemon(range(1, 13))
+        finally:
+            await runner.cleanup()
+
+    pokemon = asyncio.run(run())
+    assert sorted(pokemon) == list(range(1, 13))
+    # The rate and burst would allow all 12 at once.
+    assert api.peak == max_in_flight
@@ -0,0 +1,60 @@
+"""Cached student outputs are rebuilt when the code they depend on changes."""
+import inspect
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from loaders import features, plan
+from loaders.plan import OUTPUTS, OutputSpec, cached_students
+from loaders.stagecache import StageCache, code_version
+from loaders.streaming import stream_raw
+from loaders.students import raw_vars
+
+
+@pytest.fixture
+def filtered(tmp_path: Path) -> Path:
+    """Filtered GSS with random codes for every wanted column."""
+    rng: np.random.Generator = np.random.default_rng(0)
+    rows: int = 50
+    gss: pd.DataFrame = pd.DataFrame(
+        {column: rng.integers(1, 4, rows) for column in raw_vars}
+    )
+    gss["year"] = rng.choice([2008, 2016, 2021], rows)
+    gss["coninc"] = rng.uniform(300.0, 170000.0, rows)
+    gss["wtsscomp"] = rng.uniform(0.5, 3.0, rows)
+    gss.to_csv(tmp_path / "GSS.csv", index=False)
+    stream_raw(tmp_path / "GSS.csv", tmp_path / "gss_filtered.csv")
+    return tmp_path / "gss_filtered.csv"
+
+
+@pytest.mark.parametrize("module", [features, plan], ids=lambda m: m.__name__)
+def test_code_change_invalidates(
+    filtered: Path,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    module: ModuleType,
+) -> None:
+    outputs: dict[str, OutputSpec] = {
+        "safiya": OutputSpec(str(tmp_path / "safiya.csv"), OUTPUTS["safiya"].columns)
+    }
+    cache: StageCache = StageCache(tmp_path / "cache")
+    assert cached_students(filtered, outputs, cache) == ["safiya"]
+    assert cached_students(filtered, outputs, cache) == []
+
+    # Edit the module's source as seen by the cache.
+    getsource: Callable[[Any], str] = inspect.getsource
+    version: str = code_version(module)
+    monkeypatch.setattr(
+        inspect,
+        "getsource",
+        lambda obj: getsource(obj) + ("\n# edited" if obj is module else ""),
+    )
+    assert code_version(module) != version
+
+    misses: int = cache.misses
+    assert cached_students(filtered, outputs, cache) == ["safiya"]
+    assert cache.misses > misses
@@ -0,0 +1,64 @@
+"""Year-partitioned data sets read back as they were written."""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from loaders.store import PartitionedWriter, read_partitioned, write_partitioned
+
+
+@pytest.fixture
+def gss() -> pd.DataFrame:
+    rng: np.random.Generator = np.random.default_rng(0)
+    n: int = 200
+    age: pd.Series = pd.Series(rng.integers(18, 90, n), dtype="Int8")
+    age[rng.random(n) < 0.1] = pd.NA
+    return pd.DataFrame(
+        {
+            "year": rng.choice([2006, 2008, 2010], n).astype("int16"),
+            "age": age,
+            "sex": pd.Categorical(rng.choice(["Female", "Male", None], n)),
+            "wtsscomp": rng.uniform(0.5, 3.0, n),
+        }
+    )
+
+
+def test_round_trip(gss: pd.DataFrame, tmp_path: Path) -> None:
+    write_partitioned(gss, tmp_path / "gss")
+    assert sorted(p.name for p in (tmp_path / "gss").iterdir()) == [
+        "year=2006",
+        "year=2008",
+        "year=2010",
+    ]
+
+    read: pd.DataFrame = read_partitioned(tmp_path / "gss")
+    # Rows come back grouped by year.
+    expected: pd.DataFrame = gss.sort_values("year", kind="stable")
+    pd.testing.assert_frame_equal(read, expected.reset_index(drop=True))
+
+
+def test_columns_and_years(gss: pd.DataFrame, tmp_path: Path) -> None:
+    write_partitioned(gss, tmp_path / "gss")
+    read: pd.DataFrame = read_partitioned(
+        tmp_path / "gss", ["sex", "year"], [("year", ">=", 2008)]
+    )
+
+    assert list(read.columns) == ["sex", "year"]
+    assert read["year"].dtype == np.int16
+    expected: pd.DataFrame = gss.loc[gss["year"] >= 2008, ["sex", "year"]]
+    expected = expected.sort_values("year", kind="stable").reset_index(drop=True)
+    pd.testing.assert_frame_equal(read, expected)
+
+
+def test_empty_batches(gss: pd.DataFrame, tmp_path: Path) -> None:
+    # Streamed outputs get batches that their filters empty.
+    with PartitionedWriter(tmp_path / "gss") as writer:
+        writer.write(gss.iloc[:0])
+        writer.write(gss.iloc[:100])
+        writer.write(gss.iloc[100:100])
+        writer.write(gss.iloc[100:])
+
+    read: pd.DataFrame = read_partitioned(tmp_path / "gss")
+    expected: pd.DataFrame = gss.sort_values("year", kind="stable")
+    pd.testing.assert_frame_equal(read, expected.reset_index(drop=True))
@@ -0,0 +1,142 @@
+"""The vectorized recoders and the codebook against the scalar recoders."""
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from loaders import cleaners, vectorized
+from loaders.codebook import CODEBOOK, SMALL_FEATURES, apply_codebook
+
+# Codes of each recoder: every listed code and some that aren't
+CODES: dict[str, list[float]] = {
+    "ethnic": list(range(-1, 1001)),
+    "partyid": list(range(-1, 10)),
+    "degree": list(range(-1, 10)),
+    "letin": list(range(-1, 10)),
+    "age": list(range(0, 100)),
+    "year": list(range(1972, 2025)),
+    "income": [-1, 0, 1, 19999, 20000, 29999.5, 30000, 39999, 40000, 59999]
+    + [60000, 79999, 80000, 99999, 100000, 159999, 160000, 1e6],
+}
+
+# Vectorized recoder, its scalar reference, and the codes it takes
+RECODERS: list[tuple[Callable, Callable, str]] = [
+    (vectorized.recode_ethnic_array, cleaners.recode_ethnic, "ethnic"),
+    (vectorized.recode_partyid_array, cleaners.recode_partyid, "partyid"),
+    (vectorized.recode_degree_array, cleaners.recode_degree, "degree"),
+    (vectorized.recode_degree_all_array, cleaners.recode_degree_all, "degree"),
+    (vectorized.recode_degree_binary_array, cleaners.recode_degree_binary, "degree"),
+    (vectorized.recode_letin_binary_array, cleaners.recode_letin_binary, "letin"),
+    (vectorized.recode_age_array, cleaners.recode_age, "age"),
+    (vectorized.create_president_array, cleaners.create_president, "year"),
+    (
+        vectorized.recode_income_oth_cats_array,
+        cleaners.recode_income_oth_cats,
+        "income",
+    ),
+]
+
+# `create_president` and `recode_income_oth_cats` assert that they get
+# numbers, so they never see pd.NA.
+NA_INTOLERANT: set[str] = {"year", "income"}
+
+
+def columns(codes: list[float], na: bool = True) -> dict[str, pd.Series]:
+    """Codes shuffled in every dtype the loaders produce, with missing values."""
+    values: np.ndarray = np.random.default_rng(0).permutation(np.asarray(codes))
+    integral: bool = bool(np.all(values == np.floor(values)))
+    series: dict[str, pd.Series] = {
+        # Non-integral codes in float columns are never valid.
+        "float64": pd.Series(
+            np.concatenate([values, [np.nan, 1.5, np.nan]]), dtype="float64"
+        )
+    }
+    if integral:
+        series["int64"] = pd.Series(values.astype(np.int64))
+        if na:
+            series["Int64"] = pd.Series(
+                pd.array([*values.astype(np.int64), pd.NA, pd.NA], dtype="Int64")
+            )
+    return series
+
+
+def reference(series: pd.Series, recoder: Callable) -> pd.Series:
+    """How the wrangling scripts recoded before the vectorized recoders."""
+    return series.map(recoder).astype("category")
+
+
+@pytest.mark.parametrize(
+    ("vector", "scalar", "domain"),
+    RECODERS,
+    ids=[vector.__name__ for vector, _, _ in RECODERS],
+)
+def test_vectorized_matches_scalar(
+    vector: Callable, scalar: Callable, domain: str
+) -> None:
+    for dtype, series in columns(CODES[domain], domain not in NA_INTOLERANT).items():
+        expected: pd.Series = reference(series, scalar)
+        recoded: pd.Series = vector(series)
+        # Categories are compared in order too.
+        pd.testing.assert_series_equal(recoded, expected, obj=dtype)
+
+
+def test_letin_binary_labels() -> None:
+    letin: pd.Series = CODEBOOK["letin1a"].recode(columns(CODES["letin"])["Int64"])
+    pd.testing.assert_series_equal(
+        vectorized.recode_letin_binary_array(letin),
+        reference(letin, cleaners.recode_letin_binary),
+    )
+
+
+@pytest.mark.parametrize("name", sorted(CODEBOOK))
+def test_codebook_matches_labels(name: str) -> None:
+    recode = CODEBOOK[name]
+    codes: list[float] = list(range(-1, max(recode.labels) + 3))
+    for dtype, series in columns(codes).items():
+        expected: pd.Series = series.map(dict(recode.labels)).astype("category")
+        pd.testing.assert_series_equal(recode.recode(series), expected, obj=dtype)
+
+
+def test_recode_small_features() -> None:
+    rng: np.random.Generator = np.random.default_rng(1)
+    gss: pd.DataFrame = pd.DataFrame(
+        {
+            CODEBOOK[name].source: pd.array(rng.integers(-1, 12, 500), dtype="Int64")
+            for name in SMALL_FEATURES
+        }
+    )
+    gss.loc[::7, "sex"] = pd.NA
+    gss["coninc"] = rng.uniform(0, 200000, len(gss))
+    gss.loc[::11, "coninc"] = np.nan
+
+    expected: pd.DataFrame = gss.copy()
+    for name in SMALL_FEATURES:
+        recode = CODEBOOK[name]
+        expected[recode.target] = (
+            gss[recode.source].map(dict(recode.labels)).astype("category")
+        )
+
+    recoded: pd.DataFrame = cleaners.recode_small_features(gss.copy())
+    for name in SMALL_FEATURES:
+        column: str = CODEBOOK[name].target
+        pd.testing.assert_series_equal(recoded[column], expected[column])
+    pd.testing.assert_series_equal(
+        recoded["coninc_quantiles"], pd.qcut(gss["coninc"], 4), check_names=False
+    )
+
+
+def test_apply_codebook_reads_sources_first() -> None:
+    gss: pd.DataFrame = pd.DataFrame({"degree": pd.array([0, 1, 2, 3, 4, 8, pd.NA])})
+    recoded: pd.DataFrame = apply_codebook(
+        gss.copy(), ["degree", "degree_all", "hs_or_college"]
+    )
+    for name, scalar in [
+        ("degree", cleaners.recode_degree),
+        ("degree_all", cleaners.recode_degree_all),
+        ("hs_or_college", cleaners.recode_degree_binary),
+    ]:
+        pd.testing.assert_series_equal(
+            recoded[CODEBOOK[name].target],
+            reference(gss["degree"], scalar).rename(CODEBOOK[name].target),
+        )
@@ -0,0 +1,71 @@
+"""Student outputs written from one Arrow table."""
+import io
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from loaders.plan import OutputSpec
+from loaders.store import read_partitioned
+from loaders.writers import OutputWriter
+
+
+def parsed(gss: pd.DataFrame) -> pd.DataFrame:
+    """What `pd.read_csv` reads from `to_csv`."""
+    return pd.read_csv(io.StringIO(gss.to_csv(index=False)))
+
+
+@pytest.fixture
+def recoded() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "year": np.array([2016, 2008, 2016, 2012], dtype="int16"),
+            "age": pd.array([34, None, 71, 18], dtype="Int8"),
+            "vstrat": [395.0, 2.5, np.nan, 7.0],
+            "relig": pd.Categorical(["None", "Other, eastern", None, "None"]),
+            # Like the quartiles of `pd.qcut`
+            "coninc_quantiles": pd.cut([0.5, 1.5, 0.5, 1.5], [0, 1, 2]),
+        }
+    )
+
+
+def test_csv_format(recoded: pd.DataFrame, tmp_path: Path) -> None:
+    outputs: dict[str, OutputSpec] = {
+        "all": OutputSpec(str(tmp_path / "all.csv")),
+        "some": OutputSpec(str(tmp_path / "some.csv"), ["relig", "year"]),
+    }
+    kept: np.ndarray = np.ones(2, bool)
+    with OutputWriter(outputs) as writer:
+        writer.write(recoded.iloc[:2], {"all": kept, "some": kept})
+        writer.write(recoded.iloc[2:], {"all": kept, "some": np.array([False, True])})
+
+    # Quoted headers and strings, and no `.0` on whole floats; rows in order
+    assert (tmp_path / "all.csv").read_text() == (
+        '"year","age","vstrat","relig","coninc_quantiles"\n'
+        '2016,34,395,"None","(0, 1]"\n'
+        '2008,,2.5,"Other, eastern","(1, 2]"\n'
+        '2016,71,,,"(0, 1]"\n'
+        '2012,18,7,"None","(1, 2]"\n'
+    )
+    assert (tmp_path / "some.csv").read_text() == (
+        '"relig","year"\n"None",2016\n"Other, eastern",2008\n"None",2012\n'
+    )
+
+    # The same values as `to_csv`
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / "all.csv"), parsed(recoded))
+
+
+def test_compressed_and_partitioned(recoded: pd.DataFrame, tmp_path: Path) -> None:
+    outputs: dict[str, OutputSpec] = {
+        "csv": OutputSpec(str(tmp_path / "gss.csv.gz")),
+        "parquet": OutputSpec(str(tmp_path / "gss")),
+    }
+    with OutputWriter(outputs) as writer:
+        writer.write(recoded, {name: np.ones(len(recoded), bool) for name in outputs})
+
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / "gss.csv.gz"), parsed(recoded))
+    # Partitions group the rows by year.
+    read: pd.DataFrame = read_partitioned(tmp_path / "gss", ["year", "age"])
+    expected: pd.DataFrame = recoded[["year", "age"]].sort_values("year", kind="stable")
+    pd.testing.assert_frame_equal(read, expected.reset_index(drop=True))
@@ -2,161 +2,169 @@
 
 """Wrangle student data sets from raw GSS."""
 
-import sys
-from itertools import chain
-from typing import Iterable
+import argparse
+from dataclasses import replace
+from typing import Optional
 
+import numpy as np
 import pandas as pd
-
-from loaders.cleaners import (
-    create_president,
-    recode_age,
-    recode_degree,
-    recode_degree_all,
-    recode_degree_binary,
-    recode_ethnic,
-    recode_income_oth_cats,
-    recode_letin_binary,
-    recode_partyid,
-    recode_small_features,
+import pyarrow.dataset as ds
+
+from loaders.memory import column_memory, memory_report, peak_rss
+from loaders.plan import (
+    OUTPUTS,
+    OutputSpec,
+    ScanPlan,
+    cached_students,
+    coninc_quartile_edges,
+    needs_coninc_edges,
+    open_gss,
+    plan_scan,
+    recode_outputs,
+    scan,
+)
+from loaders.schema import SourceSchema, harmonize, probe_columns, resolve
+from loaders.stagecache import DEFAULT_MAX_BYTES, StageCache
+from loaders.store import open_writer
+from loaders.streaming import (
+    DEFAULT_BLOCK_SIZE,
+    read_gss_csv,
+    stream_raw,
+    stream_students,
 )
+from loaders.students import raw_dtypes, raw_vars
+from loaders.writers import OutputWriter, compressed_path
 
-argc: int = len(sys.argv)
-if argc < 2:
-    print(f"USAGE:\n\t{sys.argv[0]} PATH-TO-GSS-CSV MODE")
-    print("MODE: raw OR students")
-    sys.exit()
+parser = argparse.ArgumentParser(
+    prog="loaders", description="Wrangle student data sets from raw GSS."
+)
+parser.add_argument(
+    "path", help="path to the GSS CSV or the filtered GSS data set (students)"
+)
+parser.add_argument(
+    "mode",
+    choices=["raw", "students"],
+    help="raw: filter the raw GSS; students: create the student data sets",
+)
+parser.add_argument(
+    "--outputs",
+    nargs="+",
+    choices=list(OUTPUTS),
+    default=list(OUTPUTS),
+    help="students mode data sets to write (default: all)",
+)
+parser.add_argument(
+    "--csv",
+    action="store_true",
+    help="write the filtered and wrangled GSS as CSVs instead of Parquet",
+)
+parser.add_argument(
+    "--stream",
+    action="store_true",
+    help="read and write in batches to bound memory use",
+)
+parser.add_argument(
+    "--block-size",
+    type=int,
+    default=DEFAULT_BLOCK_SIZE >> 20,
+    help="MiB per batch when streaming (default: %(default)s)",
+)
+parser.add_argument(
+    "--compression",
+    # Codecs that both pd.read_csv and Parquet support
+    choices=["gzip", "zstd"],
+    help="compress the student data sets: CSVs get the codec's extension and "
+    "Parquet uses it instead of zstd (default: uncompressed CSVs)",
+)
+parser.add_argument(
+    "--cache",
+    default=".gss_cache",
+    help="directory of cached stages for students mode (default: %(default)s)",
+)
+parser.add_argument(
+    "--cache-size",
+    type=int,
+    default=DEFAULT_MAX_BYTES >> 20,
+    help="MiB of cached stages to keep (default: %(default)s)",
+)
+parser.add_argument(
+    "--no-cache",
+    action="store_true",
+    help="recompute every stage in students mode without the cache",
+)
+parser.add_argument(
+    "--memory",
+    action="store_true",
+    help="report the peak memory use, and the memory of each column before and "
+    "after recoding in students mode with --no-cache",
+)
+args: argparse.Namespace = parser.parse_args()
 
 # Path to GSS and script task
-path: str = sys.argv[1]
-mode: str = sys.argv[2]
-
-# Features for both data sets
-# https://gssdataexplorer.norc.org/gssweighting
-weights: list[str] = ["vstrat", "vpsu", "wtsscomp"]
-safiya_vars: list[str] = [
-    "year",
-    "age",
-    "degree",
-    "sex",
-    "race",
-    "partyid",
-    "othlang",
-    "letin1a",
-    "coninc",
-] + weights
-safiya_vars_add: list[str] = [
-    "age_cat",
-    "coninc_cat",
-    "coninc_log",
-    "decrease_imm",
-    "hs_or_college",
-    "president",
-]
-theo_vars: list[str] = [
-    "year",
-    "age",
-    "degree",
-    "sex",
-    "race",
-    "region",
-    "ethnic",
-    "coninc",
-    "talkspvs",
-] + weights
-theo_vars_add: list[str] = [
-    "age_cat",
-    "coninc_log",
-    "coninc_quantiles",
-    "degree_all",
-    "hs_or_college",
-]
-
-if mode == "raw":
+path: str = args.path
+mode: str = args.mode
+block_size: int = args.block_size << 20
+outputs: dict[str, OutputSpec] = {name: OUTPUTS[name] for name in args.outputs}
+
+# Intermediates are Parquet data sets partitioned by year unless --csv
+filtered_path: str = "gss_filtered.csv" if args.csv else "gss_filtered"
+if args.csv and "wrangled" in outputs:
+    outputs["wrangled"] = replace(outputs["wrangled"], path="gss_wrangled.csv")
+
+# Compressed CSVs get the codec's extension, e.g. safiya_clean.csv.gz
+outputs = {
+    name: replace(output, path=compressed_path(output.path, args.compression))
+    for name, output in outputs.items()
+}
+parquet_compression: str = args.compression or "zstd"
+
+if mode == "raw" and args.stream:
+    print(f"Streaming GSS from {path} to ./{filtered_path}")
+    rows: int = stream_raw(path, filtered_path, block_size)
+    print(f"Wrote {rows} rows")
+elif mode == "raw":
     print(f"Loading GSS from {path}")
-    try:
-        gss: pd.DataFrame = pd.read_csv(
-            path,
-            usecols=set(safiya_vars + theo_vars),
-            engine="pyarrow",
-        )
-    except ValueError:
-        print(f"{path} is missing `wtsscomp` - creating the weights instead")
-
-        # Pop wtsscomp
-        theo_vars.pop()
-        safiya_vars.pop()
-
-        # Append old weights
-        theo_vars.append("wtssall")
-        safiya_vars.append("wtssps")
-
-        gss = pd.read_csv(path, usecols=set(safiya_vars + theo_vars), engine="pyarrow")
-        gss["wtsscomp"] = gss["wtssall"].fillna(gss["wtssps"])
-
-        assert gss["wtsscomp"].isna().sum() == 0
-        gss = gss.drop(columns=["wtssall", "wtssps"])
-
-    print("Writing to ./gss_filtered.csv")
-    gss.to_csv("gss_filtered.csv", index=False)
-elif mode == "students":
-    gss: pd.DataFrame = pd.read_csv(
-        path,
-        engine="pyarrow",
-        dtype={
-            "year": int,
-            "age": "Int64",
-            "ethnic": "Int64",
-            "partyid": "Int64",
-            "degree": "Int64",
-            "sex": "Int64",
-            "othlang": "Int64",
-            "race": "Int64",
-            "region": "Int64",
-            "talkspvs": "Int64",
-            "letin1a": "Int64",
-            "coninc": float,
-            "vstrat": float,
-            "vpsu": float,
-            "wtsscomp": float,
-        },
-    )
+    # Resolve the weights from the header so the file is only read once
+    source: SourceSchema = resolve(probe_columns(path), raw_vars)
+    source.check(path)
+    for message in source.describe(path):
+        print(message)
+    gss: pd.DataFrame = read_gss_csv(path, source.columns, raw_dtypes(source.columns))
+    gss = harmonize(gss, source)
+
+    print(f"Writing to ./{filtered_path}")
+    with open_writer(filtered_path) as writer:
+        writer.write(gss)
+elif args.stream:
+    print(f"Streaming {path} to {', '.join(o.path for o in outputs.values())}")
+    rows = stream_students(path, outputs, block_size, parquet_compression)
+    print(f"Recoded {rows} rows")
+elif not args.no_cache:
+    # Only recompute the stages whose inputs changed since the last run
+    cache: StageCache = StageCache(args.cache, args.cache_size << 20)
+    written: list[str] = cached_students(path, outputs, cache, parquet_compression)
+    for name, output in outputs.items():
+        status: str = "Wrote" if name in written else "Up to date:"
+        print(f"{status} {output.path}")
+    print(f"Cache hits: {cache.hits}, misses: {cache.misses}")
+else:
+    # Only read the columns and rows that the outputs need
+    dataset: ds.Dataset = open_gss(path)
+    plan: ScanPlan = plan_scan(outputs.values())
+    coninc_edges: Optional[np.ndarray] = None
+    if needs_coninc_edges(plan):
+        coninc_edges = coninc_quartile_edges(dataset)
+    gss: pd.DataFrame = scan(dataset, plan)
+    scanned: pd.Series = column_memory(gss)
 
     print("Recoding variables")
-    gss["ethnic"] = gss["ethnic"].map(recode_ethnic).astype("category")
-    gss["partyid"] = gss["partyid"].map(recode_partyid).astype("category")
-    gss["hs_or_college"] = gss["degree"].map(recode_degree_binary).astype("category")
-    gss["degree_all"] = gss["degree"].map(recode_degree_all).astype("category")
-    gss["degree"] = gss["degree"].map(recode_degree).astype("category")
-    gss["president"] = gss["year"].map(create_president).astype("category")
-    gss = recode_small_features(gss)
-    gss["decrease_imm"] = gss["letin1a"].map(recode_letin_binary).astype("category")
-    gss["age_cat"] = gss["age"].map(recode_age).astype("category")
-    gss["coninc_cat"] = gss["coninc"].map(recode_income_oth_cats).astype("category")
-
-    print("Writing wrangled data set.")
-    gss.to_csv("gss_wrangled.csv", index=False)
+    gss, masks = recode_outputs(gss, outputs, plan, coninc_edges)
+    if args.memory:
+        print(memory_report(scanned, column_memory(gss)).to_string())
 
-    # Sort features but place weights at the end
-    saf_vars_gen: Iterable = chain(
-        (var for var in sorted(safiya_vars + safiya_vars_add) if var not in weights),
-        weights,
-    )
-    theo_vars_gen: Iterable = chain(
-        (var for var in sorted(theo_vars + theo_vars_add) if var not in weights),
-        weights,
-    )
+    print(f"Writing {', '.join(o.path for o in outputs.values())}")
+    with OutputWriter(outputs, parquet_compression) as writer:
+        writer.write(gss, masks)
 
-    print("Creating student specific data sets")
-    gss_saf: pd.DataFrame = gss[saf_vars_gen].query("year >= 2008")
-    valid_ethnic: list[str] = ["Africa", "Mexico"]
-    gss_theo: pd.DataFrame = gss[theo_vars_gen].query(
-        "(year >= 2008) and (ethnic in @valid_ethnic)"
-    )
-
-    print("Writing student data sets to CSV")
-    gss_saf.to_csv("safiya_clean.csv", index=False)
-    gss_theo.to_csv("theo_clean.csv", index=False)
-
-else:
-    raise ValueError(f"Incorrect mode: {mode}")
+if args.memory and (peak := peak_rss()) is not None:
+    print(f"Peak memory: {peak / 2**20:.1f} MiB")
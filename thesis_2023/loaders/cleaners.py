@@ -1,9 +1,11 @@
 """Functions for wrangling students' data sets."""
-from typing import Literal, SupportsInt, TypeAlias
+from typing import Literal, Optional, SupportsInt, TypeAlias
 
 import numpy as np
 import pandas as pd
 
+from loaders.codebook import ETHNIC_FIRST_SET, SMALL_FEATURES, apply_codebook
+
 # Types
 Number: TypeAlias = np.number | float | int | pd.Int64Dtype | SupportsInt
 AgeCat: TypeAlias = Literal["18-29", "30-39", "40-49", "50-59", "60-69", "70+", pd.NA]
@@ -36,58 +38,13 @@ def recode_ethnic(ethnic: Number) -> str | Literal[pd.NA]:
         Ethnicity as a string.
 
     """
-    # [1, 42)
-    first_set: list[str] = [
-        "Africa",
-        "Austria",
-        "Canada (French)",
-        "Canada (Other)",
-        "China",
-        "Czechoslovakia",
-        "Denmark",
-        "England and Wales",
-        "Finland",
-        "France",
-        "Germany",
-        "Greece",
-        "Hungary",
-        "Ireland",
-        "Italy",
-        "Japan",
-        "Mexico",
-        "Netherlands",
-        "Norway",
-        "Phillipines",
-        "Poland",
-        "Puerto Rico",
-        "Russia",
-        "Scotland",
-        "Spain",
-        "Sweden",
-        "Switzerland",
-        "West Indies (Unspecified)",
-        "Other",
-        "Native American",
-        "India",
-        "Portugal",
-        "Lithuania",
-        "Yugoslavia",
-        "Romania",
-        "Belgium",
-        "Arabic",
-        "Other Spanish",
-        "West Indies (non-Spanish)",
-        "Other Asian",
-        "Other European",
-    ]
-
     match ethnic:
         case _ if pd.isna(ethnic):
             return pd.NA
         case eth if ethnic in range(1, 42):
             assert isinstance(eth, (int, float))
             eth = int(eth)
-            return first_set[eth - 1]
+            return ETHNIC_FIRST_SET[eth - 1]
         case 97:
             return "American Only"
         case 101:
@@ -435,7 +392,33 @@ def recode_income_oth_cats(income: Number) -> IncomeCat:
         return pd.NA
 
 
-def recode_small_features(gss: pd.DataFrame) -> pd.DataFrame:
+def coninc_quartiles(
+    coninc: pd.Series, edges: Optional[np.ndarray] = None
+) -> pd.Series:
+    """Bin `coninc` into quartiles.
+
+    Parameters
+    ----------
+    coninc : pd.Series
+        `coninc` feature from the GSS.
+    edges : Optional[np.ndarray]
+        Quartile edges, such as from a pass over the full data set when
+        `coninc` is a subset. Calculated from `coninc` if not provided.
+
+    Returns
+    -------
+    pd.Series
+        Quartile intervals.
+    """
+    if edges is None:
+        return pd.qcut(coninc, 4)
+    # Same bins as `qcut` with the same edges
+    return pd.cut(coninc, edges, include_lowest=True)
+
+
+def recode_small_features(
+    gss: pd.DataFrame, coninc_edges: Optional[np.ndarray] = None
+) -> pd.DataFrame:
     """Recode a few features that don't require a function.
 
     Remaps: `sex`, `othlang`, `race`, `region`, `talkspvs`, `letin1a`
@@ -444,78 +427,18 @@ def recode_small_features(gss: pd.DataFrame) -> pd.DataFrame:
     ----------
     gss : pd.DataFrame
         GSS loaded as a DataFrame.
+    coninc_edges : Optional[np.ndarray]
+        Quartile edges of `coninc`. See `coninc_quartiles`.
 
     Returns
     -------
     pd.DataFrame
         DataFrame with recoded values.
     """
-    sex: dict[int, str] = {1: "Male", 2: "Female"}
-    gss["sex"] = gss["sex"].astype("Int64").map(sex).astype("category")
-
-    # Does R speak a language other than English or Spanish?
-    gss["othlang"] = (
-        gss["othlang"].astype("Int64").map({1: "Yes", 2: "No"}).astype("category")
-    )
-
-    race: dict[int, str] = {1: "White", 2: "Black", 3: "Other"}
-    gss["race"] = gss["race"].astype("Int64").map(race).astype("category")
-
-    gss["region"] = (
-        gss["region"]
-        .astype("Int64")
-        .map(
-            dict(
-                zip(
-                    range(1, 10),
-                    [
-                        "New England",
-                        "Middle Atlantic",
-                        "East North Central",
-                        "West North Central",
-                        "South Atlantic",
-                        "East South Atlantic",
-                        "West South Central",
-                        "Mountain",
-                        "Pacific",
-                    ],
-                    strict=True,
-                )
-            )
-        )
-        .astype("category")
-    )
-
-    # This variable is only valid for 2014.
-    gss["talkspvs"] = gss["talkspvs"].map(
-        dict(
-            zip(
-                range(1, 6),
-                ["Not comfortable at all", "A little", "Somewhat", "Very", "Extremely"],
-                strict=True,
-            )
-        )
-    )
-
-    # Immigration
-    gss["letin1a"] = gss["letin1a"].map(
-        dict(
-            zip(
-                range(1, 6),
-                [
-                    "Increased a lot",
-                    "Increased a little",
-                    "Remain the same",
-                    "Reduced a little",
-                    "Reduced a lot",
-                ],
-                strict=True,
-            )
-        )
-    )
+    gss = apply_codebook(gss, SMALL_FEATURES)
 
     # Income
     gss["coninc_log"] = np.log(gss["coninc"])
-    gss["coninc_quantiles"] = pd.qcut(gss["coninc"], 4)
+    gss["coninc_quantiles"] = coninc_quartiles(gss["coninc"], coninc_edges)
 
     return gss
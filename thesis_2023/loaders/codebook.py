@@ -0,0 +1,411 @@
+"""Declarative codebook of GSS value labels.
+
+Each `Recode` maps the integer codes of one GSS variable to labels. Codes
+that aren't listed (GSS's "don't know", "no answer", etc.) become NA.
+Recodes are compiled once into a dense lookup array and a `CategoricalDtype`
+so any number of them are applied with one array lookup each.
+
+https://gssdataexplorer.norc.org/variables/vfilter
+"""
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Iterable, Mapping
+
+import numpy as np
+import pandas as pd
+
+# `ethnic` labels for codes [1, 42)
+ETHNIC_FIRST_SET: list[str] = [
+    "Africa",
+    "Austria",
+    "Canada (French)",
+    "Canada (Other)",
+    "China",
+    "Czechoslovakia",
+    "Denmark",
+    "England and Wales",
+    "Finland",
+    "France",
+    "Germany",
+    "Greece",
+    "Hungary",
+    "Ireland",
+    "Italy",
+    "Japan",
+    "Mexico",
+    "Netherlands",
+    "Norway",
+    "Phillipines",
+    "Poland",
+    "Puerto Rico",
+    "Russia",
+    "Scotland",
+    "Spain",
+    "Sweden",
+    "Switzerland",
+    "West Indies (Unspecified)",
+    "Other",
+    "Native American",
+    "India",
+    "Portugal",
+    "Lithuania",
+    "Yugoslavia",
+    "Romania",
+    "Belgium",
+    "Arabic",
+    "Other Spanish",
+    "West Indies (non-Spanish)",
+    "Other Asian",
+    "Other European",
+]
+
+# `ethnic` labels for the sparse codes from 97 up
+ETHNIC_SECOND_SET: dict[int, str] = {
+    97: "American Only",
+    101: "Turkey",
+    202: "Algeria",
+    203: "Congo",
+    204: "Egypt",
+    205: "Ethiopia",
+    206: "Kenya",
+    207: "Nigeria",
+    208: "South Africa",
+    299: "Other Africa",
+    301: "South Korea",
+    302: "Bangladesh",
+    304: "Pakistan",
+    306: "Thailand",
+    307: "Vietnam",
+    401: "Iran",
+    402: "Iraq",
+    403: "Israel",
+    404: "Jordan",
+    405: "Saudia Arabia",
+    406: "Syria",
+    408: "Yemen",
+    499: "Other Middle East",
+    501: "Argentina",
+    503: "Brazil",
+    504: "Chile",
+    505: "Colombia",
+    506: "Ecuador",
+    508: "Guyana",
+    509: "Paraguay",
+    510: "Peru",
+    511: "Suriname",
+    513: "Venezuela",
+    599: "Other South America",
+    601: "Belize",
+    602: "Costa Rica",
+    603: "El Salvador",
+    604: "Guatemala",
+    605: "Honduras",
+    606: "Nicaragua",
+    607: "Panama",
+    699: "Other Central American",
+    799: "Other North America",
+    801: "Cuba",
+    802: "Haiti",
+    803: "Dominican Republic",
+    804: "Jamaica",
+    899: "Other Caribbean",
+    901: "Australia",
+    903: "New Zealand",
+    904: "Samoa",
+    999: "Other Oceania",
+}
+
+
+def collapse(groups: Mapping[str, Iterable[int]]) -> dict[int, str]:
+    """Build code labels from a collapse rule.
+
+    Parameters
+    ----------
+    groups : Mapping[str, Iterable[int]]
+        Labels and the codes collapsed into each label.
+
+    Returns
+    -------
+    dict[int, str]
+        Code to label mapping.
+    """
+    labels: dict[int, str] = {}
+    for label, codes in groups.items():
+        for code in codes:
+            if code in labels:
+                raise ValueError(f"Code {code} is in both {labels[code]} and {label}")
+            labels[code] = label
+    return labels
+
+
+def as_float(series: pd.Series) -> np.ndarray:
+    """Convert a numeric Series, nullable or not, to floats with NaN for NA."""
+    return series.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def as_codes(series: pd.Series) -> np.ndarray:
+    """Convert GSS codes to NumPy without widening them.
+
+    Signed integers keep their width with -1 for NA, which is never a valid
+    code. Other numeric Series are converted with `as_float`.
+    """
+    if pd.api.types.is_signed_integer_dtype(series.dtype):
+        return series.to_numpy(dtype=series.dtype.type, na_value=-1)
+    return as_float(series)
+
+
+@dataclass(frozen=True)
+class Recode:
+    """Value labels for one GSS variable.
+
+    Categories are sorted like `Series.astype("category")` sorts them so
+    recoded columns match the ones the scalar recoders produced.
+    """
+
+    # GSS variable holding the codes
+    source: str
+    # Code to label mapping; unlisted codes are NA
+    labels: Mapping[int, str] = field(repr=False)
+    # Column to write; defaults to `source`
+    column: str | None = None
+
+    @property
+    def target(self) -> str:
+        return self.column or self.source
+
+    @cached_property
+    def dtype(self) -> pd.CategoricalDtype:
+        return pd.CategoricalDtype(sorted(set(self.labels.values())))
+
+    @cached_property
+    def lookup(self) -> np.ndarray:
+        """Dense array from codes to category codes, with -1 for NA."""
+        if any(code < 0 for code in self.labels):
+            raise ValueError(f"{self.source} has negative codes")
+
+        positions: dict[str, int] = {
+            label: i for i, label in enumerate(self.dtype.categories)
+        }
+        lookup: np.ndarray = np.full(max(self.labels, default=0) + 1, -1, np.int16)
+        for code, label in self.labels.items():
+            lookup[code] = positions[label]
+        return lookup
+
+    def codes(self, values: np.ndarray) -> np.ndarray:
+        """Category codes for integer or float GSS codes.
+
+        Non-integral, negative, and unlisted codes are NA (-1), as is NaN
+        because it fails every comparison.
+        """
+        lookup: np.ndarray = self.lookup
+        valid: np.ndarray = (values >= 0) & (values < len(lookup))
+        if values.dtype.kind == "f":
+            valid &= np.floor(values) == values
+        codes: np.ndarray = np.full(len(values), -1, dtype=np.int16)
+        codes[valid] = lookup[values[valid].astype(np.intp)]
+        return codes
+
+    def recode(self, series: pd.Series, observed: bool = True) -> pd.Series:
+        """Recode a Series of GSS codes into a categorical Series.
+
+        Parameters
+        ----------
+        series : pd.Series
+            GSS codes.
+        observed : bool
+            Only keep the categories that occur, like `astype("category")`.
+
+        Returns
+        -------
+        pd.Series
+            Recoded Series with `series`'s index and name.
+        """
+        codes: np.ndarray = self.codes(as_codes(series))
+        return categorical_from_codes(series, codes, self.dtype, observed)
+
+
+def categorical_from_codes(
+    series: pd.Series,
+    codes: np.ndarray,
+    dtype: pd.CategoricalDtype,
+    observed: bool = True,
+) -> pd.Series:
+    """Wrap category codes in a categorical Series shaped like `series`."""
+    categorical: pd.Categorical = pd.Categorical.from_codes(codes, dtype=dtype)
+    if observed:
+        categorical = categorical.remove_unused_categories()
+    return pd.Series(categorical, index=series.index, name=series.name)
+
+
+_REGIONS: list[str] = [
+    "New England",
+    "Middle Atlantic",
+    "East North Central",
+    "West North Central",
+    "South Atlantic",
+    "East South Atlantic",
+    "West South Central",
+    "Mountain",
+    "Pacific",
+]
+
+# Recodes by name. Variants of a variable, such as the notebooks' versions,
+# get their own name and write to the variable's column.
+CODEBOOK: dict[str, Recode] = {
+    "ethnic": Recode(
+        "ethnic", dict(enumerate(ETHNIC_FIRST_SET, start=1)) | ETHNIC_SECOND_SET
+    ),
+    # Only the ethnicities in Theo's data set
+    "ethnic_theo": Recode("ethnic", {1: "Africa", 17: "Mexico"}),
+    "partyid": Recode(
+        "partyid",
+        collapse(
+            {
+                "Democrat": (0, 1, 2),
+                "Republican": (4, 5, 6),
+                "Independent": (3, 7),
+            }
+        ),
+    ),
+    "partyid_other": Recode(
+        "partyid",
+        collapse({"Democrat": (0, 1, 2), "Republican": (4, 5, 6), "Other": (3, 7)}),
+    ),
+    "degree": Recode(
+        "degree",
+        collapse({"No degree": (0,), "HS or assoc": (1, 2), "College": (3, 4)}),
+    ),
+    "degree_all": Recode(
+        "degree",
+        {
+            0: "Less than high school",
+            1: "High school",
+            2: "Junior college",
+            3: "Bachelor's",
+            4: "Graduate",
+        },
+        column="degree_all",
+    ),
+    "hs_or_college": Recode(
+        "degree",
+        collapse({"HS or less": (0, 1), "Some college": (2, 3, 4)}),
+        column="hs_or_college",
+    ),
+    "educ_cat": Recode(
+        "educ",
+        collapse(
+            {
+                "No schooling": (0,),
+                "Less than high school": range(1, 13),
+                "College": range(13, 17),
+                "Master's": range(17, 19),
+                "Ph. D/Doctorate": range(19, 97),
+            }
+        ),
+        column="educ_cat",
+    ),
+    "sex": Recode("sex", {1: "Male", 2: "Female"}),
+    # Does R speak a language other than English or Spanish?
+    "othlang": Recode("othlang", {1: "Yes", 2: "No"}),
+    "race": Recode("race", {1: "White", 2: "Black", 3: "Other"}),
+    "region": Recode("region", dict(enumerate(_REGIONS, start=1))),
+    # This variable is only valid for 2014.
+    "talkspvs": Recode(
+        "talkspvs",
+        dict(
+            enumerate(
+                ["Not comfortable at all", "A little", "Somewhat", "Very", "Extremely"],
+                start=1,
+            )
+        ),
+    ),
+    # Immigration
+    "letin1a": Recode(
+        "letin1a",
+        dict(
+            enumerate(
+                [
+                    "Increased a lot",
+                    "Increased a little",
+                    "Remain the same",
+                    "Reduced a little",
+                    "Reduced a lot",
+                ],
+                start=1,
+            )
+        ),
+    ),
+    "decrease_imm": Recode(
+        "letin1a",
+        collapse({"Increase or stay the same": (1, 2, 3), "Decrease": (4, 5)}),
+        column="decrease_imm",
+    ),
+    # Income in the extracts' odd `income` coding
+    "income": Recode(
+        "income",
+        collapse({"<$8K": range(1, 8), "$8K to $15K": (8, 9), "$15K+": (10, 11, 12)}),
+    ),
+    # How important is it for R's children to be able to think for themselves?
+    "thnkself": Recode(
+        "thnkself", {1: "Most", 2: "Second", 3: "Third", 4: "Fourth", 5: "Last"}
+    ),
+    # Does R believe in life after death?
+    "postlife": Recode("postlife", {1: "Yes", 2: "No"}),
+}
+
+# Recodes that `recode_small_features` applies
+SMALL_FEATURES: list[str] = [
+    "sex",
+    "othlang",
+    "race",
+    "region",
+    "talkspvs",
+    "letin1a",
+]
+
+
+def apply_codebook(
+    gss: pd.DataFrame,
+    recodes: Iterable[str],
+    codebook: Mapping[str, Recode] = CODEBOOK,
+    observed: bool = True,
+) -> pd.DataFrame:
+    """Apply several codebook recodes to a DataFrame.
+
+    Every source column is read before any column is written, so recodes
+    may overwrite a column that other recodes read (e.g. `degree` along
+    with `degree_all` and `hs_or_college`).
+
+    Parameters
+    ----------
+    gss : pd.DataFrame
+        GSS with integer coded columns.
+    recodes : Iterable[str]
+        Names of recodes in `codebook`.
+    codebook : Mapping[str, Recode]
+        Codebook to use.
+    observed : bool
+        Only keep the categories that occur, like `astype("category")`.
+
+    Returns
+    -------
+    pd.DataFrame
+        `gss` with the recoded columns.
+    """
+    recodes = [codebook[name] for name in recodes]
+
+    # Each source is converted once no matter how many recodes read it.
+    sources: dict[str, np.ndarray] = {
+        recode.source: as_codes(gss[recode.source]) for recode in recodes
+    }
+    recoded: dict[str, pd.Series] = {}
+    for recode in recodes:
+        source: pd.Series = gss[recode.source].rename(recode.target)
+        codes: np.ndarray = recode.codes(sources[recode.source])
+        recoded[recode.target] = categorical_from_codes(
+            source, codes, recode.dtype, observed
+        )
+
+    for column, series in recoded.items():
+        gss[column] = series
+    return gss
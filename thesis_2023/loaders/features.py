@@ -0,0 +1,127 @@
+"""Build derived GSS columns from a graph of declared features.
+
+A feature declares the GSS columns it reads, the features it needs, and
+the function that computes it. Sources are always the GSS codes as they
+were read, never a recoded column, so a feature that replaces its source
+(such as `degree`) can't break another feature that reads the same
+source (such as `hs_or_college`).
+
+`build_features` only computes the requested features and the features
+they need, in topological order, running features that don't depend on
+each other on a thread pool.
+
+>>> features = {
+...     "coninc_log": Feature(np.log, sources=("coninc",)),
+...     "coninc_log2": Feature(lambda log: log / np.log(2), needs=("coninc_log",)),
+... }
+>>> built = build_features(gss, ["coninc_log2"], features)
+"""
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from graphlib import TopologicalSorter
+from typing import Any, Callable, Iterable, Mapping, Optional
+
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class Feature:
+    """A derived column and how to compute it."""
+
+    # Called with the source columns then the needed features, in order, and
+    # the keyword parameters named in `params`
+    function: Callable[..., pd.Series]
+    # GSS columns the feature reads
+    sources: tuple[str, ...] = ()
+    # Features that must be built first
+    needs: tuple[str, ...] = ()
+    # Names of `build_features` parameters the function takes
+    params: tuple[str, ...] = ()
+
+
+def required(names: Iterable[str], features: Mapping[str, Feature]) -> list[str]:
+    """Features in `names` plus every feature they need, in declared order."""
+    pending: list[str] = [name for name in names if name in features]
+    found: set[str] = set()
+    while pending:
+        name: str = pending.pop()
+        if name not in found:
+            found.add(name)
+            pending.extend(features[name].needs)
+    return [name for name in features if name in found]
+
+
+def input_columns(names: Iterable[str], features: Mapping[str, Feature]) -> set[str]:
+    """GSS columns needed to build `names`.
+
+    Names that aren't features are columns to read as is.
+    """
+    names = list(names)
+    columns: set[str] = {name for name in names if name not in features}
+    for name in required(names, features):
+        columns.update(features[name].sources)
+    return columns
+
+
+def build_features(
+    gss: pd.DataFrame,
+    names: Iterable[str],
+    features: Mapping[str, Feature],
+    params: Optional[Mapping[str, Any]] = None,
+    max_workers: Optional[int] = None,
+) -> dict[str, pd.Series]:
+    """Build features and the features they need.
+
+    Parameters
+    ----------
+    gss : pd.DataFrame
+        GSS with every source of the features.
+    names : Iterable[str]
+        Features to build.
+    features : Mapping[str, Feature]
+        Declared features by name.
+    params : Optional[Mapping[str, Any]]
+        Parameters for features that declare them, such as quartile edges.
+    max_workers : Optional[int]
+        Threads to build independent features with. 1 builds them in the
+        calling thread.
+
+    Returns
+    -------
+    dict[str, pd.Series]
+        Features in declared order, including those that were only needed.
+    """
+    params = params or {}
+    order: list[str] = required(names, features)
+    graph: TopologicalSorter = TopologicalSorter(
+        {name: features[name].needs for name in order}
+    )
+    graph.prepare()
+    built: dict[str, pd.Series] = {}
+
+    def build(name: str) -> pd.Series:
+        feature: Feature = features[name]
+        return feature.function(
+            *(gss[source] for source in feature.sources),
+            *(built[need] for need in feature.needs),
+            **{param: params.get(param) for param in feature.params},
+        )
+
+    if max_workers == 1:
+        while graph.is_active():
+            for name in graph.get_ready():
+                built[name] = build(name)
+                graph.done(name)
+    else:
+        with ThreadPoolExecutor(max_workers) as pool:
+            running: dict[Future, str] = {}
+            while graph.is_active():
+                for name in graph.get_ready():
+                    running[pool.submit(build, name)] = name
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    built[name] = future.result()
+                    graph.done(name)
+
+    return {name: built[name] for name in order}
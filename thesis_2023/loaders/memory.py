@@ -0,0 +1,49 @@
+"""Measure the memory the loaders use.
+
+Peak memory decides the machine size a run needs, so the loaders can
+report what each column costs before and after recoding along with the
+peak resident set size of the process.
+"""
+import sys
+from typing import Optional
+
+import pandas as pd
+
+
+def column_memory(gss: pd.DataFrame) -> pd.Series:
+    """Bytes used by each column, including the strings of object columns."""
+    return gss.memory_usage(index=False, deep=True)
+
+
+def memory_report(before: pd.Series, after: pd.Series) -> pd.DataFrame:
+    """Compare the memory of columns at two stages.
+
+    Parameters
+    ----------
+    before : pd.Series
+        `column_memory` of the earlier stage, e.g. the scanned GSS.
+    after : pd.Series
+        `column_memory` of the later stage, e.g. the recoded GSS.
+
+    Returns
+    -------
+    pd.DataFrame
+        MiB per column at each stage with a total row. Columns that only
+        exist at one stage are NaN at the other.
+    """
+    report: pd.DataFrame = pd.DataFrame({"before": before, "after": after}) / 2**20
+    report.loc["total"] = report.sum()
+    return report.round(3)
+
+
+def peak_rss() -> Optional[int]:
+    """Peak resident set size of the process in bytes, if the OS reports it."""
+    try:
+        import resource
+    except ImportError:
+        # Windows
+        return None
+
+    peak: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB but macOS reports bytes.
+    return peak if sys.platform == "darwin" else peak << 10
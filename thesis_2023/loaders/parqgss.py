@@ -1,47 +1,175 @@
 #!/usr/bin/env python
 
-"""Load GSS data set and convert to a better, open file format."""
+"""Load GSS data set and convert to a better, open file format.
 
-import sys
+The source is converted chunk by chunk so a multi-GB release fits in a
+small amount of memory: each chunk becomes a Parquet row group.
+
+The Stata and SPSS releases are supported. The SAS release has the same
+data, but nothing open source writes SAS files to test the reader with, so
+convert one of the others instead.
+
+Run from `thesis_2023` with `python -m loaders.parqgss`.
+"""
+
+import argparse
+from itertools import chain
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from loaders.store import PartitionedWriter, arrow_schema, categories_as_strings
+
+
+def read_chunks(
+    path: Path, columns: Optional[list[str]], chunksize: int
+) -> Iterator[pd.DataFrame]:
+    """Read GSS from whatever crappy format it was distributed in, in chunks.
+
+    Parameters
+    ----------
+    path : Path
+        Stata (.dta) or SPSS (.sav) file.
+    columns : Optional[list[str]]
+        Columns to read; `None` = all columns.
+    chunksize : int
+        Rows per chunk.
+
+    Yields
+    ------
+    pd.DataFrame
+        Next chunk.
+    """
+    match path.suffix:
+        case ".dta":
+            with pd.read_stata(path, columns=columns, chunksize=chunksize) as reader:
+                yield from reader
+        case ".sav":
+            # pandas can't read SPSS in chunks, but pyreadstat (which
+            # read_spss uses anyway) can.
+            import pyreadstat
+
+            chunks = pyreadstat.read_file_in_chunks(
+                pyreadstat.read_sav,
+                path,
+                chunksize=chunksize,
+                usecols=columns,
+                apply_value_formats=True,
+                formats_as_category=True,
+            )
+            for chunk, _ in chunks:
+                yield chunk
+        case _:
+            raise ValueError(f"{path.suffix} isn't supported")
+
+
+def source_schema(chunk: pd.DataFrame) -> pa.Schema:
+    """Schema for every chunk of a source, based on the first chunk.
+
+    Integer columns are widened to int64 because a later chunk with missing
+    values arrives as floats; pyarrow converts those NaNs to nulls.
+    """
+    schema: pa.Schema = arrow_schema(chunk)
+    for i, field in enumerate(schema):
+        if pa.types.is_integer(field.type):
+            schema = schema.set(i, field.with_type(pa.int64()))
+    return schema
+
+
+def convert(
+    path: Path,
+    out_path: Path,
+    columns: Optional[list[str]] = None,
+    row_group_size: int = 100_000,
+    compression: str = "zstd",
+    partition_by: Optional[str] = None,
+) -> int:
+    """Convert a GSS release to Parquet one chunk at a time.
+
+    Parameters
+    ----------
+    path : Path
+        Stata or SPSS file.
+    out_path : Path
+        Parquet file, or data set directory if `partition_by` is set.
+    columns : Optional[list[str]]
+        Columns to convert; `None` = all columns.
+    row_group_size : int
+        Rows per chunk and so per row group.
+    compression : str
+        Parquet compression codec.
+    partition_by : Optional[str]
+        Column to partition the output by, such as `year`.
+
+    Returns
+    -------
+    int
+        Rows converted.
+    """
+    chunks: Iterator[pd.DataFrame] = read_chunks(path, columns, row_group_size)
+    first: Optional[pd.DataFrame] = next(chunks, None)
+    if first is None:
+        raise ValueError(f"{path} is empty")
+
+    schema: pa.Schema = source_schema(categories_as_strings(first))
+    rows: int = 0
+
+    if partition_by:
+        with PartitionedWriter(out_path, partition_by, compression, schema) as writer:
+            for chunk in chain([first], chunks):
+                writer.write(chunk)
+                rows += len(chunk)
+        return rows
+
+    with pq.ParquetWriter(out_path, schema, compression=compression) as writer:
+        for chunk in chain([first], chunks):
+            table: pa.Table = pa.Table.from_pandas(
+                categories_as_strings(chunk), schema=schema, preserve_index=False
+            )
+            writer.write_table(table, row_group_size=len(chunk) or None)
+            rows += len(chunk)
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="parqgss", description="Convert a GSS release to Parquet."
+    )
+    parser.add_argument("path", type=Path, help="Stata or SPSS GSS file")
+    parser.add_argument("columns", nargs="*", help="columns to keep (default: all)")
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        default=Path("gss.parquet"),
+        help="output file or directory if partitioned (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--compression",
+        default="zstd",
+        help="Parquet compression codec (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--row-group-size",
+        type=int,
+        default=100_000,
+        help="rows per chunk and row group (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--partition-by", help="column to partition by into a directory, e.g. year"
+    )
+    args: argparse.Namespace = parser.parse_args()
 
-argc: int = len(sys.argv)
-
-if argc < 2:
-    print(f"USAGE:\n\t{sys.argv[0]} PATH-TO-DUMB-STATA [columns...]")
-    sys.exit(0)
-
-# List of columns to use; `None` = all columns
-# Columns are the third argument forward
-columns: Optional[list[str]] = None
-if argc >= 3:
-    columns = sys.argv[2:]
-
-# Read in GSS from whatever crappy format it was distributed in
-# If it's a CSV, I don't really need to do anything with it
-path: Path = Path(sys.argv[1])
-gss: Optional[pd.DataFrame | pd.StataReader] = None
-
-match path.suffix:
-    case ".dta":
-        gss = pd.read_stata(path, columns=columns)
-    case ".sas7bdat":
-        with pd.read_sas(path, iterator=True) as reader:
-            # TextFileReader is an Iterable, so type checking complaints are spurious
-            # read_sas doesn't have a columns argument
-            gss = pd.concat(map(lambda df: df[columns], reader))
-    case ".sav":
-        gss = pd.read_spss(path, usecols=columns, dtype_backend="pyarrow")
-    case _:
-        print(f"{path.suffix} isn't supported")
-        sys.exit(0)
-
-
-assert isinstance(gss, pd.DataFrame)
-print(f"Loaded data:\n\t{gss.head()}")
-
-print("Writing parquet to 'gss.parquet'")
-gss.write_parquet("gss.parquet")
+    print(f"Converting {args.path} to {args.output}")
+    rows: int = convert(
+        args.path,
+        args.output,
+        args.columns or None,
+        args.row_group_size,
+        args.compression,
+        args.partition_by,
+    )
+    print(f"Wrote {rows} rows")
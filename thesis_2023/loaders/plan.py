@@ -0,0 +1,506 @@
+"""Plan which GSS columns and rows the requested outputs need.
+
+Each output declares its columns and a row filter on the GSS codes. The
+plan reads the union of the columns and rows of every requested output
+from a pyarrow dataset so unused columns are never parsed and rows no
+output keeps are dropped before recoding.
+
+Filters use pyarrow's disjunctive normal form: an output's filter is a list
+of `(column, op, value)` tuples that must all hold, and the plan keeps rows
+that any output keeps.
+"""
+import operator
+import sys
+from collections import Counter
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Optional, TypeAlias
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from loaders import cleaners, codebook, features, students, vectorized
+from loaders.codebook import CODEBOOK
+from loaders.features import input_columns, required
+from loaders.stagecache import StageCache, code_version, fingerprint, stage_key
+from loaders.store import column_order, is_partitioned, open_partitioned, to_pandas
+from loaders.students import (
+    gss_dtypes,
+    recode_students,
+    safiya_columns,
+    student_features,
+    theo_columns,
+)
+from loaders.writers import OutputWriter
+
+Filter: TypeAlias = tuple[str, str, Any]
+
+# Nullable pandas types of Arrow integers
+NULLABLE_TYPES: dict[pa.DataType, pd.api.extensions.ExtensionDtype] = {
+    pa.int8(): pd.Int8Dtype(),
+    pa.int16(): pd.Int16Dtype(),
+    pa.int32(): pd.Int32Dtype(),
+    pa.int64(): pd.Int64Dtype(),
+}
+
+_filter_ops: dict[str, Callable[[pd.Series, Any], pd.Series]] = {
+    "==": operator.eq,
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "in": lambda series, values: series.isin(values),
+    "not in": lambda series, values: ~series.isin(values),
+}
+
+
+@dataclass(frozen=True)
+class OutputSpec:
+    """An output data set."""
+
+    # Where to write the output: a CSV for `.csv` paths or a Parquet data set
+    # partitioned by year otherwise
+    path: str
+    # Output columns in order; None for every column
+    columns: Optional[list[str]] = None
+    # Conjunction of filters on the GSS codes; empty keeps every row
+    filters: list[Filter] = field(default_factory=list)
+
+
+OUTPUTS: dict[str, OutputSpec] = {
+    # Partitioned by year; see `loaders.store`
+    "wrangled": OutputSpec("gss_wrangled"),
+    "safiya": OutputSpec("safiya_clean.csv", safiya_columns, [("year", ">=", 2008)]),
+    "theo": OutputSpec(
+        "theo_clean.csv",
+        theo_columns,
+        [
+            ("year", ">=", 2008),
+            # Codes of "Africa" and "Mexico"
+            ("ethnic", "in", sorted(CODEBOOK["ethnic_theo"].labels)),
+        ],
+    ),
+}
+
+
+@dataclass(frozen=True)
+class ScanPlan:
+    """Columns and rows to read for a set of outputs."""
+
+    # GSS columns to read; None for every column
+    columns: Optional[list[str]]
+    # Filters in disjunctive normal form; None keeps every row
+    filters: Optional[list[list[Filter]]]
+    # Columns `recode_students` needs to produce; None for every column
+    recoded: Optional[set[str]]
+
+    @property
+    def expression(self) -> Optional[pc.Expression]:
+        return pq.filters_to_expression(self.filters) if self.filters else None
+
+
+def plan_scan(outputs: Iterable[OutputSpec]) -> ScanPlan:
+    """Union the columns and row filters of several outputs.
+
+    Parameters
+    ----------
+    outputs : Iterable[OutputSpec]
+        Requested outputs.
+
+    Returns
+    -------
+    ScanPlan
+        Plan that reads everything each output needs.
+    """
+    outputs = list(outputs)
+    if not outputs:
+        raise ValueError("No outputs requested")
+
+    recoded: Optional[set[str]] = set()
+    for output in outputs:
+        if output.columns is None:
+            recoded = None
+            break
+        recoded.update(output.columns)
+
+    columns: Optional[list[str]] = None
+    if recoded is not None:
+        needed: set[str] = input_columns(recoded, student_features)
+        for output in outputs:
+            needed.update(column for column, _, _ in output.filters)
+        columns = sorted(needed)
+
+    filters: Optional[list[list[Filter]]] = _absorb(
+        [output.filters for output in outputs]
+    )
+    if not all(filters):
+        # An output without filters needs every row.
+        filters = None
+
+    return ScanPlan(columns, filters, recoded)
+
+
+def _absorb(filters: list[list[Filter]]) -> list[list[Filter]]:
+    """Drop conjunctions that keep a subset of the rows of another one."""
+    absorbed: list[list[Filter]] = []
+    for i, conjunction in enumerate(filters):
+        implied: bool = any(
+            all(term in conjunction for term in other)
+            and (len(other) < len(conjunction) or j < i)
+            for j, other in enumerate(filters)
+            if j != i
+        )
+        if not implied:
+            absorbed.append(conjunction)
+    return absorbed
+
+
+def filter_mask(gss: pd.DataFrame, filters: list[Filter]) -> np.ndarray:
+    """Evaluate a conjunction of filters on GSS codes.
+
+    Parameters
+    ----------
+    gss : pd.DataFrame
+        GSS before recoding.
+    filters : list[Filter]
+        `(column, op, value)` tuples that must all hold.
+
+    Returns
+    -------
+    np.ndarray
+        Boolean mask of rows to keep. Missing values never match.
+    """
+    mask: np.ndarray = np.ones(len(gss), dtype=bool)
+    for column, op, value in filters:
+        matches: pd.Series = _filter_ops[op](gss[column], value)
+        mask &= matches.to_numpy(dtype=bool, na_value=False)
+    return mask
+
+
+def open_gss(path: str | Path, block_size: Optional[int] = None) -> ds.Dataset:
+    """Open the filtered GSS as a pyarrow dataset.
+
+    Parameters
+    ----------
+    path : str | Path
+        Filtered GSS as a CSV or a data set partitioned by year.
+    block_size : Optional[int]
+        Approximate bytes per batch for CSVs.
+
+    Returns
+    -------
+    ds.Dataset
+        Dataset with the types of `gss_dtypes`.
+    """
+    if is_partitioned(path):
+        return open_partitioned(path)
+
+    read_options: pv.ReadOptions = pv.ReadOptions()
+    if block_size is not None:
+        read_options.block_size = block_size
+    csv_format: ds.CsvFileFormat = ds.CsvFileFormat(
+        read_options=read_options,
+        convert_options=pv.ConvertOptions(
+            column_types={
+                column: csv_type(dtype) for column, dtype in gss_dtypes.items()
+            }
+        ),
+    )
+    return ds.dataset(path, format=csv_format)
+
+
+def arrow_type(dtype: type | str) -> pa.DataType:
+    """Arrow type of the same width as a pandas type, e.g. int8 for `Int8`."""
+    return pa.from_numpy_dtype(pd.api.types.pandas_dtype(dtype).type)
+
+
+def csv_type(dtype: type | str) -> pa.DataType:
+    """Arrow type to parse a CSV column of a pandas type as.
+
+    Nullable integers are parsed as floats because pandas writes them as
+    floats (e.g. 68.0) when a column has NAs; `lean_pandas` narrows them.
+    """
+    if pd.api.types.is_extension_array_dtype(pd.api.types.pandas_dtype(dtype)):
+        return pa.float64()
+    return arrow_type(dtype)
+
+
+def lean_pandas(
+    table: pa.Table | pa.RecordBatch,
+    dtypes: dict[str, type | str] = gss_dtypes,
+) -> pd.DataFrame:
+    """Convert GSS data from Arrow straight to the narrow types of `dtypes`.
+
+    Columns are cast in Arrow, which fails on codes that don't fit instead
+    of wrapping them, and converted to nullable pandas integers directly, so
+    no float64 or Int64 copy of a coded column is ever made.
+
+    Parameters
+    ----------
+    table : pa.Table | pa.RecordBatch
+        Scanned or parsed GSS.
+    dtypes : dict[str, type | str]
+        pandas types of columns; other columns are converted as is.
+
+    Returns
+    -------
+    pd.DataFrame
+        GSS with `dtypes`.
+    """
+    if isinstance(table, pa.RecordBatch):
+        table = pa.Table.from_batches([table])
+
+    # The pandas metadata describes the types before the cast.
+    schema: pa.Schema = table.schema.remove_metadata()
+    for i, arrow_field in enumerate(schema):
+        if (name := arrow_field.name) in dtypes:
+            schema = schema.set(i, arrow_field.with_type(arrow_type(dtypes[name])))
+    gss: pd.DataFrame = to_pandas(table.cast(schema), types_mapper=NULLABLE_TYPES.get)
+
+    # Integers without NAs, such as `year`, come out nullable too.
+    narrowed: dict[str, type | str] = {
+        column: dtype
+        for column, dtype in dtypes.items()
+        if column in gss.columns
+        and gss[column].dtype != pd.api.types.pandas_dtype(dtype)
+    }
+    return gss.astype(narrowed) if narrowed else gss
+
+
+def _scan_columns(dataset: ds.Dataset, plan: ScanPlan) -> list[str]:
+    """Plan columns in the order they were written."""
+    order: list[str] = column_order(dataset) or dataset.schema.names
+    return [name for name in order if plan.columns is None or name in plan.columns]
+
+
+def scan(dataset: ds.Dataset, plan: ScanPlan) -> pd.DataFrame:
+    """Read the columns and rows of a plan."""
+    table: pa.Table = dataset.to_table(
+        columns=_scan_columns(dataset, plan), filter=plan.expression
+    )
+    return lean_pandas(table)
+
+
+def scan_batches(dataset: ds.Dataset, plan: ScanPlan) -> Iterator[pd.DataFrame]:
+    """Read the columns and rows of a plan in batches."""
+    batches: Iterator[pa.RecordBatch] = dataset.to_batches(
+        columns=_scan_columns(dataset, plan), filter=plan.expression
+    )
+    for batch in batches:
+        if batch.num_rows:
+            yield lean_pandas(batch)
+
+
+def coninc_quartile_edges(dataset: ds.Dataset) -> np.ndarray:
+    """Quartile edges of `coninc` over every row of the dataset.
+
+    `coninc_quantiles` are quartiles of the full GSS, so they're computed
+    from an unfiltered scan of `coninc` alone. The scan counts each distinct
+    income batch by batch, so memory is bounded by the batch size and the
+    number of distinct incomes rather than the number of rows; `coninc` is
+    a bracket midpoint in constant dollars, so incomes repeat a lot. The
+    edges are the ones `pd.qcut` computes.
+    """
+    counts: Counter[float] = Counter()
+    for batch in dataset.to_batches(columns=["coninc"]):
+        coninc: pa.Array = batch.column("coninc")
+        # Filtering by a null mask drops the nulls as well as the NaNs.
+        coninc = coninc.filter(pc.invert(pc.is_nan(coninc)))
+        incomes, repeats = pc.value_counts(coninc).flatten()
+        counts.update(dict(zip(incomes.to_pylist(), repeats.to_pylist(), strict=True)))
+
+    if not counts:
+        # Like the quantiles of an empty Series
+        return np.full(5, np.nan)
+
+    values: np.ndarray = np.array(sorted(counts), dtype=np.float64)
+    # Number of incomes up to and including each value
+    cumulative: np.ndarray = np.cumsum([counts[value] for value in values])
+
+    # Linear interpolation between the order statistics around each quartile
+    positions: np.ndarray = (cumulative[-1] - 1) * np.linspace(0, 1, 5)
+    lower: np.ndarray = np.floor(positions)
+    below: np.ndarray = values[np.searchsorted(cumulative, lower, "right")]
+    above: np.ndarray = values[np.searchsorted(cumulative, np.ceil(positions), "right")]
+    fraction: np.ndarray = positions - lower
+    # The same arithmetic as NumPy's, which pandas uses, so the edges and the
+    # interval labels made from them match to the last bit.
+    return np.where(
+        fraction >= 0.5,
+        above - (above - below) * (1 - fraction),
+        below + (above - below) * fraction,
+    )
+
+
+def needs_coninc_edges(plan: ScanPlan, batches: bool = False) -> bool:
+    """Check if a plan needs quartile edges from a separate scan.
+
+    Parameters
+    ----------
+    plan : ScanPlan
+        Plan to check.
+    batches : bool
+        The plan is scanned in batches, which always need the edges of the
+        whole data set.
+    """
+    quartiles: bool = plan.recoded is None or "coninc_quantiles" in plan.recoded
+    return quartiles and (batches or plan.filters is not None)
+
+
+def recode_outputs(
+    gss: pd.DataFrame,
+    outputs: dict[str, OutputSpec],
+    plan: ScanPlan,
+    coninc_edges: Optional[np.ndarray] = None,
+) -> tuple[pd.DataFrame, dict[str, np.ndarray]]:
+    """Recode scanned GSS data and find the rows of each output.
+
+    Parameters
+    ----------
+    gss : pd.DataFrame
+        Data read with `plan`.
+    outputs : dict[str, OutputSpec]
+        Outputs by name.
+    plan : ScanPlan
+        Plan for `outputs`.
+    coninc_edges : Optional[np.ndarray]
+        Quartile edges of `coninc`. Required if `needs_coninc_edges`.
+
+    Returns
+    -------
+    tuple[pd.DataFrame, dict[str, np.ndarray]]
+        Recoded GSS and the mask of rows each output keeps, for
+        `OutputWriter.write`.
+    """
+    # Filters apply to GSS codes, so evaluate them before recoding.
+    masks: dict[str, np.ndarray] = {
+        name: filter_mask(gss, output.filters) for name, output in outputs.items()
+    }
+    return recode_students(gss, coninc_edges, plan.recoded), masks
+
+
+def cached_students(
+    path: str | Path,
+    outputs: dict[str, OutputSpec],
+    cache: StageCache,
+    compression: str = "zstd",
+) -> list[str]:
+    """Write the student data sets, reusing every stage that hasn't changed.
+
+    The stages are keyed by what they depend on:
+
+    * load: the fingerprint of `path` and a column
+    * recode: the fingerprint, a column, and the source of the recoding,
+      feature, and planning modules
+    * write: the output's path, filters, compression, and the keys of its
+      columns
+
+    Columns are loaded and recoded for every row and each output's filters
+    are applied afterwards, so the cached columns don't depend on which
+    outputs are requested. Each column is cached separately, so adding a
+    variable or an output only reads and recodes the new columns. Outputs
+    whose write key matches the file on disk aren't written again.
+
+    Parameters
+    ----------
+    path : str | Path
+        Filtered GSS as a CSV or a data set partitioned by year.
+    outputs : dict[str, OutputSpec]
+        Outputs to write.
+    cache : StageCache
+        Cache of the stages.
+    compression : str
+        Parquet compression codec.
+
+    Returns
+    -------
+    list[str]
+        Names of the outputs that were written; the rest were up to date.
+    """
+    dataset: ds.Dataset = open_gss(path)
+    plan: ScanPlan = plan_scan(outputs.values())
+    source: str = fingerprint(path)
+
+    load_keys: dict[str, str] = {
+        column: stage_key("load", source, column, str(gss_dtypes.get(column)))
+        for column in _scan_columns(dataset, plan)
+    }
+
+    # Quartiles of the full GSS, which don't depend on the filters.
+    coninc_edges: Optional[np.ndarray] = None
+    if plan.recoded is None or "coninc_quantiles" in plan.recoded:
+        coninc_edges = cache.cached_columns(
+            {"edges": stage_key("coninc_edges", source)},
+            lambda _: pd.DataFrame({"edges": coninc_quartile_edges(dataset)}),
+        )["edges"].to_numpy()
+
+    # The recoding code, the feature definitions, and the plan's projection
+    version: str = code_version(
+        cleaners, codebook, features, vectorized, students, sys.modules[__name__]
+    )
+    recode_keys: dict[str, str] = {
+        column: stage_key(
+            "recode",
+            source,
+            column,
+            version,
+            coninc_edges.tolist() if column == "coninc_quantiles" else None,
+        )
+        for column in required(
+            student_features if plan.recoded is None else plan.recoded,
+            student_features,
+        )
+    }
+    # Recoded columns replace the loaded ones; derived columns come last.
+    keys: dict[str, str] = load_keys | recode_keys
+
+    write_keys: dict[str, str] = {
+        name: stage_key(
+            "write",
+            output.path,
+            output.filters,
+            compression,
+            [keys[column] for column in output.columns or keys],
+        )
+        for name, output in outputs.items()
+    }
+    pending: dict[str, OutputSpec] = {
+        name: output
+        for name, output in outputs.items()
+        if not cache.is_written(write_keys[name], output.path)
+    }
+    if not pending:
+        return []
+
+    gss: pd.DataFrame = cache.cached_columns(
+        load_keys,
+        lambda columns: scan(dataset, replace(plan, columns=columns, filters=None)),
+    )
+    recoded: pd.DataFrame = cache.cached_columns(
+        recode_keys,
+        lambda columns: recode_students(gss.copy(), coninc_edges, columns)[columns],
+    )
+    built: pd.DataFrame = pd.DataFrame(
+        {
+            column: (recoded if column in recode_keys else gss)[column]
+            for column in keys
+        }
+    )
+
+    # Filters apply to GSS codes, so they're evaluated on the loaded data.
+    masks: dict[str, np.ndarray] = {
+        name: filter_mask(gss, output.filters) for name, output in pending.items()
+    }
+    with OutputWriter(pending, compression) as writer:
+        writer.write(built, masks)
+    for name, output in pending.items():
+        cache.record_written(write_keys[name], output.path)
+
+    return list(pending)
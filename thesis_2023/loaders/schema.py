@@ -0,0 +1,179 @@
+"""Resolve the columns of a GSS release before reading it.
+
+Variables are renamed or split across GSS releases. For example, extracts
+from before 2021 lack `wtsscomp` but have `wtssall` (1972-2018) and
+`wtssps` (2021 on) instead. The rules for rebuilding such variables are
+declared once in `HARMONIZATIONS`. `resolve` checks a file's header, or
+its Parquet schema, against them, so the columns to read are known before
+the file is parsed and the file is read exactly once.
+
+>>> source = resolve(probe_columns("GSS.csv"), ["year", "wtsscomp"])
+>>> source.check("GSS.csv")
+>>> gss = harmonize(pd.read_csv("GSS.csv", usecols=source.columns), source)
+"""
+import csv
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Mapping, Optional
+
+import pandas as pd
+import pyarrow.dataset as ds
+
+
+@dataclass(frozen=True)
+class Harmonization:
+    """A variable that other releases store under other names."""
+
+    # Name in the filtered GSS
+    column: str
+    # Names to build the column from when it's missing, in order of
+    # priority. Every one that exists is read and coalesced row by row.
+    sources: tuple[str, ...]
+    # Raise if rows are still missing after coalescing
+    complete: bool = False
+
+
+HARMONIZATIONS: dict[str, Harmonization] = {
+    # https://gssdataexplorer.norc.org/gssweighting
+    # wtsscomp combines wtssall (1972-2018) with wtssps (2021 on). wtssnrps
+    # is the 2021 weight with a nonresponse adjustment, so it's the last
+    # resort for extracts that only have that.
+    "wtsscomp": Harmonization(
+        "wtsscomp", ("wtssall", "wtssps", "wtssnrps"), complete=True
+    ),
+}
+
+
+@dataclass(frozen=True)
+class SourceSchema:
+    """Columns to read from a source and how to rebuild the missing ones."""
+
+    # Columns to read in file order
+    columns: list[str]
+    # Rules for wanted columns that are built from other columns
+    harmonizations: list[Harmonization]
+    # Wanted columns that neither exist nor can be built
+    missing: list[str]
+    # Columns only read to build others, which `harmonize` drops
+    sources: list[str]
+
+    def describe(self, path: str | Path) -> list[str]:
+        """Messages about the columns of `path` that are rebuilt."""
+        return [
+            f"{path} is missing `{rule.column}` - creating it from "
+            + ", ".join(f"`{source}`" for source in rule.sources if source in self)
+            for rule in self.harmonizations
+        ]
+
+    def check(self, path: str | Path) -> None:
+        """Raise if `path` lacks wanted columns that can't be rebuilt.
+
+        Raises
+        ------
+        ValueError
+            Some wanted columns are `missing`.
+        """
+        if self.missing:
+            missing: str = ", ".join(f"`{column}`" for column in self.missing)
+            raise ValueError(f"{path} is missing {missing}")
+
+    def __contains__(self, column: str) -> bool:
+        return column in self.columns
+
+
+def read_header(path: str | Path) -> list[str]:
+    """Read a CSV's column names without parsing the rest of the file."""
+    with open(path, newline="") as csv_file:
+        return next(csv.reader(csv_file))
+
+
+def probe_columns(path: str | Path) -> list[str]:
+    """Column names of a CSV or Parquet source from its header or schema."""
+    if Path(path).suffix == ".csv":
+        return read_header(path)
+    # Only the Parquet footers are read.
+    return ds.dataset(str(path), format="parquet").schema.names
+
+
+def resolve(
+    header: Iterable[str],
+    wanted: Iterable[str],
+    harmonizations: Mapping[str, Harmonization] = HARMONIZATIONS,
+) -> SourceSchema:
+    """Decide which columns of a source to read.
+
+    Parameters
+    ----------
+    header : Iterable[str]
+        Columns of the source, such as from `probe_columns`.
+    wanted : Iterable[str]
+        Columns needed after harmonizing.
+    harmonizations : Mapping[str, Harmonization]
+        Rules for rebuilding columns that a source lacks.
+
+    Returns
+    -------
+    SourceSchema
+        Columns to read and the rules to apply with `harmonize`.
+    """
+    header = list(header)
+    wanted = list(dict.fromkeys(wanted))
+    present: set[str] = set(header)
+    read: set[str] = set()
+    rules: list[Harmonization] = []
+    missing: list[str] = []
+
+    for column in wanted:
+        rule: Optional[Harmonization] = harmonizations.get(column)
+        if column in present:
+            read.add(column)
+        elif rule and (sources := present.intersection(rule.sources)):
+            read.update(sources)
+            rules.append(rule)
+        else:
+            missing.append(column)
+
+    return SourceSchema(
+        [column for column in header if column in read],
+        rules,
+        missing,
+        [column for column in header if column in read.difference(wanted)],
+    )
+
+
+def harmonize(gss: pd.DataFrame, source: SourceSchema) -> pd.DataFrame:
+    """Build the harmonized columns of a source and drop what they came from.
+
+    Parameters
+    ----------
+    gss : pd.DataFrame
+        Data read with `source.columns`.
+    source : SourceSchema
+        Schema from `resolve`.
+
+    Returns
+    -------
+    pd.DataFrame
+        Data with the harmonized columns.
+
+    Raises
+    ------
+    ValueError
+        A column declared complete still has missing rows.
+    """
+    built: dict[str, pd.Series] = {}
+    for rule in source.harmonizations:
+        sources: list[str] = [name for name in rule.sources if name in gss.columns]
+        column: pd.Series = gss[sources[0]]
+        for name in sources[1:]:
+            column = column.fillna(gss[name])
+
+        if rule.complete and (missing := column.isna().sum()):
+            raise ValueError(
+                f"{missing} rows have none of {', '.join(sources)} for {rule.column}"
+            )
+        built[rule.column] = column.rename(rule.column)
+
+    if not built:
+        return gss
+    return gss.drop(columns=source.sources).assign(**built)
@@ -0,0 +1,233 @@
+"""Content addressed cache for the stages of the GSS pipeline.
+
+Each stage result is stored under a key hashed from everything the result
+depends on: fingerprints of the source files, the columns and filters, and
+the version of the recoding code. A rerun with the same inputs reads the
+stored result instead of recomputing it, and any changed input produces a
+new key, so stale results are never read; they're evicted, least recently
+used first, once the cache outgrows its size limit.
+
+Artifacts are single column Parquet files so a changed variable list only
+recomputes the columns that are new.
+"""
+import hashlib
+import inspect
+import json
+import os
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Callable, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from loaders.store import arrow_schema, categories_as_strings
+
+# 2 GiB
+DEFAULT_MAX_BYTES: int = 2 << 30
+
+
+def stage_key(stage: str, *inputs: Any) -> str:
+    """Hash a stage name and its inputs into a cache key.
+
+    Parameters
+    ----------
+    stage : str
+        Stage name, so different stages with the same inputs don't collide.
+    *inputs : Any
+        JSON serializable inputs; anything else is hashed by its `str`.
+
+    Returns
+    -------
+    str
+        Hex digest.
+    """
+    payload: str = json.dumps([stage, inputs], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def fingerprint(path: str | Path) -> str:
+    """Fingerprint a file or a directory of files by path, size, and mtime.
+
+    Hashing the contents of a multi-GB GSS file would cost as much as
+    reading it, so changes are detected the way `make` detects them.
+    """
+    path = Path(path)
+    files: list[Path] = (
+        sorted(file for file in path.rglob("*") if file.is_file())
+        if path.is_dir()
+        else [path]
+    )
+    stats: list[tuple[str, int, int]] = []
+    for file in files:
+        stat: os.stat_result = file.stat()
+        stats.append((str(file.resolve()), stat.st_size, stat.st_mtime_ns))
+    return stage_key("fingerprint", stats)
+
+
+def code_version(*modules: ModuleType) -> str:
+    """Hash the source of modules so results are recomputed when code changes."""
+    return stage_key("code", [inspect.getsource(module) for module in modules])
+
+
+class StageCache:
+    """Local artifact cache of DataFrame columns with size based eviction."""
+
+    def __init__(
+        self, root: str | Path = ".gss_cache", max_bytes: int = DEFAULT_MAX_BYTES
+    ):
+        """
+        Parameters
+        ----------
+        root : str | Path
+            Cache directory.
+        max_bytes : int
+            Size limit of the stored artifacts.
+        """
+        self.root: Path = Path(root)
+        self.max_bytes: int = max_bytes
+        self.hits: int = 0
+        self.misses: int = 0
+        # Bytes of stored artifacts, counted on the first `put`
+        self._size: Optional[int] = None
+        self._outputs_path: Path = self.root / "outputs.json"
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.parquet"
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        """Read an artifact or return None if it isn't cached."""
+        path: Path = self._path(key)
+        try:
+            frame: pd.DataFrame = pq.read_table(path, memory_map=True).to_pandas()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+
+        # Eviction is least recently used by mtime.
+        os.utime(path)
+        self.hits += 1
+        return frame
+
+    def put(self, key: str, frame: pd.DataFrame) -> None:
+        """Store an artifact and evict old ones if the cache is too big.
+
+        The size of the cache is tracked as artifacts are stored, so the
+        directory is only listed again once it passes `max_bytes`.
+        """
+        path: Path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+
+        frame = categories_as_strings(frame.reset_index(drop=True))
+        table: pa.Table = pa.Table.from_pandas(
+            frame, schema=arrow_schema(frame), preserve_index=False
+        )
+        tmp_path: Path = path.with_suffix(".tmp")
+        pq.write_table(table, tmp_path, compression="zstd")
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._artifacts())
+        # Replacing an artifact overcounts until the next eviction.
+        self._size += tmp_path.stat().st_size
+        os.replace(tmp_path, path)
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def cached_columns(
+        self,
+        keys: dict[str, str],
+        compute: Callable[[list[str]], pd.DataFrame],
+    ) -> pd.DataFrame:
+        """Read columns from the cache and compute the missing ones together.
+
+        Parameters
+        ----------
+        keys : dict[str, str]
+            Cache key of each column.
+        compute : Callable[[list[str]], pd.DataFrame]
+            Computes a DataFrame holding the requested missing columns.
+
+        Returns
+        -------
+        pd.DataFrame
+            Columns in the order of `keys`.
+        """
+        columns: dict[str, pd.Series] = {}
+        missing: list[str] = []
+        for column, key in keys.items():
+            frame: Optional[pd.DataFrame] = self.get(key)
+            if frame is None:
+                missing.append(column)
+            else:
+                columns[column] = frame[column]
+
+        if missing:
+            computed: pd.DataFrame = compute(missing).reset_index(drop=True)
+            for column in missing:
+                self.put(keys[column], computed[[column]])
+                columns[column] = computed[column]
+
+        return pd.DataFrame({column: columns[column] for column in keys})
+
+    def _read_outputs(self) -> dict[str, dict[str, str]]:
+        try:
+            with open(self._outputs_path) as outputs:
+                return json.load(outputs)
+        except FileNotFoundError:
+            return {}
+
+    def is_written(self, key: str, path: str | Path) -> bool:
+        """Check if `path` still holds the output written for `key`."""
+        written: Optional[dict[str, str]] = self._read_outputs().get(
+            str(Path(path).resolve())
+        )
+        return (
+            written is not None
+            and written["key"] == key
+            and Path(path).exists()
+            and written["fingerprint"] == fingerprint(path)
+        )
+
+    def record_written(self, key: str, path: str | Path) -> None:
+        """Remember that `path` was written for `key`."""
+        outputs: dict[str, dict[str, str]] = self._read_outputs()
+        outputs[str(Path(path).resolve())] = {
+            "key": key,
+            "fingerprint": fingerprint(path),
+        }
+        tmp_path: Path = self._outputs_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as tmp:
+            json.dump(outputs, tmp)
+        os.replace(tmp_path, self._outputs_path)
+
+    def evict(self) -> int:
+        """Remove the least recently used artifacts until under `max_bytes`.
+
+        Returns
+        -------
+        int
+            Bytes removed.
+        """
+        artifacts: list[tuple[float, int, Path]] = self._artifacts()
+        size: int = sum(size for _, size, _ in artifacts)
+        removed: int = 0
+        for _, artifact_size, path in sorted(artifacts):
+            if size - removed <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            removed += artifact_size
+        self._size = size - removed
+        return removed
+
+    def _artifacts(self) -> list[tuple[float, int, Path]]:
+        """Modification time, size, and path of every stored artifact."""
+        artifacts: list[tuple[float, int, Path]] = []
+        for path in self.root.glob("*/*.parquet"):
+            stat: os.stat_result = path.stat()
+            artifacts.append((stat.st_mtime, stat.st_size, path))
+        return artifacts
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,283 @@
+"""Parquet data sets partitioned by year for the loaders' intermediates.
+
+CSV intermediates write every category as text and parse everything again
+in the next stage. The data sets here keep pandas' types instead:
+categoricals are dictionary encoded, nullable integers stay nullable, and
+each year is a hive partition (`year=2008/part-0.parquet`) so readers only
+touch the years and columns they ask for.
+
+>>> from loaders.store import read_partitioned
+>>> recent = [("year", ">=", 2008)]
+>>> gss = read_partitioned("gss_wrangled", ["year", "degree", "wtsscomp"], recent)
+"""
+import json
+import shutil
+from pathlib import Path
+from typing import Any, Callable, Optional, TextIO
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+
+PARTITION: str = "year"
+
+
+def is_partitioned(path: str | Path) -> bool:
+    """Check if a path is a partitioned Parquet data set rather than a CSV."""
+    return Path(path).is_dir()
+
+
+def categories_as_strings(gss: pd.DataFrame) -> pd.DataFrame:
+    """Convert categories that Parquet can't store, such as intervals, to text.
+
+    The text is what `to_csv` would write so the data matches the CSVs.
+    """
+    converted: dict[str, pd.Series] = {}
+    for column, dtype in gss.dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype) and dtype.categories.dtype != object:
+            converted[column] = gss[column].cat.rename_categories(str)
+    return gss.assign(**converted) if converted else gss
+
+
+def arrow_schema(gss: pd.DataFrame) -> pa.Schema:
+    """Arrow schema for a recoded GSS DataFrame.
+
+    Categoricals always get int32 indices and string values so batches with
+    different (or no) observed categories share one schema. Columns that are
+    entirely missing, which pyarrow types as null, are assumed to be text.
+    """
+    schema: pa.Schema = pa.Schema.from_pandas(gss, preserve_index=False)
+    for i, (column, dtype) in enumerate(gss.dtypes.items()):
+        if isinstance(dtype, pd.CategoricalDtype):
+            dict_type = pa.dictionary(pa.int32(), pa.string(), dtype.ordered)
+            schema = schema.set(i, pa.field(column, dict_type))
+        elif pa.types.is_null(schema.field(i).type):
+            schema = schema.set(i, pa.field(column, pa.string()))
+    return schema
+
+
+class PartitionedWriter:
+    """Write DataFrames to a Parquet data set with one file per year.
+
+    Writers for each year stay open so a stream of batches produces one
+    file per partition instead of one per batch.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        partition: str = PARTITION,
+        compression: str = "zstd",
+        schema: Optional[pa.Schema] = None,
+    ):
+        """Replace the data set at `path`.
+
+        Parameters
+        ----------
+        path : str | Path
+            Data set directory. An existing data set is removed.
+        partition : str
+            Column to partition by.
+        compression : str
+            Parquet compression codec.
+        schema : Optional[pa.Schema]
+            Schema every DataFrame is converted to. Defaults to the
+            `arrow_schema` of the first DataFrame.
+        """
+        self.path: Path = Path(path)
+        self.partition: str = partition
+        self.compression: str = compression
+        self.schema: Optional[pa.Schema] = schema
+        self._writers: dict[Any, pq.ParquetWriter] = {}
+
+        if self.path.is_dir():
+            shutil.rmtree(self.path)
+        self.path.mkdir(parents=True)
+
+    def write(self, gss: pd.DataFrame) -> None:
+        """Append a DataFrame to its partitions as one row group each."""
+        gss = categories_as_strings(gss)
+        if self.schema is None:
+            self.schema = arrow_schema(gss)
+        table: pa.Table = pa.Table.from_pandas(
+            gss, schema=self.schema, preserve_index=False
+        )
+        self.write_table(table)
+
+    def write_table(self, table: pa.Table) -> None:
+        """Append a table to its partitions as one row group each."""
+        if self.schema is None:
+            self.schema = table.schema
+        if not table.num_rows:
+            return
+
+        # Partition values live in the directory names.
+        file_schema: pa.Schema = self.schema.remove(
+            self.schema.get_field_index(self.partition)
+        )
+
+        # Stable sort so rows keep their order within each partition
+        values: np.ndarray = table[self.partition].to_numpy()
+        order: np.ndarray = np.argsort(values, kind="stable")
+        keys, starts = np.unique(values[order], return_index=True)
+        for key, rows in zip(keys, np.split(order, starts[1:]), strict=True):
+            part: pa.Table = table.take(rows).drop_columns([self.partition])
+            if key not in self._writers:
+                directory: Path = self.path / f"{self.partition}={key}"
+                directory.mkdir()
+                self._writers[key] = pq.ParquetWriter(
+                    directory / "part-0.parquet",
+                    file_schema,
+                    compression=self.compression,
+                )
+            self._writers[key].write_table(part)
+
+    def close(self) -> None:
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+    def __enter__(self) -> "PartitionedWriter":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+
+class CsvWriter:
+    """Write DataFrames to one CSV with the interface of `PartitionedWriter`."""
+
+    def __init__(self, path: str | Path):
+        self.path: Path = Path(path)
+        # The writer owns the file until `close` (or `__exit__`) because
+        # batches are appended over many calls.
+        self._file: TextIO = open(self.path, "w", newline="")  # noqa: SIM115
+        self._header: bool = True
+
+    def write(self, gss: pd.DataFrame) -> None:
+        """Append a DataFrame, with a header if it's the first."""
+        gss.to_csv(self._file, header=self._header, index=False)
+        self._header = False
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "CsvWriter":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+
+def open_writer(path: str | Path) -> CsvWriter | PartitionedWriter:
+    """Open a CSV writer for `.csv` paths and a partitioned writer otherwise."""
+    if Path(path).suffix == ".csv":
+        return CsvWriter(path)
+    return PartitionedWriter(path)
+
+
+def write_partitioned(
+    gss: pd.DataFrame, path: str | Path, partition: str = PARTITION
+) -> None:
+    """Write a DataFrame as a Parquet data set partitioned by `partition`."""
+    with PartitionedWriter(path, partition) as writer:
+        writer.write(gss)
+
+
+def open_partitioned(path: str | Path, partition: str = PARTITION) -> ds.Dataset:
+    """Open a partitioned data set with memory mapped files.
+
+    Parameters
+    ----------
+    path : str | Path
+        Data set directory.
+    partition : str
+        Partition column, which is read as an int64.
+
+    Returns
+    -------
+    ds.Dataset
+        Data set for scans with column selection and partition pruning.
+    """
+    return ds.dataset(
+        str(path),
+        format="parquet",
+        filesystem=pafs.LocalFileSystem(use_mmap=True),
+        partitioning=ds.partitioning(
+            pa.schema([(partition, pa.int64())]), flavor="hive"
+        ),
+    )
+
+
+def column_order(dataset: ds.Dataset) -> Optional[list[str]]:
+    """Original column order from the pandas metadata of a data set."""
+    metadata: Optional[dict[bytes, bytes]] = dataset.schema.metadata
+    if not metadata or b"pandas" not in metadata:
+        return None
+    return [column["name"] for column in json.loads(metadata[b"pandas"])["columns"]]
+
+
+def written_type(dataset: ds.Dataset, column: str, default: str = "int64") -> str:
+    """NumPy type a column had when it was written, from the pandas metadata."""
+    metadata: Optional[dict[bytes, bytes]] = dataset.schema.metadata
+    if not metadata or b"pandas" not in metadata:
+        return default
+    for entry in json.loads(metadata[b"pandas"])["columns"]:
+        if entry["name"] == column:
+            return entry["numpy_type"]
+    return default
+
+
+def to_pandas(
+    table: pa.Table,
+    order: Optional[list[str]] = None,
+    types_mapper: Optional[Callable[[pa.DataType], Any]] = None,
+) -> pd.DataFrame:
+    """Convert a scanned table to pandas in the data set's column order.
+
+    The partition column comes last in scans, so it's moved back to where
+    it was written. `types_mapper` is passed on to `pa.Table.to_pandas`.
+    """
+    gss: pd.DataFrame = table.to_pandas(types_mapper=types_mapper)
+    if order:
+        gss = gss[[column for column in order if column in gss.columns]]
+    return gss
+
+
+def read_partitioned(
+    path: str | Path,
+    columns: Optional[list[str]] = None,
+    filters: Optional[list[tuple] | list[list[tuple]]] = None,
+) -> pd.DataFrame:
+    """Read columns and rows of a partitioned data set.
+
+    Parameters
+    ----------
+    path : str | Path
+        Data set directory.
+    columns : Optional[list[str]]
+        Columns to read; every column if not provided.
+    filters : Optional[list[tuple] | list[list[tuple]]]
+        Row filters in pyarrow's `(column, op, value)` form. Filters on
+        `year` skip whole partitions.
+
+    Returns
+    -------
+    pd.DataFrame
+        Data with categoricals, nullable integers, and the integer type of
+        `year` restored.
+    """
+    dataset: ds.Dataset = open_partitioned(path)
+    table: pa.Table = dataset.to_table(
+        columns=columns,
+        filter=pq.filters_to_expression(filters) if filters else None,
+    )
+    gss: pd.DataFrame = to_pandas(table, columns or column_order(dataset))
+    if PARTITION in gss.columns:
+        # Partition values are parsed from the directory names, which other
+        # readers like `pd.read_parquet` turn into categories.
+        gss[PARTITION] = gss[PARTITION].astype(written_type(dataset, PARTITION))
+    return gss
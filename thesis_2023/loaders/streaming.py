@@ -0,0 +1,183 @@
+"""Stream the GSS through the loaders in record batches.
+
+The cumulative GSS is several GB, so reading it into one DataFrame sets the
+peak memory of the loaders. The functions here read the GSS in blocks of
+`block_size` bytes with pyarrow, recode each block, and append it to the
+outputs so memory is bounded by the block size instead of the file size.
+"""
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pv
+import pyarrow.dataset as ds
+
+from loaders.plan import (
+    OUTPUTS,
+    OutputSpec,
+    ScanPlan,
+    coninc_quartile_edges,
+    csv_type,
+    lean_pandas,
+    needs_coninc_edges,
+    open_gss,
+    plan_scan,
+    recode_outputs,
+    scan_batches,
+)
+from loaders.schema import SourceSchema, harmonize, probe_columns, resolve
+from loaders.store import open_writer
+from loaders.students import raw_dtypes, raw_vars
+from loaders.writers import OutputWriter
+
+# 64 MiB
+DEFAULT_BLOCK_SIZE: int = 64 << 20
+
+
+def read_batches(
+    path: str | Path,
+    columns: Optional[list[str]] = None,
+    dtypes: Optional[dict[str, type | str]] = None,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+) -> Iterator[pd.DataFrame]:
+    """Read a CSV as a stream of DataFrames.
+
+    Parameters
+    ----------
+    path : str | Path
+        CSV to read.
+    columns : Optional[list[str]]
+        Columns to read in file order; all columns if not provided.
+    dtypes : Optional[dict[str, type | str]]
+        pandas types of columns. Declaring types keeps every batch
+        consistent because pyarrow otherwise infers types from the first
+        block only.
+    block_size : int
+        Approximate bytes per batch.
+
+    Yields
+    ------
+    pd.DataFrame
+        Next batch.
+    """
+    reader: pv.CSVStreamingReader = pv.open_csv(
+        path,
+        read_options=pv.ReadOptions(block_size=block_size),
+        convert_options=_convert_options(columns, dtypes),
+    )
+    with reader:
+        for batch in reader:
+            yield lean_pandas(batch, dtypes or {})
+
+
+def read_gss_csv(
+    path: str | Path,
+    columns: Optional[list[str]] = None,
+    dtypes: Optional[dict[str, type | str]] = None,
+) -> pd.DataFrame:
+    """Read a whole CSV with pyarrow's multithreaded reader.
+
+    Parameters and types are as in `read_batches`.
+    """
+    table: pa.Table = pv.read_csv(
+        path, convert_options=_convert_options(columns, dtypes)
+    )
+    return lean_pandas(table, dtypes or {})
+
+
+def _convert_options(
+    columns: Optional[list[str]], dtypes: Optional[dict[str, type | str]]
+) -> pv.ConvertOptions:
+    return pv.ConvertOptions(
+        include_columns=columns,
+        column_types={
+            column: csv_type(dtype) for column, dtype in (dtypes or {}).items()
+        },
+    )
+
+
+def stream_raw(
+    path: str | Path,
+    out_path: str | Path = "gss_filtered",
+    block_size: int = DEFAULT_BLOCK_SIZE,
+) -> int:
+    """Stream the raw GSS into the filtered GSS.
+
+    Parameters
+    ----------
+    path : str | Path
+        Raw GSS CSV.
+    out_path : str | Path
+        Filtered GSS to write as a CSV for `.csv` paths or a data set
+        partitioned by year otherwise.
+    block_size : int
+        Approximate bytes per batch.
+
+    Returns
+    -------
+    int
+        Rows written.
+
+    Raises
+    ------
+    ValueError
+        The raw GSS lacks columns that the students' data sets need.
+    """
+    source: SourceSchema = resolve(probe_columns(path), raw_vars)
+    source.check(path)
+    for message in source.describe(path):
+        print(message)
+
+    dtypes: dict[str, type | str] = raw_dtypes(source.columns)
+    rows: int = 0
+    with open_writer(out_path) as writer:
+        for batch in read_batches(path, source.columns, dtypes, block_size):
+            writer.write(harmonize(batch, source))
+            rows += len(batch)
+
+    return rows
+
+
+def stream_students(
+    path: str | Path,
+    outputs: dict[str, OutputSpec] = OUTPUTS,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    compression: str = "zstd",
+) -> int:
+    """Stream the filtered GSS into the student data sets.
+
+    Makes two passes over `path`: one for the `coninc` quartiles, which
+    need the full column, and one to recode and write the batches. The
+    second pass only reads the columns and rows that `outputs` need.
+
+    Parameters
+    ----------
+    path : str | Path
+        Filtered GSS CSV.
+    outputs : dict[str, OutputSpec]
+        Outputs to write.
+    block_size : int
+        Approximate bytes per batch.
+    compression : str
+        Parquet compression codec.
+
+    Returns
+    -------
+    int
+        Rows recoded.
+    """
+    dataset: ds.Dataset = open_gss(path, block_size)
+    plan: ScanPlan = plan_scan(outputs.values())
+    coninc_edges: Optional[np.ndarray] = None
+    if needs_coninc_edges(plan, batches=True):
+        coninc_edges = coninc_quartile_edges(dataset)
+
+    rows: int = 0
+    with OutputWriter(outputs, compression) as writer:
+        for batch in scan_batches(dataset, plan):
+            writer.write(*recode_outputs(batch, outputs, plan, coninc_edges))
+            rows += len(batch)
+
+    return rows
@@ -0,0 +1,164 @@
+"""Variables and recodes for the students' data sets."""
+from itertools import chain
+from typing import Collection, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from loaders.cleaners import coninc_quartiles
+from loaders.codebook import CODEBOOK, SMALL_FEATURES, Recode
+from loaders.features import Feature, build_features, input_columns
+from loaders.vectorized import (
+    create_president_array,
+    recode_age_array,
+    recode_income_oth_cats_array,
+    recode_letin_binary_array,
+)
+
+# Features for both data sets
+# https://gssdataexplorer.norc.org/gssweighting
+weights: list[str] = ["vstrat", "vpsu", "wtsscomp"]
+safiya_vars: list[str] = [
+    "year",
+    "age",
+    "degree",
+    "sex",
+    "race",
+    "partyid",
+    "othlang",
+    "letin1a",
+    "coninc",
+] + weights
+safiya_vars_add: list[str] = [
+    "age_cat",
+    "coninc_cat",
+    "coninc_log",
+    "decrease_imm",
+    "hs_or_college",
+    "president",
+]
+theo_vars: list[str] = [
+    "year",
+    "age",
+    "degree",
+    "sex",
+    "race",
+    "region",
+    "ethnic",
+    "coninc",
+    "talkspvs",
+] + weights
+theo_vars_add: list[str] = [
+    "age_cat",
+    "coninc_log",
+    "coninc_quantiles",
+    "degree_all",
+    "hs_or_college",
+]
+
+# Types of the filtered GSS columns. Codes are the narrowest nullable integers
+# that hold them; `loaders.plan.lean_pandas` reads them without widening.
+gss_dtypes: dict[str, type | str] = {
+    "year": "int16",
+    "age": "Int8",
+    "ethnic": "Int16",
+    "partyid": "Int8",
+    "degree": "Int8",
+    "sex": "Int8",
+    "othlang": "Int8",
+    "race": "Int8",
+    "region": "Int8",
+    "talkspvs": "Int8",
+    "letin1a": "Int8",
+    "coninc": float,
+    "vstrat": "Int16",
+    "vpsu": "Int8",
+    "wtsscomp": float,
+}
+
+
+def _codebook_feature(name: str) -> Feature:
+    recode: Recode = CODEBOOK[name]
+    return Feature(recode.recode, sources=(recode.source,))
+
+
+# Columns that `recode_students` changes or adds, in the order it adds them.
+# Sources are always GSS codes, so recodes that replace their source (e.g.
+# `degree`) don't change what other features (e.g. `hs_or_college`) read.
+student_features: dict[str, Feature] = {
+    **{
+        CODEBOOK[name].target: _codebook_feature(name)
+        for name in ["ethnic", "partyid", "hs_or_college", "degree_all", "degree"]
+    },
+    "president": Feature(create_president_array, ("year",)),
+    **{CODEBOOK[name].target: _codebook_feature(name) for name in SMALL_FEATURES},
+    "coninc_log": Feature(np.log, ("coninc",)),
+    "coninc_quantiles": Feature(coninc_quartiles, ("coninc",), params=("edges",)),
+    "decrease_imm": Feature(recode_letin_binary_array, ("letin1a",)),
+    "age_cat": Feature(recode_age_array, ("age",)),
+    "coninc_cat": Feature(recode_income_oth_cats_array, ("coninc",)),
+}
+
+# Columns to read from the raw GSS; see `loaders.schema` for missing weights
+raw_vars: list[str] = list(dict.fromkeys(safiya_vars + theo_vars))
+
+# Sort features but place weights at the end
+safiya_columns: list[str] = list(
+    chain(
+        (var for var in sorted(safiya_vars + safiya_vars_add) if var not in weights),
+        weights,
+    )
+)
+theo_columns: list[str] = list(
+    chain(
+        (var for var in sorted(theo_vars + theo_vars_add) if var not in weights),
+        weights,
+    )
+)
+
+
+def raw_dtypes(columns: Iterable[str]) -> dict[str, type | str]:
+    """Types to read raw GSS columns as, e.g. the old weights, as floats."""
+    return {column: gss_dtypes.get(column, float) for column in columns}
+
+
+def recode_students(
+    gss: pd.DataFrame,
+    coninc_edges: Optional[np.ndarray] = None,
+    columns: Optional[Collection[str]] = None,
+    max_workers: Optional[int] = None,
+) -> pd.DataFrame:
+    """Recode the filtered GSS for the students' data sets.
+
+    Parameters
+    ----------
+    gss : pd.DataFrame
+        Filtered GSS with `gss_dtypes`.
+    coninc_edges : Optional[np.ndarray]
+        Quartile edges of `coninc` for `coninc_quantiles`. Calculated from
+        `gss` if not provided.
+    columns : Optional[Collection[str]]
+        Columns that are needed. Only the features in `student_features`
+        among them are built, and their sources must be in `gss`. Every
+        feature whose sources are in `gss` is built if not provided.
+    max_workers : Optional[int]
+        Threads to build features with; see `build_features`.
+
+    Returns
+    -------
+    pd.DataFrame
+        Recoded GSS.
+    """
+    if columns is None:
+        present: set[str] = set(gss.columns)
+        columns = [
+            name
+            for name in student_features
+            if input_columns([name], student_features) <= present
+        ]
+
+    built: dict[str, pd.Series] = build_features(
+        gss, columns, student_features, {"edges": coninc_edges}, max_workers
+    )
+    return gss.assign(**built)
+
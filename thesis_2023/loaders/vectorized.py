@@ -0,0 +1,158 @@
+"""Array level versions of the recoders in `loaders.cleaners`.
+
+The scalar recoders are applied with `Series.map`, which runs a `match` per
+row. The recoders here produce the same categorical Series as
+`series.map(recoder).astype("category")` with a handful of NumPy operations
+over the whole column. Integer coded recoders use the lookup arrays of
+`loaders.codebook`; the scalar functions remain the reference
+implementation.
+"""
+import numpy as np
+import pandas as pd
+
+from loaders.cleaners import recode_letin_binary
+from loaders.codebook import CODEBOOK, as_codes, as_float, categorical_from_codes
+
+
+def _to_categorical(
+    series: pd.Series, codes: np.ndarray, labels: np.ndarray
+) -> pd.Series:
+    """Build a categorical Series like `Series.astype("category")` would.
+
+    Parameters
+    ----------
+    series : pd.Series
+        Source Series whose index and name are kept.
+    codes : np.ndarray
+        Positions in `labels` or -1 for NA.
+    labels : np.ndarray
+        Labels sorted in ascending order.
+
+    Returns
+    -------
+    pd.Series
+        Categorical Series.
+    """
+    return categorical_from_codes(series, codes, pd.CategoricalDtype(labels))
+
+
+def recode_ethnic_array(ethnic: pd.Series) -> pd.Series:
+    """Vectorized `recode_ethnic`."""
+    return CODEBOOK["ethnic"].recode(ethnic)
+
+
+def recode_partyid_array(party: pd.Series) -> pd.Series:
+    """Vectorized `recode_partyid`."""
+    return CODEBOOK["partyid"].recode(party)
+
+
+def recode_degree_array(degree: pd.Series) -> pd.Series:
+    """Vectorized `recode_degree`."""
+    return CODEBOOK["degree"].recode(degree)
+
+
+def recode_degree_all_array(degree: pd.Series) -> pd.Series:
+    """Vectorized `recode_degree_all`."""
+    return CODEBOOK["degree_all"].recode(degree)
+
+
+def recode_degree_binary_array(degree: pd.Series) -> pd.Series:
+    """Vectorized `recode_degree_binary`."""
+    return CODEBOOK["hs_or_college"].recode(degree)
+
+
+def recode_letin_binary_array(letin: pd.Series) -> pd.Series:
+    """Vectorized `recode_letin_binary`.
+
+    Accepts `letin1a` as codes or as the labels from `recode_small_features`.
+    """
+    if pd.api.types.is_numeric_dtype(letin):
+        return CODEBOOK["decrease_imm"].recode(letin)
+
+    # Labels are few, so recode the unique values and broadcast the result.
+    uniques: np.ndarray
+    positions: np.ndarray
+    positions, uniques = pd.factorize(letin, use_na_sentinel=True)
+    recoded: list = [recode_letin_binary(value) for value in uniques]
+    labels: np.ndarray = np.array(
+        sorted({label for label in recoded if not pd.isna(label)}), dtype=object
+    )
+    label_pos: dict[str, int] = {label: i for i, label in enumerate(labels)}
+    unique_codes: np.ndarray = np.array(
+        [-1 if pd.isna(label) else label_pos[label] for label in recoded] + [-1],
+        dtype=np.int16,
+    )
+    # factorize marks NA as -1, which indexes the trailing -1 above.
+    return _to_categorical(letin, unique_codes[positions], labels)
+
+
+def _from_conditions(
+    series: pd.Series, conditions: list[np.ndarray], choices: list[str]
+) -> pd.Series:
+    """Recode with `np.select` and build a categorical Series.
+
+    The first matching condition wins and unmatched rows are NA.
+    """
+    labels: np.ndarray = np.array(sorted(set(choices)), dtype=object)
+    choice_codes: list[int] = [int(np.searchsorted(labels, c)) for c in choices]
+    codes: np.ndarray = np.select(conditions, choice_codes, default=-1)
+    return _to_categorical(series, codes.astype(np.int16), labels)
+
+
+def create_president_array(year: pd.Series) -> pd.Series:
+    """Vectorized `create_president`."""
+    years: np.ndarray = as_codes(year)
+    return _from_conditions(
+        year,
+        [(years >= 2008) & (years < 2017), (years >= 2017) & (years <= 2021)],
+        ["Obama", "Trump"],
+    )
+
+
+def recode_age_array(age: pd.Series) -> pd.Series:
+    """Vectorized `recode_age`."""
+    ages: np.ndarray = as_codes(age)
+    # `age in range(...)` only matches whole numbers.
+    whole: np.ndarray | bool = ages.dtype.kind != "f" or np.floor(ages) == ages
+    bins: list[tuple[int, int, str]] = [
+        (18, 29, "18-29"),
+        (30, 39, "30-39"),
+        (40, 49, "40-49"),
+        (50, 59, "50-59"),
+        (60, 69, "60-69"),
+    ]
+    conditions: list[np.ndarray] = [
+        whole & (ages >= low) & (ages <= high) for low, high, _ in bins
+    ]
+    return _from_conditions(
+        age, [*conditions, ages > 69], [label for _, _, label in bins] + ["70+"]
+    )
+
+
+# Lower bounds of the `recode_income_oth_cats` categories
+_income_edges: np.ndarray = np.array(
+    [0, 20000, 30000, 40000, 60000, 80000, 100000, 160000], dtype=np.float64
+)
+_income_labels: list[str] = [
+    "<20K",
+    "20K-30K",
+    "30K-40K",
+    "40K-60K",
+    "60K-80K",
+    "80K-100K",
+    "100K-160K",
+    "160K+",
+]
+
+
+def recode_income_oth_cats_array(income: pd.Series) -> pd.Series:
+    """Vectorized `recode_income_oth_cats`."""
+    incomes: np.ndarray = as_float(income)
+    # Position of the last lower bound <= income; -1 for negative incomes.
+    bins: np.ndarray = np.searchsorted(_income_edges, incomes, side="right") - 1
+    bins[np.isnan(incomes)] = -1
+
+    labels: np.ndarray = np.array(sorted(_income_labels), dtype=object)
+    bin_codes: np.ndarray = np.searchsorted(labels, _income_labels)
+    codes: np.ndarray = np.where(bins >= 0, bin_codes[np.maximum(bins, 0)], -1)
+    return _to_categorical(income, codes.astype(np.int16), labels)
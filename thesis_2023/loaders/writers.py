@@ -0,0 +1,148 @@
+"""Write every student data set from one pass over the recoded GSS.
+
+The outputs share most of their columns and rows, so the recoded GSS is
+converted to Arrow once and each output is a projection and row filter of
+that table. The outputs are formatted and written concurrently by
+pyarrow's CSV and Parquet writers, which release the GIL, instead of one
+`to_csv` after another.
+
+CSVs are compressed if their path ends in `.gz`, `.bz2`, or `.zst`, which
+`pd.read_csv` decompresses by the same suffixes.
+
+The CSVs parse to the same values as `to_csv` would write, but pyarrow
+formats them differently: the header and every string are quoted, and
+floats that are whole numbers are written without `.0`. Rows are written in
+the order they're passed in, which is grouped by year when the filtered
+GSS is a partitioned data set.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Mapping, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pv
+
+from loaders.store import PartitionedWriter, arrow_schema, categories_as_strings
+
+if TYPE_CHECKING:
+    from loaders.plan import OutputSpec
+
+# CSV suffixes and their codecs
+CSV_COMPRESSION: dict[str, str] = {".gz": "gzip", ".bz2": "bz2", ".zst": "zstd"}
+
+
+def is_csv(path: str | Path) -> bool:
+    """Check if a path is a CSV, compressed or not."""
+    suffixes: list[str] = Path(path).suffixes
+    return bool(suffixes) and ".csv" in suffixes[-2:]
+
+
+def compressed_path(path: str, compression: Optional[str]) -> str:
+    """Add the suffix of a compression codec to a CSV path."""
+    if compression is None or Path(path).suffix != ".csv":
+        return path
+    suffixes: dict[str, str] = {codec: ext for ext, codec in CSV_COMPRESSION.items()}
+    return path + suffixes[compression]
+
+
+class ArrowCsvWriter:
+    """Write Arrow tables to one CSV with pyarrow's multithreaded writer."""
+
+    def __init__(self, path: str | Path):
+        self.path: Path = Path(path)
+        codec: Optional[str] = CSV_COMPRESSION.get(self.path.suffix)
+        self._sink: pa.NativeFile = (
+            pa.CompressedOutputStream(str(self.path), codec)
+            if codec
+            else pa.OSFile(str(self.path), "wb")
+        )
+        self._writer: Optional[pv.CSVWriter] = None
+
+    def write_table(self, table: pa.Table) -> None:
+        """Append a table, with a header if it's the first."""
+        if self._writer is None:
+            self._writer = pv.CSVWriter(self._sink, table.schema)
+        self._writer.write_table(table)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self._sink.close()
+
+
+class OutputWriter:
+    """Write projections and row filters of the recoded GSS concurrently.
+
+    Each output is a CSV for `.csv` paths (optionally compressed) or a
+    Parquet data set partitioned by year otherwise.
+    """
+
+    def __init__(
+        self,
+        outputs: Mapping[str, "OutputSpec"],
+        compression: str = "zstd",
+        max_workers: Optional[int] = None,
+    ):
+        """
+        Parameters
+        ----------
+        outputs : Mapping[str, OutputSpec]
+            Outputs by name. Their filters are applied by the caller; see
+            `write`.
+        compression : str
+            Parquet compression codec.
+        max_workers : Optional[int]
+            Threads to write with; defaults to one per output.
+        """
+        self.outputs: dict[str, "OutputSpec"] = dict(outputs)
+        self._writers: dict[str, ArrowCsvWriter | PartitionedWriter] = {
+            name: (
+                ArrowCsvWriter(output.path)
+                if is_csv(output.path)
+                else PartitionedWriter(output.path, compression=compression)
+            )
+            for name, output in self.outputs.items()
+        }
+        self._pool: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers or len(self.outputs) or None
+        )
+
+    def write(self, gss: pd.DataFrame, masks: Mapping[str, np.ndarray]) -> None:
+        """Append the rows of `gss` that each output keeps.
+
+        Parameters
+        ----------
+        gss : pd.DataFrame
+            Recoded GSS with the columns of every output.
+        masks : Mapping[str, np.ndarray]
+            Boolean mask of the rows each output keeps.
+        """
+        gss = categories_as_strings(gss)
+        table: pa.Table = pa.Table.from_pandas(
+            gss, schema=arrow_schema(gss), preserve_index=False
+        )
+        writes = [
+            self._pool.submit(self._write, name, table, masks[name])
+            for name in self.outputs
+        ]
+        for write in writes:
+            write.result()
+
+    def _write(self, name: str, table: pa.Table, mask: np.ndarray) -> None:
+        columns: Optional[list[str]] = self.outputs[name].columns
+        if not mask.all():
+            table = table.filter(mask)
+        self._writers[name].write_table(table.select(columns or table.column_names))
+
+    def close(self) -> None:
+        for writer in self._writers.values():
+            writer.close()
+        self._pool.shutdown()
+
+    def __enter__(self) -> "OutputWriter":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
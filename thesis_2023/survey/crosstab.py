@@ -0,0 +1,237 @@
+"""Weighted cross tabulations of many pairs of categorical GSS variables.
+
+samplics' `CrossTabulation` builds one table per call from object columns
+and regroups the design each time. Here each pair of variables is one pass:
+the codes of the row variable, column variable, and group (such as `year`)
+are combined into one cell code, and a sparse PSU × cell matrix of weights
+is built from it with a single aggregation. Everything else is derived from
+that matrix without touching the rows again:
+
+- Weighted counts and proportions are its column sums.
+- The linearized covariance of the cell proportions comes from its rows,
+  which are the PSU totals of the proportions' scores.
+- The design-based chi-square test is the Rao-Scott second-order
+  correction of Pearson's statistic, as samplics reports it.
+
+>>> design = SurveyDesign.from_frame(gss)
+>>> tables, tests = crosstab(
+...     design, gss, [("sex", "decrease_imm"), ("partyid", "letin1a")], by="year"
+... )
+"""
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from scipy import sparse, stats
+
+from survey.descriptive import group_codes
+from survey.design import SurveyDesign
+
+
+def category_codes(series: pd.Series) -> tuple[np.ndarray, pd.Index]:
+    """Integer codes of a column and the levels they index.
+
+    Categorical columns, such as the loaders' recodes, keep the order of
+    their categories. Other columns are factorized in sorted order. Missing
+    values are -1.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(dtype=np.intp), series.cat.categories
+    codes, levels = pd.factorize(series, sort=True)
+    return codes, pd.Index(levels)
+
+
+def crosstab(
+    design: SurveyDesign,
+    data: pd.DataFrame,
+    pairs: Sequence[tuple[str, str]],
+    by: Optional[str | Sequence[str]] = None,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Cross tabulate pairs of categorical columns, optionally by group.
+
+    Rows missing either variable or the group are left out of that pair's
+    tables, like samplics' `remove_nan`.
+
+    Parameters
+    ----------
+    design : SurveyDesign
+        Design of `data`'s rows.
+    data : pd.DataFrame
+        Data with the categorical columns of `pairs`.
+    pairs : Sequence[tuple[str, str]]
+        Row and column variable of each table.
+    by : Optional[str | Sequence[str]]
+        Columns whose groups get separate tables, such as `year`.
+
+    Returns
+    -------
+    tuple[pd.DataFrame, pd.DataFrame]
+        Cells with the groups, `row_var`, `row`, `col_var`, `col`, `count`
+        (weighted), `n` (rows), `proportion` of the table, and its `se`.
+
+        Tests with the groups, `row_var`, `col_var`, Pearson's `chi2` with
+        its `df` and `p_chi2`, and the Rao-Scott `f` with its `df1`, `df2`,
+        and `p_f`.
+    """
+    if len(data) != design.n:
+        raise ValueError(f"Expected {design.n} rows but got {len(data)}")
+
+    groups, keys = group_codes(data, by)
+    n_groups: int = 1 if keys is None else len(keys)
+    # Each variable is coded once however many pairs it's in.
+    codes: dict[str, tuple[np.ndarray, pd.Index]] = {
+        column: category_codes(data[column])
+        for column in dict.fromkeys(column for pair in pairs for column in pair)
+    }
+
+    tables: list[pd.DataFrame] = []
+    tests: list[pd.DataFrame] = []
+    for row_var, col_var in pairs:
+        row_codes, row_levels = codes[row_var]
+        col_codes, col_levels = codes[col_var]
+        shape: tuple[int, int, int] = (n_groups, len(row_levels), len(col_levels))
+
+        valid: np.ndarray = (row_codes >= 0) & (col_codes >= 0) & (groups >= 0)
+        cells: np.ndarray = np.ravel_multi_index(
+            (groups[valid], row_codes[valid], col_codes[valid]), shape
+        )
+        size: int = int(np.prod(shape))
+        # Weight of every cell in every PSU; duplicates are summed.
+        psu_cells: sparse.csc_matrix = sparse.csc_matrix(
+            (design.weights[valid], (design.psu[valid], cells)),
+            shape=(design.n_psu, size),
+        )
+        counts: np.ndarray = np.asarray(psu_cells.sum(axis=0)).ravel()
+        rows: np.ndarray = np.bincount(cells, minlength=size)
+
+        cells_per_group: int = shape[1] * shape[2]
+        proportions: np.ndarray = np.full(size, np.nan)
+        se: np.ndarray = np.full(size, np.nan)
+        group_tests: list[tuple[float, ...]] = []
+        for g in range(n_groups):
+            block: slice = slice(g * cells_per_group, (g + 1) * cells_per_group)
+            total: float = counts[block].sum()
+            if not total:
+                group_tests.append((np.nan,) * 7)
+                continue
+
+            # PSU totals of the scores w * (1[cell] - p) / W of each cell, for
+            # the PSUs with rows in the group
+            p: np.ndarray = counts[block] / total
+            group_cells: sparse.csc_matrix = psu_cells[:, block]
+            psus: np.ndarray = np.unique(group_cells.indices)
+            psu_block: np.ndarray = group_cells[psus].toarray()
+            scores: np.ndarray = (
+                psu_block - psu_block.sum(axis=1)[:, None] * p
+            ) / total
+            covariance: np.ndarray = design.covariance(scores, psus)
+
+            proportions[block] = p
+            se[block] = np.sqrt(np.diag(covariance))
+            group_tests.append(
+                rao_scott(
+                    p.reshape(shape[1:]),
+                    covariance,
+                    rows[block].sum(),
+                    design.degrees_of_freedom,
+                )
+            )
+
+        group_index, row_index, col_index = np.unravel_index(np.arange(size), shape)
+        table: pd.DataFrame = pd.DataFrame(
+            {
+                "row_var": row_var,
+                "row": row_levels[row_index],
+                "col_var": col_var,
+                "col": col_levels[col_index],
+                "count": counts,
+                "n": rows,
+                "proportion": proportions,
+                "se": se,
+            }
+        )
+        test: pd.DataFrame = pd.DataFrame(
+            group_tests, columns=["chi2", "df", "p_chi2", "f", "df1", "df2", "p_f"]
+        )
+        test.insert(0, "col_var", col_var)
+        test.insert(0, "row_var", row_var)
+        if keys is not None:
+            domains: pd.DataFrame = keys.to_frame(index=False)
+            table = pd.concat(
+                [domains.iloc[group_index].reset_index(drop=True), table], axis=1
+            )
+            test = pd.concat([domains, test], axis=1)
+        tables.append(table)
+        tests.append(test)
+
+    return pd.concat(tables, ignore_index=True), pd.concat(tests, ignore_index=True)
+
+
+def rao_scott(
+    proportions: np.ndarray,
+    covariance: np.ndarray,
+    n: int,
+    design_df: int,
+) -> tuple[float, ...]:
+    """Pearson's test of independence with the Rao-Scott correction.
+
+    Rows and columns without any weight are left out of the test.
+
+    Parameters
+    ----------
+    proportions : np.ndarray
+        Rows × columns cell proportions that sum to 1.
+    covariance : np.ndarray
+        Design covariance of the flattened proportions.
+    n : int
+        Rows in the table.
+    design_df : int
+        Degrees of freedom of the design, PSUs minus strata.
+
+    Returns
+    -------
+    tuple[float, ...]
+        Pearson's `chi2`, its `df`, and `p_chi2` under simple random
+        sampling, then the second-order corrected `f`, `df1`, `df2`, and
+        `p_f`. NaN if fewer than two rows or columns have weight.
+    """
+    kept_rows: np.ndarray = proportions.sum(axis=1) > 0
+    kept_cols: np.ndarray = proportions.sum(axis=0) > 0
+    r, c = kept_rows.sum(), kept_cols.sum()
+    if r < 2 or c < 2:
+        return (np.nan,) * 7
+
+    kept: np.ndarray = (kept_rows[:, None] & kept_cols[None, :]).ravel()
+    covariance = covariance[np.ix_(kept, kept)]
+    proportions = proportions[np.ix_(kept_rows, kept_cols)]
+    expected: np.ndarray = np.outer(
+        proportions.sum(axis=1), proportions.sum(axis=0)
+    ).ravel()
+    chi2: float = n * np.sum((proportions.ravel() - expected) ** 2 / expected)
+    df: int = (r - 1) * (c - 1)
+
+    # Interaction contrasts, and their covariance under independence and
+    # simple random sampling
+    contrasts: np.ndarray = np.kron(_effects(r), _effects(c))
+    margins: np.ndarray = contrasts.T @ expected
+    srs: np.ndarray = (
+        contrasts.T @ (expected[:, None] * contrasts) - np.outer(margins, margins)
+    ) / n
+    effects: np.ndarray = np.linalg.solve(srs, contrasts.T @ covariance @ contrasts)
+    trace: float = np.trace(effects)
+    df1: float = trace**2 / np.sum(effects * effects.T)
+    f: float = chi2 / trace
+    return (
+        chi2,
+        df,
+        stats.chi2.sf(chi2, df),
+        f,
+        df1,
+        df1 * design_df,
+        stats.f.sf(f, df1, df1 * design_df),
+    )
+
+
+def _effects(levels: int) -> np.ndarray:
+    """Effect coding of a variable's levels against its last level."""
+    return np.vstack([np.eye(levels - 1), -np.ones(levels - 1)])
@@ -0,0 +1,484 @@
+"""Taylor-linearized variance estimates against one precomputed survey design.
+
+The GSS is a stratified cluster sample: respondents belong to primary
+sampling units (`vpsu`) nested in strata (`vstrat`). samplics' estimators
+group the strata and PSUs again on every call. `SurveyDesign` factorizes
+them once into integer codes, after which the variance of any estimator is
+a function of its linearized scores' PSU totals:
+
+    var = sum over strata h of n_h / (n_h - 1) * sum over PSUs i in h of
+          (z_hi - mean of z_h)^2
+
+where `z_hi` is the total of the scores in PSU `i` of stratum `h`. PSU
+totals are one `np.bincount` per variable (and domain), so estimating
+hundreds of variables costs about one pass over the data each.
+
+PSUs are sampled with replacement, i.e. there isn't a finite population
+correction, like samplics' default. Missing values are treated as outside
+the domain of their variable rather than dropping rows, so every variable
+is estimated against the full design.
+
+>>> design = SurveyDesign.from_frame(gss)
+>>> design.mean(gss, ["coninc", "age"], by="year")
+"""
+from typing import Literal, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from survey.descriptive import group_codes
+
+# How to treat strata with only one PSU, whose variance is undefined:
+# raise, contribute nothing (certainty PSUs), or center on the mean of all
+# PSU totals instead of the stratum's
+SinglePSU = Literal["error", "skip", "center"]
+
+
+class SurveyDesign:
+    """Strata, PSUs, and weights of a survey, factorized once."""
+
+    def __init__(
+        self,
+        weights: Sequence[float],
+        strata: Optional[Sequence] = None,
+        psu: Optional[Sequence] = None,
+        single_psu: SinglePSU = "error",
+    ):
+        """
+        Parameters
+        ----------
+        weights : Sequence[float]
+            Sampling weight of each row, such as `wtsscomp`.
+        strata : Optional[Sequence]
+            Stratum of each row; one stratum if not provided.
+        psu : Optional[Sequence]
+            PSU of each row, numbered within or across strata; each row is
+            its own PSU if not provided.
+        single_psu : SinglePSU
+            Treatment of strata with one PSU.
+
+        Raises
+        ------
+        ValueError
+            Weights, strata, or PSUs are missing, or a stratum has one PSU
+            and `single_psu` is "error".
+        """
+        self.weights: np.ndarray = np.asarray(weights, dtype=np.float64)
+        self.n: int = len(self.weights)
+        if not np.isfinite(self.weights).all():
+            raise ValueError("Weights must not be missing")
+
+        # PSUs are numbered in stratum order so each stratum's PSUs are
+        # contiguous.
+        layout: pd.DataFrame = pd.DataFrame(
+            {
+                "stratum": np.zeros(self.n) if strata is None else np.asarray(strata),
+                "psu": np.arange(self.n) if psu is None else np.asarray(psu),
+            }
+        )
+        if layout.isna().any(axis=None):
+            raise ValueError("Strata and PSUs must not be missing")
+        grouped = layout.groupby(["stratum", "psu"], sort=True)
+        # PSU code of each row
+        self.psu: np.ndarray = grouped.ngroup().to_numpy(dtype=np.intp)
+        # Stratum code of each PSU
+        self.psu_strata: np.ndarray = pd.factorize(
+            grouped.size().index.get_level_values("stratum"), sort=True
+        )[0]
+        self.n_psu: int = len(self.psu_strata)
+        self.n_strata: int = int(self.psu_strata.max(initial=-1)) + 1
+
+        # PSUs in each stratum
+        self._strata_sizes: np.ndarray = np.bincount(
+            self.psu_strata, minlength=self.n_strata
+        )
+        self._psu_counts: np.ndarray = self._strata_sizes[self.psu_strata]
+        self._lonely: np.ndarray = self._psu_counts == 1
+        if self._lonely.any() and single_psu == "error":
+            raise ValueError(
+                f"{self._lonely.sum()} strata have a single PSU; "
+                "pass single_psu='skip' or 'center'"
+            )
+        self.single_psu: SinglePSU = single_psu
+
+        # n_h / (n_h - 1) of each PSU's stratum
+        with np.errstate(divide="ignore"):
+            self._scale: np.ndarray = self._psu_counts / (self._psu_counts - 1.0)
+        self._scale[self._lonely] = 0.0 if single_psu == "skip" else 1.0
+
+    @classmethod
+    def from_frame(
+        cls,
+        data: pd.DataFrame,
+        weight: str = "wtsscomp",
+        strata: Optional[str] = "vstrat",
+        psu: Optional[str] = "vpsu",
+        single_psu: SinglePSU = "error",
+    ) -> "SurveyDesign":
+        """Design of a loader output from its column names."""
+        return cls(
+            data[weight].to_numpy(dtype=np.float64, na_value=np.nan),
+            None if strata is None else data[strata].to_numpy(),
+            None if psu is None else data[psu].to_numpy(),
+            single_psu,
+        )
+
+    @property
+    def degrees_of_freedom(self) -> int:
+        """PSUs minus strata, for t-based confidence intervals."""
+        return self.n_psu - self.n_strata
+
+    def psu_totals(
+        self,
+        scores: np.ndarray,
+        domains: Optional[np.ndarray] = None,
+        groups: int = 1,
+        rows: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Total the scores of every PSU.
+
+        Parameters
+        ----------
+        scores : np.ndarray
+            `n` or `n` × `k` linearized scores, or one per row of `rows`.
+        domains : Optional[np.ndarray]
+            Domain code of each row in `range(groups)`, or -1 for none. A
+            row's score only counts toward its own domain.
+        groups : int
+            Number of domains.
+        rows : Optional[np.ndarray]
+            Indices or mask of the rows that `scores` and `domains` belong
+            to, if not every row; the other rows' scores are zero.
+
+        Returns
+        -------
+        np.ndarray
+            `n_psu` × (`k` · `groups`) totals, domains varying fastest.
+        """
+        psu: np.ndarray = self.psu if rows is None else self.psu[rows]
+        scores = scores.reshape(len(psu), -1)
+        keep: slice | np.ndarray = slice(None)
+        bins: np.ndarray = psu
+        if domains is not None:
+            keep = domains >= 0
+            bins = psu[keep] * groups + domains[keep]
+
+        # Columns of a transposed `k` × `n` array are contiguous.
+        size: int = self.n_psu * groups
+        totals: np.ndarray = np.stack(
+            [
+                np.bincount(bins, column[keep], minlength=size).reshape(
+                    self.n_psu, groups
+                )
+                for column in scores.T
+            ],
+            axis=1,
+        )
+        return totals.reshape(self.n_psu, -1)
+
+    def covariance(
+        self, totals: np.ndarray, psus: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Linearized covariance matrix of estimators from their PSU totals.
+
+        Parameters
+        ----------
+        totals : np.ndarray
+            PSUs × estimators totals of the estimators' scores.
+        psus : Optional[np.ndarray]
+            Sorted PSU codes of the rows of `totals` if it only has some
+            PSUs; the other PSUs' totals are zero. Strata without any of
+            them are skipped, which is much faster for estimators that only
+            involve a few strata, such as one year of the GSS.
+
+        Returns
+        -------
+        np.ndarray
+            Estimators × estimators covariance matrix.
+        """
+        deviations, scale = self._deviations(totals, psus)
+        return (deviations * scale[:, None]).T @ deviations
+
+    def variance(
+        self, totals: np.ndarray, psus: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Linearized variances of estimators from their PSU totals.
+
+        Parameters are the same as `covariance`.
+        """
+        deviations, scale = self._deviations(totals, psus)
+        return scale @ deviations**2
+
+    def total(
+        self,
+        data: pd.DataFrame,
+        columns: Sequence[str],
+        by: Optional[str | Sequence[str]] = None,
+        alpha: float = 0.05,
+    ) -> pd.DataFrame:
+        """Weighted totals of columns, optionally by domain.
+
+        Parameters
+        ----------
+        data : pd.DataFrame
+            Data whose rows are the design's rows.
+        columns : Sequence[str]
+            Numeric columns to total.
+        by : Optional[str | Sequence[str]]
+            Columns whose groups are domains.
+        alpha : float
+            Significance level of the confidence intervals.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per variable and domain with the domain, `variable`,
+            `estimate`, `se`, `lower`, `upper`, and `n`.
+        """
+        values, valid = self._values(data, columns)
+        domains, keys = group_codes(data, by)
+        groups: int = 1 if keys is None else len(keys)
+
+        scores: np.ndarray = np.where(valid, self.weights * values, 0.0)
+        totals: np.ndarray = self.psu_totals(scores.T, domains, groups)
+        estimates: np.ndarray = totals.sum(axis=0)
+        counts: np.ndarray = self._counts(valid, domains, groups)
+        return self._table(
+            {"variable": columns}, keys, estimates, totals, counts, alpha
+        )
+
+    def mean(
+        self,
+        data: pd.DataFrame,
+        columns: Sequence[str],
+        by: Optional[str | Sequence[str]] = None,
+        alpha: float = 0.05,
+    ) -> pd.DataFrame:
+        """Weighted means of columns, optionally by domain.
+
+        Parameters and returns are the same as `total`.
+        """
+        values, valid = self._values(data, columns)
+        domains, keys = group_codes(data, by)
+        groups: int = 1 if keys is None else len(keys)
+        estimates, totals = self._means(values, valid, domains, groups)
+        counts: np.ndarray = self._counts(valid, domains, groups)
+        return self._table(
+            {"variable": columns}, keys, estimates, totals, counts, alpha
+        )
+
+    def proportion(
+        self,
+        data: pd.DataFrame,
+        columns: Sequence[str],
+        by: Optional[str | Sequence[str]] = None,
+        alpha: float = 0.05,
+    ) -> pd.DataFrame:
+        """Weighted proportions of each level of categorical columns.
+
+        Proportions are means of level indicators among the rows where the
+        column is present. Parameters are the same as `total`.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per variable, level, and domain with the domain,
+            `variable`, `level`, `estimate`, `se`, `lower`, `upper`, and `n`.
+        """
+        domains, keys = group_codes(data, by)
+        groups: int = 1 if keys is None else len(keys)
+
+        indicators: list[np.ndarray] = []
+        valid: list[np.ndarray] = []
+        labels: dict[str, list] = {"variable": [], "level": []}
+        for column in columns:
+            codes, levels = pd.factorize(data[column], sort=True)
+            indicators.append(np.arange(len(levels))[:, None] == codes)
+            valid.append(np.repeat([codes >= 0], len(levels), axis=0))
+            labels["variable"].extend([column] * len(levels))
+            labels["level"].extend(levels)
+
+        present: np.ndarray = np.vstack(valid)
+        estimates, totals = self._means(
+            np.vstack(indicators).astype(np.float64), present, domains, groups
+        )
+        counts: np.ndarray = self._counts(present, domains, groups)
+        return self._table(labels, keys, estimates, totals, counts, alpha)
+
+    def ratio(
+        self,
+        data: pd.DataFrame,
+        numerators: Sequence[str],
+        denominators: Sequence[str],
+        alpha: float = 0.05,
+    ) -> pd.DataFrame:
+        """Ratios of weighted totals of pairs of columns.
+
+        Parameters
+        ----------
+        data : pd.DataFrame
+            Data whose rows are the design's rows.
+        numerators : Sequence[str]
+            Numerator of each ratio.
+        denominators : Sequence[str]
+            Denominator of each ratio, paired with `numerators`.
+        alpha : float
+            Significance level of the confidence intervals.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per ratio with `numerator`, `denominator`, `estimate`,
+            `se`, `lower`, `upper`, and `n`.
+        """
+        if len(numerators) != len(denominators):
+            raise ValueError("Every numerator needs a denominator")
+
+        y, valid_y = self._values(data, numerators)
+        x, valid_x = self._values(data, denominators)
+        valid: np.ndarray = valid_y & valid_x
+        weights: np.ndarray = np.where(valid, self.weights, 0.0)
+        y, x = np.where(valid, y, 0.0), np.where(valid, x, 0.0)
+
+        total_y: np.ndarray = (weights * y).sum(axis=1)
+        total_x: np.ndarray = (weights * x).sum(axis=1)
+        estimates: np.ndarray = total_y / total_x
+        scores: np.ndarray = weights * (y - estimates[:, None] * x) / total_x[:, None]
+        return self._table(
+            {"numerator": numerators, "denominator": denominators},
+            None,
+            estimates,
+            self.psu_totals(scores.T),
+            valid.sum(axis=1),
+            alpha,
+        )
+
+    def _deviations(
+        self, totals: np.ndarray, psus: Optional[np.ndarray] = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Deviations of PSU totals from their stratum's mean and their scales."""
+        if psus is None:
+            totals = totals.reshape(self.n_psu, -1)
+            members: np.ndarray = np.arange(self.n_psu)
+        else:
+            # Fill in the rest of the PSUs of every stratum that has some.
+            # Lonely PSUs are centered on the mean of all PSUs, so a zero
+            # total still deviates.
+            strata: np.ndarray = np.unique(self.psu_strata[psus])
+            involved: np.ndarray = np.isin(self.psu_strata, strata)
+            if self.single_psu == "center":
+                involved |= self._lonely
+            members = np.flatnonzero(involved)
+            filled: np.ndarray = np.zeros((len(members), totals.shape[1]))
+            filled[np.searchsorted(members, psus)] = totals
+            totals = filled
+
+        member_strata: np.ndarray = self.psu_strata[members]
+        starts: np.ndarray = np.flatnonzero(
+            np.diff(member_strata, prepend=-1) != 0
+        )
+        means: np.ndarray = (
+            np.add.reduceat(totals, starts, axis=0)
+            / self._strata_sizes[member_strata[starts], None]
+        )
+        deviations: np.ndarray = totals - np.repeat(
+            means, np.diff(starts, append=len(members)), axis=0
+        )
+        lonely: np.ndarray = self._lonely[members]
+        if self.single_psu == "center" and lonely.any():
+            deviations[lonely] = totals[lonely] - totals.sum(axis=0) / self.n_psu
+        return deviations, self._scale[members]
+
+    def _values(
+        self, data: pd.DataFrame, columns: Sequence[str]
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Columns as a `k` × `n` float matrix and where they're present."""
+        if len(data) != self.n:
+            raise ValueError(f"Expected {self.n} rows but got {len(data)}")
+        values: np.ndarray = np.vstack(
+            [
+                data[column].to_numpy(dtype=np.float64, na_value=np.nan)
+                for column in columns
+            ]
+        )
+        return values, np.isfinite(values)
+
+    def _means(
+        self,
+        values: np.ndarray,
+        valid: np.ndarray,
+        domains: np.ndarray,
+        groups: int,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Means of each row of `values` by domain and their PSU totals."""
+        inside: np.ndarray = domains >= 0
+        codes: np.ndarray = np.where(inside, domains, 0)
+        estimates: np.ndarray = np.empty((len(values), groups))
+        scores: np.ndarray = np.empty_like(values)
+
+        for j, (column, present) in enumerate(zip(values, valid, strict=True)):
+            weights: np.ndarray = np.where(present & inside, self.weights, 0.0)
+            column = np.where(present, column, 0.0)
+            sum_weights: np.ndarray = np.bincount(codes, weights, minlength=groups)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                estimates[j] = (
+                    np.bincount(codes, weights * column, minlength=groups)
+                    / sum_weights
+                )
+            # Each row's score is relative to the mean of its own domain.
+            # Empty domains have no scores instead of NaN ones.
+            empty: np.ndarray = sum_weights == 0
+            centers: np.ndarray = np.where(empty, 0.0, estimates[j])
+            scales: np.ndarray = 1 / np.where(empty, 1.0, sum_weights)
+            if groups == 1:
+                scores[j] = weights * (column - centers[0]) * scales[0]
+            else:
+                scores[j] = weights * (column - centers[codes]) * scales[codes]
+
+        return estimates.ravel(), self.psu_totals(scores.T, domains, groups)
+
+    @staticmethod
+    def _counts(valid: np.ndarray, domains: np.ndarray, groups: int) -> np.ndarray:
+        """Rows present in each column and domain."""
+        inside: np.ndarray = domains >= 0
+        codes: np.ndarray = np.where(inside, domains, 0)
+        return np.concatenate(
+            [
+                np.bincount(codes, column & inside, minlength=groups)
+                for column in valid
+            ]
+        ).astype(np.int64)
+
+    def _table(
+        self,
+        labels: dict[str, Sequence],
+        keys: Optional[pd.Index],
+        estimates: np.ndarray,
+        totals: np.ndarray,
+        counts: np.ndarray,
+        alpha: float,
+    ) -> pd.DataFrame:
+        """Tidy estimates with standard errors and confidence intervals."""
+        groups: int = 1 if keys is None else len(keys)
+        se: np.ndarray = np.sqrt(self.variance(totals))
+        margin: np.ndarray = stats.t.ppf(1 - alpha / 2, self.degrees_of_freedom) * se
+
+        table: pd.DataFrame = pd.DataFrame(
+            {
+                name: np.repeat(np.asarray(label), groups)
+                for name, label in labels.items()
+            }
+        )
+        if keys is not None:
+            # Domains vary fastest.
+            domains: pd.DataFrame = keys.to_frame(index=False)
+            domains = domains.iloc[np.tile(np.arange(groups), len(table) // groups)]
+            table = pd.concat([domains.reset_index(drop=True), table], axis=1)
+        return table.assign(
+            estimate=estimates,
+            se=se,
+            lower=estimates - margin,
+            upper=estimates + margin,
+            n=counts,
+        )
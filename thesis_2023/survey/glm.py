@@ -0,0 +1,309 @@
+"""Fit many survey-weighted GLM specifications against one design matrix.
+
+The analysis notebook builds dummies with `pd.get_dummies` and fits one
+`sm.GLM` at a time, so robustness tables with dozens of nested
+specifications re-encode the same features and fit each model from
+scratch. `glm_sweep` instead:
+
+- encodes every feature once into a shared dense matrix (`encode`), whose
+  column blocks each specification selects,
+- fits the largest specifications first and warm-starts IRLS for every
+  nested specification from the coefficients of its smallest superset as
+  soon as that superset is fitted,
+- fits on a process pool that receives the matrix once per worker, and
+- returns coefficients with Taylor-linearized (sandwich) standard errors
+  from a `SurveyDesign`, like samplics' `SurveyGLM`, in one tidy table.
+
+>>> design = SurveyDesign.from_frame(gss_saf)
+>>> specifications = nested_specifications(["sex", "age", "degree", "partyid"])
+>>> table = glm_sweep(design, gss_saf, "decrease_imm", specifications)
+"""
+import os
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import statsmodels.api as sm
+from scipy import stats
+
+from survey.crosstab import category_codes
+from survey.design import SurveyDesign
+
+# Worker state for `glm_sweep`, set once per process by `_start_worker`
+_worker: dict[str, Any] = {}
+
+
+@dataclass(frozen=True)
+class Specification:
+    """A model to fit."""
+
+    # Label of the model in the results
+    name: str
+    # Features of the model besides the constant
+    features: tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class DesignMatrix:
+    """Features encoded once for every specification."""
+
+    # Rows × columns float64 matrix with the constant first
+    matrix: np.ndarray
+    # Column names like `pd.get_dummies`, e.g. `sex_Female`
+    columns: list[str]
+    # Columns of each feature
+    blocks: dict[str, list[int]]
+    # Rows where each feature is missing
+    missing: dict[str, np.ndarray]
+
+    def select(self, features: Sequence[str]) -> tuple[list[int], np.ndarray]:
+        """Columns of some features and the rows where all of them exist."""
+        columns: list[int] = [0]
+        present: np.ndarray = np.ones(len(self.matrix), dtype=bool)
+        for feature in features:
+            columns.extend(self.blocks[feature])
+            present &= ~self.missing[feature]
+        return columns, present
+
+
+def encode(data: pd.DataFrame, features: Sequence[str]) -> DesignMatrix:
+    """Encode features for GLMs.
+
+    Numeric features are used as is. Categorical and string features become
+    indicators of every level but the first, like `pd.get_dummies` with
+    `drop_first=True`. Missing values are zero and marked in `missing`.
+    """
+    blocks: dict[str, list[int]] = {}
+    missing: dict[str, np.ndarray] = {}
+    columns: list[str] = ["const"]
+    encoded: list[np.ndarray] = [np.ones((len(data), 1))]
+
+    for feature in dict.fromkeys(features):
+        series: pd.Series = data[feature]
+        if pd.api.types.is_numeric_dtype(series) and not isinstance(
+            series.dtype, pd.CategoricalDtype
+        ):
+            values: np.ndarray = series.to_numpy(dtype=np.float64, na_value=np.nan)
+            missing[feature] = ~np.isfinite(values)
+            block: np.ndarray = np.where(missing[feature], 0.0, values)[:, None]
+            names: list[str] = [feature]
+        else:
+            codes, levels = category_codes(series)
+            missing[feature] = codes < 0
+            block = (codes[:, None] == np.arange(1, len(levels))).astype(np.float64)
+            names = [f"{feature}_{level}" for level in levels[1:]]
+
+        blocks[feature] = list(range(len(columns), len(columns) + len(names)))
+        columns.extend(names)
+        encoded.append(block)
+
+    return DesignMatrix(np.hstack(encoded), columns, blocks, missing)
+
+
+def nested_specifications(
+    features: Sequence[str], prefix: str = "model"
+) -> list[Specification]:
+    """Specifications that add one feature at a time, e.g. for a robustness table."""
+    return [
+        Specification(f"{prefix}_{i}", tuple(features[:i]))
+        for i in range(1, len(features) + 1)
+    ]
+
+
+def glm_sweep(
+    design: SurveyDesign,
+    data: pd.DataFrame,
+    target: str,
+    specifications: Sequence[Specification],
+    family: Optional[sm.families.Family] = None,
+    positive: Optional[Any] = None,
+    alpha: float = 0.05,
+    max_workers: Optional[int] = None,
+) -> pd.DataFrame:
+    """Fit GLMs of a target on many feature sets with survey standard errors.
+
+    Rows missing the target or a feature of a specification are outside
+    that model's domain: they don't contribute to the fit, but the design
+    keeps all of its PSUs.
+
+    Parameters
+    ----------
+    design : SurveyDesign
+        Design of `data`'s rows; its weights are the GLM weights.
+    data : pd.DataFrame
+        Data with the target and every feature.
+    target : str
+        Column to model, such as `decrease_imm`.
+    specifications : Sequence[Specification]
+        Models to fit.
+    family : Optional[sm.families.Family]
+        GLM family; binomial by default.
+    positive : Optional[Any]
+        Level of a categorical target modeled as 1; the last level by
+        default, which is what `pd.get_dummies(drop_first=True)` keeps for
+        two levels.
+    alpha : float
+        Significance level of the confidence intervals.
+    max_workers : Optional[int]
+        Processes to fit on. 1 fits in the calling process.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per model and term with `model`, `term`, `coef`, `se`, `t`,
+        `p`, `lower`, `upper`, the model's rows `n`, and the IRLS
+        `iterations` it took.
+    """
+    if len(data) != design.n:
+        raise ValueError(f"Expected {design.n} rows but got {len(data)}")
+
+    y: np.ndarray = _target(data[target], positive)
+    matrix: DesignMatrix = encode(
+        data, [feature for spec in specifications for feature in spec.features]
+    )
+    state: tuple = (design, matrix, y, family or sm.families.Binomial())
+
+    # Each specification starts from the fit of its smallest superset, which
+    # for nested models is close to its optimum, once that fit is done.
+    # Specifications without a superset start cold.
+    features: list[frozenset[str]] = [frozenset(s.features) for s in specifications]
+    parents: list[Optional[int]] = [
+        min(
+            (j for j, other in enumerate(features) if own < other),
+            key=lambda j: len(features[j]),
+            default=None,
+        )
+        for own in features
+    ]
+    children: defaultdict[int, list[int]] = defaultdict(list)
+    for i, parent in enumerate(parents):
+        if parent is not None:
+            children[parent].append(i)
+
+    fits: dict[int, tuple] = {}
+
+    def task(i: int) -> tuple[Specification, Optional[dict[str, float]]]:
+        if (parent := parents[i]) is None:
+            return specifications[i], None
+        terms, coef, *_ = fits[parent]
+        return specifications[i], dict(zip(terms, coef, strict=True))
+
+    # Every worker receives the matrix once for all of the fits.
+    workers: int = min(len(specifications), max_workers or os.cpu_count() or 1)
+    pool: Optional[ProcessPoolExecutor] = None
+    if workers > 1:
+        pool = ProcessPoolExecutor(workers, initializer=_start_worker, initargs=state)
+    else:
+        _start_worker(*state)
+    try:
+        if pool is None:
+            # Supersets have more features, so they're fitted first.
+            for i in sorted(range(len(features)), key=lambda i: -len(features[i])):
+                fits[i] = _fit(task(i))
+        else:
+            running: dict[Future, int] = {
+                pool.submit(_fit, task(i)): i
+                for i, parent in enumerate(parents)
+                if parent is None
+            }
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i: int = running.pop(future)
+                    fits[i] = future.result()
+                    for child in children[i]:
+                        running[pool.submit(_fit, task(child))] = child
+    finally:
+        if pool is None:
+            _worker.clear()
+        else:
+            pool.shutdown()
+
+    tables: list[pd.DataFrame] = []
+    critical: float = stats.t.ppf(1 - alpha / 2, design.degrees_of_freedom)
+    for i, spec in enumerate(specifications):
+        terms, coef, covariance, n, iterations = fits[i]
+        se: np.ndarray = np.sqrt(np.diag(covariance))
+        t: np.ndarray = coef / se
+        tables.append(
+            pd.DataFrame(
+                {
+                    "model": spec.name,
+                    "term": terms,
+                    "coef": coef,
+                    "se": se,
+                    "t": t,
+                    "p": 2 * stats.t.sf(np.abs(t), design.degrees_of_freedom),
+                    "lower": coef - critical * se,
+                    "upper": coef + critical * se,
+                    "n": n,
+                    "iterations": iterations,
+                }
+            )
+        )
+    return pd.concat(tables, ignore_index=True)
+
+
+def _target(series: pd.Series, positive: Optional[Any]) -> np.ndarray:
+    """Target as floats with NaN where it's missing."""
+    if pd.api.types.is_numeric_dtype(series) and not isinstance(
+        series.dtype, pd.CategoricalDtype
+    ):
+        return series.to_numpy(dtype=np.float64, na_value=np.nan)
+
+    codes, levels = category_codes(series)
+    level: int = len(levels) - 1 if positive is None else levels.get_loc(positive)
+    return np.where(codes < 0, np.nan, (codes == level).astype(np.float64))
+
+
+def _start_worker(
+    design: SurveyDesign,
+    matrix: DesignMatrix,
+    y: np.ndarray,
+    family: sm.families.Family,
+) -> None:
+    _worker.update(design=design, matrix=matrix, y=y, family=family)
+
+
+def _fit(task: tuple[Specification, Optional[dict[str, float]]]) -> tuple:
+    """Fit one specification and its linearized covariance.
+
+    Returns
+    -------
+    tuple
+        Term names, coefficients, covariance matrix, rows, and iterations.
+    """
+    spec, start = task
+    design: SurveyDesign = _worker["design"]
+    matrix: DesignMatrix = _worker["matrix"]
+    family: sm.families.Family = _worker["family"]
+
+    columns, present = matrix.select(spec.features)
+    present &= np.isfinite(_worker["y"])
+    terms: list[str] = [matrix.columns[column] for column in columns]
+    x: np.ndarray = matrix.matrix[np.ix_(present, columns)]
+    y: np.ndarray = _worker["y"][present]
+    weights: np.ndarray = design.weights[present]
+
+    start_params: Optional[np.ndarray] = None
+    if start is not None:
+        start_params = np.array([start.get(term, 0.0) for term in terms])
+    result = sm.GLM(y, x, family=family, var_weights=weights).fit(
+        start_params=start_params
+    )
+    coef: np.ndarray = np.asarray(result.params)
+
+    # Sandwich covariance: the scores' inverse-Hessian-scaled PSU totals
+    mu: np.ndarray = np.asarray(result.fittedvalues)
+    deriv: np.ndarray = family.link.deriv(mu)
+    irls: np.ndarray = weights / (family.variance(mu) * deriv**2)
+    bread: np.ndarray = np.linalg.inv(x.T @ (irls[:, None] * x))
+    scores: np.ndarray = ((irls * deriv * (y - mu))[:, None] * x) @ bread
+    covariance: np.ndarray = design.covariance(
+        design.psu_totals(scores, rows=present)
+    )
+
+    return terms, coef, covariance, int(present.sum()), result.fit_history["iteration"]
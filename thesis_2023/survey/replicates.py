@@ -0,0 +1,418 @@
+"""Replicate-weight standard errors from the GSS design columns.
+
+Replicate weights perturb the weight of every PSU, re-estimate a statistic
+once per replicate, and measure the spread of the replicate estimates. It
+works for statistics that linearization can't handle, such as medians.
+
+A replicate only rescales whole PSUs, so the replicates are stored as one
+float32 matrix of PSU factors (replicates × PSUs) rather than one weight
+per row and replicate; the weights of replicate `r` are
+`design.weights * factors[r, design.psu]`. Because of that:
+
+- Totals and means of any number of columns across every replicate are a
+  matrix product of the factors and the columns' PSU totals.
+- Quantiles sort each column once. A replicate only changes the weights of
+  the sorted values, so every replicate's cumulative weights come from one
+  sparse product of the values' per-PSU weights and the factors.
+- Other statistics, such as GLM coefficients, are evaluated per replicate
+  on a process pool by `ReplicateWeights.apply`.
+
+>>> design = SurveyDesign.from_frame(gss, single_psu="skip")
+>>> replicates = ReplicateWeights.bootstrap(design, replicates=500, seed=765)
+>>> replicates.quantile(gss, ["coninc"], [0.5])
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Literal, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.linalg import hadamard
+
+from survey.descriptive import cumulative_quantiles
+from survey.design import SurveyDesign
+
+Method = Literal["jackknife", "brr", "bootstrap"]
+
+# An estimator is called with the data and one set of weights and returns
+# an estimate or an array of them.
+Estimator = Callable[[pd.DataFrame, np.ndarray], Any]
+
+# Replicates per block of matrix products to bound the float64 copies
+_BLOCK: int = 256
+
+# Worker state for `apply`, set once per process by `_start_worker`
+_worker: dict[str, Any] = {}
+
+
+class ReplicateWeights:
+    """Replicate factors of a survey design and estimators over them."""
+
+    def __init__(
+        self,
+        design: SurveyDesign,
+        factors: np.ndarray,
+        scales: np.ndarray,
+        method: Method,
+    ):
+        """
+        Parameters
+        ----------
+        design : SurveyDesign
+            Design whose PSUs the factors rescale.
+        factors : np.ndarray
+            Replicates × PSUs weight factors.
+        scales : np.ndarray
+            Multiplier of each replicate's squared deviation in the variance.
+        method : Method
+            How the factors were built.
+        """
+        self.design: SurveyDesign = design
+        self.factors: np.ndarray = np.ascontiguousarray(factors, dtype=np.float32)
+        self.scales: np.ndarray = np.asarray(scales, dtype=np.float64)
+        self.method: Method = method
+
+    @classmethod
+    def jackknife(cls, design: SurveyDesign) -> "ReplicateWeights":
+        """Delete-one-PSU jackknife (JKn) replicates.
+
+        Replicate `i` drops PSU `i` and scales up the rest of its stratum by
+        `n_h / (n_h - 1)`. Strata with a single PSU get no replicate.
+
+        The delete-one jackknife is inconsistent for quantiles, whose
+        replicates barely move; use `brr` or `bootstrap` for medians.
+        """
+        sizes: np.ndarray = np.bincount(design.psu_strata)[design.psu_strata]
+        dropped: np.ndarray = np.flatnonzero(sizes > 1)
+        strata: np.ndarray = design.psu_strata[dropped]
+
+        factors: np.ndarray = np.ones((len(dropped), design.n_psu), dtype=np.float32)
+        same_stratum: np.ndarray = strata[:, None] == design.psu_strata[None, :]
+        factors[same_stratum] = np.repeat(
+            sizes[dropped] / (sizes[dropped] - 1), same_stratum.sum(axis=1)
+        )
+        factors[np.arange(len(dropped)), dropped] = 0.0
+        scales: np.ndarray = (sizes[dropped] - 1) / sizes[dropped]
+        return cls(design, factors, scales, "jackknife")
+
+    @classmethod
+    def brr(cls, design: SurveyDesign, fay: float = 0.0) -> "ReplicateWeights":
+        """Balanced repeated replication from a Hadamard matrix.
+
+        Every stratum must have exactly two PSUs. Each replicate keeps one
+        PSU per stratum at `2 - fay` times its weight and the other at
+        `fay` times, balanced across strata by the rows of a Hadamard
+        matrix.
+
+        Raises
+        ------
+        ValueError
+            A stratum doesn't have two PSUs.
+        """
+        sizes: np.ndarray = np.bincount(design.psu_strata)
+        if (sizes != 2).any():
+            raise ValueError(
+                f"BRR needs two PSUs per stratum but {(sizes != 2).sum()} strata "
+                "have another number"
+            )
+
+        # Column 0 of a Hadamard matrix is constant, so it isn't balanced.
+        order: int = 1 << int(np.ceil(np.log2(design.n_strata + 1)))
+        signs: np.ndarray = hadamard(order)[:, 1 : design.n_strata + 1] > 0
+        # PSUs are numbered in stratum order, so they come in pairs.
+        first: np.ndarray = np.repeat([[True, False]], design.n_strata, axis=0)
+        kept: np.ndarray = (signs[:, :, None] == first[None]).reshape(order, -1)
+        factors: np.ndarray = np.where(kept, 2.0 - fay, fay)
+        scales: np.ndarray = np.full(order, 1 / (order * (1 - fay) ** 2))
+        return cls(design, factors, scales, "brr")
+
+    @classmethod
+    def bootstrap(
+        cls,
+        design: SurveyDesign,
+        replicates: int = 500,
+        seed: Optional[int] = None,
+    ) -> "ReplicateWeights":
+        """Rao-Wu rescaling bootstrap replicates.
+
+        Each replicate samples `n_h - 1` PSUs with replacement from every
+        stratum and scales their weights by `n_h / (n_h - 1)` times the
+        number of times they're drawn. Strata with a single PSU keep their
+        weights.
+        """
+        rng: np.random.Generator = np.random.default_rng(seed)
+        sizes: np.ndarray = np.bincount(design.psu_strata)
+        starts: np.ndarray = np.searchsorted(
+            design.psu_strata, np.arange(design.n_strata)
+        )
+        # Stratum of every draw of one replicate
+        draws: np.ndarray = np.repeat(np.arange(design.n_strata), sizes - 1)
+        scale: np.ndarray = (sizes / np.maximum(sizes - 1, 1))[design.psu_strata]
+        lonely: np.ndarray = sizes[design.psu_strata] == 1
+
+        factors: np.ndarray = np.empty((replicates, design.n_psu), dtype=np.float32)
+        for r in range(replicates):
+            picked: np.ndarray = starts[draws] + rng.integers(sizes[draws])
+            factors[r] = np.bincount(picked, minlength=design.n_psu) * scale
+        factors[:, lonely] = 1.0
+        return cls(design, factors, np.full(replicates, 1 / replicates), "bootstrap")
+
+    @property
+    def n_replicates(self) -> int:
+        return len(self.factors)
+
+    def weights(
+        self, replicates: Optional[slice | Sequence[int]] = None
+    ) -> np.ndarray:
+        """Row weights of replicates as an `n` × replicates float32 matrix.
+
+        Every replicate's weights if `replicates` isn't provided.
+        """
+        if replicates is None:
+            replicates = slice(None)
+        return (
+            self.design.weights[:, None].astype(np.float32)
+            * self.factors[replicates].T[self.design.psu]
+        )
+
+    def variance(self, estimate: np.ndarray, replicates: np.ndarray) -> np.ndarray:
+        """Variance of estimates from their replicates.
+
+        Parameters
+        ----------
+        estimate : np.ndarray
+            Full-sample estimates.
+        replicates : np.ndarray
+            Replicates × estimates replicate estimates.
+
+        Returns
+        -------
+        np.ndarray
+            Variance of each estimate, centered on the full-sample estimate.
+        """
+        deviations: np.ndarray = np.asarray(replicates) - np.asarray(estimate)
+        return self.scales @ deviations.reshape(self.n_replicates, -1) ** 2
+
+    def total(self, data: pd.DataFrame, columns: Sequence[str]) -> pd.DataFrame:
+        """Weighted totals of columns with replicate standard errors.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per column with `variable`, `estimate`, `se`, and `n`.
+        """
+        values, valid = self._values(data, columns)
+        totals: np.ndarray = self.design.psu_totals(
+            np.where(valid, self.design.weights[:, None] * values, 0.0)
+        )
+        return self._table(
+            columns, totals.sum(axis=0), self._replicate(totals), valid.sum(axis=0)
+        )
+
+    def mean(self, data: pd.DataFrame, columns: Sequence[str]) -> pd.DataFrame:
+        """Weighted means of columns with replicate standard errors.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per column with `variable`, `estimate`, `se`, and `n`.
+        """
+        values, valid = self._values(data, columns)
+        weights: np.ndarray = np.where(valid, self.design.weights[:, None], 0.0)
+        sums: np.ndarray = self.design.psu_totals(weights * np.where(valid, values, 0))
+        sum_weights: np.ndarray = self.design.psu_totals(weights)
+        estimates: np.ndarray = sums.sum(axis=0) / sum_weights.sum(axis=0)
+        replicates: np.ndarray = self._replicate(sums) / self._replicate(sum_weights)
+        return self._table(columns, estimates, replicates, valid.sum(axis=0))
+
+    def quantile(
+        self,
+        data: pd.DataFrame,
+        columns: Sequence[str],
+        quantiles: Sequence[float] = (0.5,),
+    ) -> pd.DataFrame:
+        """Weighted quantiles of columns with replicate standard errors.
+
+        Quantiles are the same as `weighted_stats`. Each column is sorted
+        once for all replicates.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per column and quantile with `variable`, `quantile`,
+            `estimate`, `se`, and `n`.
+        """
+        values, valid = self._values(data, columns)
+        probs: np.ndarray = np.asarray(quantiles, dtype=np.float64)
+        frames: list[pd.DataFrame] = []
+
+        for j, column in enumerate(columns):
+            present: np.ndarray = np.flatnonzero(valid[:, j])
+            runs, run_values = pd.factorize(values[present, j], sort=True)
+            # Weight of every distinct value in every PSU
+            run_weights: sparse.csr_matrix = sparse.csr_matrix(
+                (
+                    self.design.weights[present],
+                    (runs, self.design.psu[present]),
+                ),
+                shape=(len(run_values), self.design.n_psu),
+            )
+
+            estimate: np.ndarray = _block_quantiles(
+                run_values, np.asarray(run_weights.sum(axis=1)), probs
+            )[0]
+            replicates: np.ndarray = np.vstack(
+                [
+                    _block_quantiles(
+                        run_values,
+                        run_weights @ self.factors[block].T.astype(np.float64),
+                        probs,
+                    )
+                    for block in self._blocks()
+                ]
+            )
+            frames.append(
+                pd.DataFrame(
+                    {
+                        "variable": column,
+                        "quantile": probs,
+                        "estimate": estimate,
+                        "se": np.sqrt(self.variance(estimate, replicates)),
+                        "n": len(present),
+                    }
+                )
+            )
+
+        return pd.concat(frames, ignore_index=True)
+
+    def apply(
+        self,
+        estimator: Estimator,
+        data: pd.DataFrame,
+        max_workers: Optional[int] = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Estimate any statistic and its replicate standard errors.
+
+        Parameters
+        ----------
+        estimator : Estimator
+            Function of the data and weights, such as a GLM fit returning
+            its coefficients. It must be picklable, i.e. defined at the top
+            level of a module, to run on other processes.
+        data : pd.DataFrame
+            Data whose rows are the design's rows.
+        max_workers : Optional[int]
+            Processes to evaluate replicates on. 1 evaluates them in the
+            calling process.
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray]
+            Full-sample estimates and their standard errors.
+        """
+        estimate: np.ndarray = np.asarray(estimator(data, self.design.weights))
+        state: tuple = (estimator, data, self.design.weights, self.design.psu)
+
+        if max_workers == 1:
+            _start_worker(*state, self.factors)
+            try:
+                replicates: list[np.ndarray] = [
+                    _run_replicates(range(self.n_replicates))
+                ]
+            finally:
+                _worker.clear()
+        else:
+            # Each worker receives the data once rather than per replicate.
+            workers: int = max_workers or os.cpu_count() or 1
+            chunks: list[np.ndarray] = np.array_split(
+                np.arange(self.n_replicates), min(self.n_replicates, 4 * workers)
+            )
+            with ProcessPoolExecutor(
+                workers, initializer=_start_worker, initargs=(*state, self.factors)
+            ) as pool:
+                replicates = list(pool.map(_run_replicates, chunks))
+
+        return estimate, np.sqrt(self.variance(estimate, np.vstack(replicates)))
+
+    def _blocks(self) -> list[slice]:
+        return [
+            slice(start, start + _BLOCK)
+            for start in range(0, self.n_replicates, _BLOCK)
+        ]
+
+    def _replicate(self, totals: np.ndarray) -> np.ndarray:
+        """Replicate totals from full-sample PSU totals."""
+        return np.vstack(
+            [
+                self.factors[block].astype(np.float64) @ totals
+                for block in self._blocks()
+            ]
+        )
+
+    def _values(
+        self, data: pd.DataFrame, columns: Sequence[str]
+    ) -> tuple[np.ndarray, np.ndarray]:
+        if len(data) != self.design.n:
+            raise ValueError(f"Expected {self.design.n} rows but got {len(data)}")
+        values: np.ndarray = data[list(columns)].to_numpy(
+            dtype=np.float64, na_value=np.nan
+        )
+        return values, np.isfinite(values)
+
+    def _table(
+        self,
+        columns: Sequence[str],
+        estimates: np.ndarray,
+        replicates: np.ndarray,
+        counts: np.ndarray,
+    ) -> pd.DataFrame:
+        return pd.DataFrame(
+            {
+                "variable": columns,
+                "estimate": estimates,
+                "se": np.sqrt(self.variance(estimates, replicates)),
+                "n": counts,
+            }
+        )
+
+
+def _block_quantiles(
+    values: np.ndarray, weights: np.ndarray, probs: np.ndarray
+) -> np.ndarray:
+    """Quantiles of sorted distinct values under each column of weights."""
+    count, blocks = weights.shape
+    # One running sum across the blocks keeps them sorted for searching.
+    cumulative: np.ndarray = np.cumsum(np.asarray(weights).T.ravel())
+    first: np.ndarray = np.arange(blocks) * count
+    return cumulative_quantiles(
+        np.tile(values, blocks), cumulative, first, first + count - 1, probs
+    )
+
+
+def _start_worker(
+    estimator: Estimator,
+    data: pd.DataFrame,
+    weights: np.ndarray,
+    psu: np.ndarray,
+    factors: np.ndarray,
+) -> None:
+    _worker.update(
+        estimator=estimator, data=data, weights=weights, psu=psu, factors=factors
+    )
+
+
+def _run_replicates(replicates: Sequence[int]) -> np.ndarray:
+    """Evaluate the worker's estimator under some replicates' weights."""
+    weights: np.ndarray = _worker["weights"]
+    psu: np.ndarray = _worker["psu"]
+    return np.vstack(
+        [
+            np.ravel(
+                _worker["estimator"](
+                    _worker["data"], weights * _worker["factors"][r, psu]
+                )
+            )
+            for r in replicates
+        ]
+    )